@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+# --- AGREGACIÓN POR CONJUNTOS DE AGRUPACIÓN (grouping sets) ---
+# Calcula en un solo recorrido la suma de un valor por franja y el total/vencido para varias
+# combinaciones de dimensiones a la vez (ciudad, administrador, cliente y el total general).
+# Cada dimensión se factoriza una vez a códigos enteros; los grupos de todos los conjuntos se
+# ubican en un único arreglo de posiciones y se acumulan con np.bincount.
+# Igual que groupby/pivot_table: grupos ordenados por sus valores, filas con clave vacía fuera.
+
+
+def codificar(serie):
+    # Códigos enteros en orden de los valores (-1 = vacío) y sus etiquetas
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.cat.codes.to_numpy(dtype=np.int64), serie.cat.categories
+    codigos, etiquetas = pd.factorize(serie, sort=True)
+    return codigos.astype(np.int64), pd.Index(etiquetas)
+
+
+def agrupar(codigos_dims, n_filas):
+    # Combina los códigos de varias dimensiones en un id de grupo denso y ordenado.
+    # Devuelve (id por fila, -1 si alguna dimensión está vacía; fila representativa de cada grupo)
+    validas = np.ones(n_filas, dtype=bool)
+    clave = np.zeros(n_filas, dtype=np.int64)
+    for codigos, etiquetas in codigos_dims:
+        validas &= codigos >= 0
+        # Se re-densifica en cada paso para que la clave compuesta no se desborde
+        clave = np.unique(clave * len(etiquetas) + np.maximum(codigos, 0), return_inverse=True)[1]
+
+    grupo = np.full(n_filas, -1, dtype=np.int64)
+    if validas.any():
+        _, representante, inverso = np.unique(clave[validas], return_index=True, return_inverse=True)
+        grupo[validas] = inverso
+        representante = np.flatnonzero(validas)[representante]
+    else:
+        representante = np.empty(0, dtype=np.int64)
+    return grupo, representante
+
+
+def agregar_por_franja(df, conjuntos, col_franja, col_valor, col_vencido):
+    # conjuntos: lista de tuplas de columnas; () es el total general.
+    # Devuelve {conjunto: DataFrame} con una columna por franja observada (suma de col_valor)
+    # más col_valor y col_vencido totales, indexado por las columnas del conjunto.
+    n = len(df)
+    valor = df[col_valor].to_numpy()
+    vencido = df[col_vencido].to_numpy()
+    cod_franja, franjas = codificar(df[col_franja])
+    ancho = len(franjas) + 1  # última ranura: filas sin franja (cuentan en los totales)
+    ranura = np.where(cod_franja >= 0, cod_franja, len(franjas))
+
+    cache_dims = {}
+    piezas = []
+    desplazamiento = 0
+    for conjunto in conjuntos:
+        dims = []
+        for col in conjunto:
+            if col not in cache_dims:
+                cache_dims[col] = codificar(df[col])
+            dims.append(cache_dims[col])
+        grupo, representante = agrupar(dims, n)
+        validas = grupo >= 0
+        posicion = desplazamiento + grupo[validas] * ancho + ranura[validas]
+        piezas.append((conjunto, dims, representante, validas, posicion, desplazamiento))
+        desplazamiento += len(representante) * ancho
+
+    # Un solo bincount por medida para todos los conjuntos
+    posiciones = np.concatenate([p[4] for p in piezas]) if piezas else np.empty(0, dtype=np.int64)
+    filas = np.concatenate([np.flatnonzero(p[3]) for p in piezas]) if piezas else np.empty(0, dtype=np.int64)
+    suma_valor = np.bincount(posiciones, weights=valor[filas], minlength=desplazamiento)
+    suma_vencido = np.bincount(posiciones, weights=vencido[filas], minlength=desplazamiento)
+    conteo = np.bincount(posiciones, minlength=desplazamiento)
+
+    resultados = {}
+    for conjunto, dims, representante, _, _, inicio in piezas:
+        n_grupos = len(representante)
+        fin = inicio + n_grupos * ancho
+        matriz = suma_valor[inicio:fin].reshape(n_grupos, ancho)
+        matriz_vencido = suma_vencido[inicio:fin].reshape(n_grupos, ancho)
+        presentes = conteo[inicio:fin].reshape(n_grupos, ancho)[:, :-1] > 0
+        observadas = presentes.any(axis=0)
+
+        if conjunto:
+            niveles = [etiquetas[codigos[representante]] for codigos, etiquetas in dims]
+            if len(conjunto) == 1:
+                indice = pd.Index(niveles[0], name=conjunto[0])
+            else:
+                indice = pd.MultiIndex.from_arrays(niveles, names=list(conjunto))
+        else:
+            indice = pd.RangeIndex(n_grupos)
+
+        # Como pivot_table + fillna(0): si todos los grupos tienen todas las franjas observadas las
+        # columnas conservan el tipo entero; si a algún grupo le falta alguna, todas quedan float con 0
+        completa = presentes[:, observadas].all()
+        tabla = pd.DataFrame({
+            franja: _como(matriz[:, j], valor.dtype) if completa else matriz[:, j]
+            for j, franja in enumerate(franjas) if observadas[j]
+        }, index=indice)
+        tabla.columns = pd.Index(tabla.columns, name=col_franja)
+        tabla[col_valor] = _como(matriz.sum(axis=1), valor.dtype)
+        tabla[col_vencido] = _como(matriz_vencido.sum(axis=1), vencido.dtype)
+        resultados[conjunto] = tabla
+    return resultados
+
+
+def _como(sumas, dtype):
+    # bincount acumula en float64; si la medida era entera se devuelve entera
+    if np.issubdtype(dtype, np.integer):
+        return np.rint(sumas).astype(np.int64)
+    return sumas
@@ -2,20 +2,37 @@ import os
 import glob
 import pandas as pd
 import calendar
-from flask import Flask, render_template, request
+from flask import Flask, render_template, request, jsonify, Response
 import datetime as dt
 from datetime import datetime
 import pytz
 
 
-from procesador_maestro import procesar_todo  # Esto importa tu lógica de las 11 columnas
+import tareas  # procesar_todo y consolidar_pagos corren en la cola de trabajos
+import cargador_datos
+import eventos
+import historico
+import metricas
+import precarga
+import respuestas
+from respuestas import con_etag
+from cargador_datos import cargar_cartera, cargar_pagos, firma_archivo
+from procesador_dashboard import obtener_informacion, version_datos, clave_vista
+from consultas_tablas import TablaIndexada, obtener_tabla
+from series_clientes import obtener_matriz
+from cubo import obtener_cubo
 
 app = Flask(__name__)
 
 # --- RUTAS DE ARCHIVOS ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-RUTA_CARTERA = os.path.join(BASE_DIR, 'data', 'Proyectadoconsolidado.csv')
-RUTA_PAGOS = os.path.join(BASE_DIR, 'data', 'PagosConsolidado.csv')
+RUTA_CARTERA = cargador_datos.RUTA_CARTERA
+RUTA_PAGOS = cargador_datos.RUTA_PAGOS
+
+# Tiempos por etapa en Server-Timing, /metrics (Prometheus) y perfil opcional (ver metricas.py)
+metricas.instrumentar(app, os.path.join(cargador_datos.RUTA_DATA, 'perfiles'))
+# ETag por versión de los datos (304 sin recalcular) y respuestas comprimidas (ver respuestas.py)
+respuestas.comprimir(app)
 
 def obtener_fecha_archivo(ruta):
     try:
@@ -31,192 +48,93 @@ def obtener_fecha_archivo(ruta):
         print(f"Error leyendo fecha: {e}")
         return "Error al obtener fecha"
 
-def procesar_informacion(tipo_vista, ciudad_filtro=None):
+MESES = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio', 'Agosto',
+         'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+
+def obtener_periodo(parametros):
+    # ?mes=&anio= (o el cuerpo JSON): por defecto el mes en curso
+    ahora = datetime.now()
     try:
-        # --- 1. Cargar datos ---
-        df_cartera = pd.read_csv(RUTA_CARTERA, sep=';', encoding='latin1')
+        mes = int(parametros.get('mes', ahora.month))
+        anio = int(parametros.get('anio', ahora.year))
+    except (TypeError, ValueError):
+        return ahora.year, ahora.month
+    if not 1 <= mes <= 12 or not 1900 <= anio <= 2200:
+        return ahora.year, ahora.month
+    return anio, mes
+
+
+def _presupuesto_periodo(anio, mes):
+    # La partición del mes ya trae solo los documentos que vencen en él, con la fecha convertida
+    df_proy = historico.leer_periodo('proyectado', anio, mes, consumidor='detalle')
+    if df_proy is None:
+        df_proy = cargar_cartera(RUTA_CARTERA, consumidor='detalle').iloc[0:0]
+    df_filtrado = df_proy.copy()
+    df_filtrado['Fecha_Vencimiento'] = df_filtrado['VTO_FECHA_DT']
+    return df_filtrado
+
+
+def _pagos_periodo(anio, mes):
+    # Pagos del periodo (por fecha de pago)
+    df_pagos = historico.leer_periodo('pagos', anio, mes)
+    if df_pagos is None:
+        df_pagos = cargar_pagos(RUTA_PAGOS).iloc[0:0]
+    return df_pagos
+
+
+def _dias_corte(anio, mes):
+    # Cálculos "Actual" (Corte ayer); un mes ya cerrado se corta en su último día
+    ahora = datetime.now()
+    if (anio, mes) < (ahora.year, ahora.month):
+        dia_hoy = calendar.monthrange(anio, mes)[1] + 1
+    elif (anio, mes) > (ahora.year, ahora.month):
+        dia_hoy = 1
+    else:
+        dia_hoy = ahora.day
+    dia_ayer = dia_hoy - 1 if dia_hoy > 1 else 1
+    return dia_hoy, dia_ayer
 
-        # LIMPIEZA TOTAL DE COLUMNAS
-        df_cartera.columns = df_cartera.columns.str.strip()
-        
-        # Estandarización de la columna Administrador
-        col_admin_real = 'ADMINISTRADO POR'
-        if col_admin_real not in df_cartera.columns:
-            posibles = [c for c in df_cartera.columns if 'ADMINISTRADO' in c.upper()]
-            if posibles:
-                df_cartera = df_cartera.rename(columns={posibles[0]: col_admin_real})
-            else:
-                df_cartera[col_admin_real] = 'NO ASIGNADO'
-
-        # 2. Lista de ciudades para el filtro
-        ciudades = sorted(df_cartera['CIUDAD'].dropna().unique().tolist())
-        
-        # 3. Limpieza de columnas numéricas
-        columnas_dinero = ['TOTAL CARTERA', '00- Corriente', '05- 1 a 4', '06- 5 a 14', 
-                           '07- 15 a 21', '08- 22 a 30', '09- Mayor a 30', 'DIAS_MORA']
-        for col in columnas_dinero:
-            if col in df_cartera.columns:
-                df_cartera[col] = pd.to_numeric(df_cartera[col], errors='coerce').fillna(0)
-
-        # 4. Primero filtramos solo PENDIENTES
-        df_pendientes = df_cartera[df_cartera['ESTADO'].astype(str).str.upper() == 'PENDIENTE'].copy()
-
-        # --- LIMPIEZA DE NIT (Evitar el .0) ---
-        if 'NIT' in df_pendientes.columns:
-            df_pendientes['NIT'] = df_pendientes['NIT'].fillna(0).astype(float).astype(int).astype(str)
-            df_pendientes['NIT'] = df_pendientes['NIT'].replace('0', '')
-
-        # LIMPIEZA DEL COD. CLIENTE
-        if 'COD. CLIENTE' in df_pendientes.columns:
-            df_pendientes['COD. CLIENTE'] = df_pendientes['COD. CLIENTE'].fillna(0).astype(float).astype(int).astype(str)
-
-        # 5. Aplicar Filtro de Ciudad
-        if ciudad_filtro and ciudad_filtro != "Todas":
-            df_pendientes = df_pendientes[df_pendientes['CIUDAD'] == ciudad_filtro]
-
-        # 6. Selección de columna de mora según vista
-        columna_franja = 'Franja de Mora Coca-Cola' if tipo_vista == 'coca-cola' else 'Franja Mora Cyres'
-        
-        # Validación de existencia de columna de franja para evitar errores en el pivot
-        if columna_franja not in df_pendientes.columns:
-            df_pendientes[columna_franja] = 'Sin Clasificar'
-
-        resumen_grafico = df_pendientes.groupby(columna_franja)['TOTAL CARTERA'].sum().to_dict()
-
-        # 7. Procesar Recaudo (Pagos)
-        total_recaudo = 0
-        if os.path.exists(RUTA_PAGOS):
-            try:
-                df_pagos = pd.read_csv(RUTA_PAGOS, sep=';', encoding='latin1')
-                df_pagos.columns = df_pagos.columns.str.strip()
-                if 'VALOR PAGADO' in df_pagos.columns:
-                    total_recaudo = pd.to_numeric(df_pagos['VALOR PAGADO'], errors='coerce').sum()
-            except:
-                total_recaudo = 0
-
-        # Cálculo de mora real fila por fila
-        df_pendientes['SALDO_ES_VENCIDO'] = df_pendientes.apply(
-            lambda x: x['TOTAL CARTERA'] if x['DIAS_MORA'] >= 1 else 0, axis=1
-        )
-
-        # --- 8. GRÁFICO 1: PARTICIPACIÓN TOTAL POR CIUDAD ---
-        df_ciudades = df_pendientes.groupby('CIUDAD')['TOTAL CARTERA'].sum().sort_values(ascending=False).reset_index()
-        if len(df_ciudades) > 10:
-            top_10 = df_ciudades.head(10).copy()
-            otros_valor = df_ciudades.iloc[10:]['TOTAL CARTERA'].sum()
-            fila_otros = pd.DataFrame({'CIUDAD': ['Otras'], 'TOTAL CARTERA': [otros_valor]})
-            df_final_ciudades = pd.concat([top_10, fila_otros], ignore_index=True)
-        else:
-            df_final_ciudades = df_ciudades
-
-        # --- 9. GRÁFICO 2: RANKING MORA ---
-        df_mora = df_pendientes.groupby('CIUDAD')['SALDO_ES_VENCIDO'].sum().sort_values(ascending=False).reset_index()
-        if len(df_mora) > 10:
-            top_10_mora = df_mora.head(10).copy()
-            otros_mora = df_mora.iloc[10:]['SALDO_ES_VENCIDO'].sum()
-            fila_otros_mora = pd.DataFrame({'CIUDAD': ['Otras'], 'SALDO_ES_VENCIDO': [otros_mora]})
-            df_final_mora = pd.concat([top_10_mora, fila_otros_mora], ignore_index=True)
-        else:
-            df_final_mora = df_mora
-
-        # --- 10. TABLA DE COMPOSICIÓN (CIUDADES) ---
-        tabla_comp = df_pendientes.pivot_table(
-            index='CIUDAD', 
-            columns=columna_franja, 
-            values='TOTAL CARTERA', 
-            aggfunc='sum'
-        ).fillna(0)
-
-        resumen_totales = df_pendientes.groupby('CIUDAD').agg({
-            'TOTAL CARTERA': 'sum',
-            'SALDO_ES_VENCIDO': 'sum'
-        })
-
-        tabla_comp = tabla_comp.merge(resumen_totales, on='CIUDAD')
-        tabla_comp = tabla_comp.rename(columns={'TOTAL CARTERA': 'TOTAL_CARTERA', 'SALDO_ES_VENCIDO': 'TOTAL_VENCIDO'})
-        tabla_comp['PORCENTAJE_VENCIDO'] = (tabla_comp['TOTAL_VENCIDO'] / tabla_comp['TOTAL_CARTERA'] * 100).fillna(0)
-        
-        lista_composicion = tabla_comp.reset_index().sort_values(by='TOTAL_CARTERA', ascending=False).to_dict(orient='records')
-        columnas_franjas = [c for c in tabla_comp.columns if c not in ['TOTAL_CARTERA', 'TOTAL_VENCIDO', 'PORCENTAJE_VENCIDO', 'CIUDAD']]
-
-        # --- 11. TABLA POR ADMINISTRADOR ---
-        tabla_admin_df = df_pendientes.pivot_table(
-            index=col_admin_real, 
-            columns=columna_franja, 
-            values='TOTAL CARTERA', 
-            aggfunc='sum'
-        ).fillna(0)
-
-        resumen_admin = df_pendientes.groupby(col_admin_real).agg({
-            'TOTAL CARTERA': 'sum',
-            'SALDO_ES_VENCIDO': 'sum'
-        })
-
-        tabla_admin_df = tabla_admin_df.merge(resumen_admin, on=col_admin_real)
-        tabla_admin_df = tabla_admin_df.rename(columns={'TOTAL CARTERA': 'TOTAL_CARTERA', 'SALDO_ES_VENCIDO': 'TOTAL_VENCIDO'})
-        
-        # CORRECCIÓN AQUÍ: Usamos tabla_admin_df, no tabla_cliente_df
-        tabla_admin_df['PORCENTAJE_VENCIDO'] = (tabla_admin_df['TOTAL_VENCIDO'] / tabla_admin_df['TOTAL_CARTERA'] * 100).fillna(0)
-
-        lista_admin = tabla_admin_df.reset_index().sort_values(by='TOTAL_CARTERA', ascending=False).to_dict(orient='records')
-
-        # --- 12. TABLA POR CLIENTE ---
-        # 1. Creamos la tabla pivote y el resumen
-        tabla_cliente_df = df_pendientes.pivot_table(
-            index=['COD. CLIENTE', 'NIT', 'RAZÓN SOCIAL'], 
-            columns=columna_franja, 
-            values='TOTAL CARTERA', 
-            aggfunc='sum'
-        ).fillna(0)
-
-        resumen_cliente = df_pendientes.groupby(['COD. CLIENTE', 'NIT', 'RAZÓN SOCIAL']).agg({
-            'TOTAL CARTERA': 'sum',
-            'SALDO_ES_VENCIDO': 'sum'
-        })
-
-        # 2. Unir, renombrar y calcular porcentaje
-        tabla_cliente_df = tabla_cliente_df.merge(resumen_cliente, on=['COD. CLIENTE', 'NIT', 'RAZÓN SOCIAL'])
-        tabla_cliente_df = tabla_cliente_df.rename(columns={'TOTAL CARTERA': 'TOTAL_CARTERA', 'SALDO_ES_VENCIDO': 'TOTAL_VENCIDO'})
-        tabla_cliente_df['PORCENTAJE_VENCIDO'] = (tabla_cliente_df['TOTAL_VENCIDO'] / tabla_cliente_df['TOTAL_CARTERA'] * 100).fillna(0)
-
-        # 3. Ordenar y convertir a lista de diccionarios
-        lista_clientes = tabla_cliente_df.reset_index() \
-                                         .sort_values(by='TOTAL_CARTERA', ascending=False) \
-                                         .to_dict(orient='records')
-
-        # --- 13. Retorno final ---
-        total_cartera_final = df_pendientes['TOTAL CARTERA'].sum()
-        total_vencido_final = df_pendientes['SALDO_ES_VENCIDO'].sum()
-
-        return {
-            'ciudades': ciudades,
-            'kpis': {
-                'total_cartera': total_cartera_final,
-                'vencida': total_vencido_final,
-                'morosidad': (total_vencido_final / total_cartera_final * 100) if total_cartera_final > 0 else 0,
-                'recaudo': total_recaudo,
-                'clientes_total': df_pendientes['NIT'].nunique()
-            },
-            'graficos': {
-                'dona_labels': list(resumen_grafico.keys()),
-                'dona_valores': list(resumen_grafico.values()),
-                'ciudades_labels': df_final_ciudades['CIUDAD'].tolist(),
-                'ciudades_valores': df_final_ciudades['TOTAL CARTERA'].tolist(),
-                'mora_ciudades_labels': df_final_mora['CIUDAD'].tolist(),
-                'mora_ciudades_valores': df_final_mora['SALDO_ES_VENCIDO'].tolist(),
-            },
-            'tabla_composicion': lista_composicion,
-            'tabla_admin': lista_admin,
-            'tabla_clientes': lista_clientes, # <--- Ahora esta variable sí existe arriba
-            'columnas_franjas': columnas_franjas,
-            'detalles': []
-        }
 
-    except Exception as e:
-        print(f"❌ Error en procesar_informacion: {str(e)}")
-        return None
+def _clientes_detalle(df_filtrado, df_pagos, dia_ayer):
+    # --- CONSOLIDACIÓN POR CLIENTE PARA LA TABLA ---
+    col_cod = 'COD. CLIENTE'
+    col_razon = next((c for c in df_filtrado.columns if 'RAZON' in c.upper() or 'SOCIAL' in c.upper() or 'CLIENTE' in c.upper() and c != col_cod), df_filtrado.columns[1])
+
+    df_cli_proy = df_filtrado.groupby([col_cod, col_razon]).agg(Presupuesto_Mensual=('TOTAL CARTERA', 'sum')).reset_index()
+    df_cli_proy.columns = ['COD_CLIENTE', 'RAZON_SOCIAL', 'Presupuesto_Mensual']
+
+    df_ayer_cli = df_filtrado[df_filtrado['Fecha_Vencimiento'].dt.day <= dia_ayer]
+    df_cli_proy_actual = df_ayer_cli.groupby(col_cod)['TOTAL CARTERA'].sum().reset_index() if not df_ayer_cli.empty else pd.DataFrame(columns=[col_cod, 'Presupuesto_Actual'])
+    df_cli_proy_actual.columns = ['COD_CLIENTE', 'Presupuesto_Actual']
+
+    df_cli_pagos = df_pagos.groupby(col_cod)['VALOR PAGADO'].sum().reset_index() if col_cod in df_pagos.columns else pd.DataFrame(columns=[col_cod, 'Ingresos_Recibidos'])
+    df_cli_pagos.columns = ['COD_CLIENTE', 'Ingresos_Recibidos']
+
+    tabla_clientes = pd.merge(df_cli_proy, df_cli_proy_actual, on='COD_CLIENTE', how='left')
+    tabla_clientes = pd.merge(tabla_clientes, df_cli_pagos, on='COD_CLIENTE', how='left').fillna(0)
+
+    tabla_clientes['Desviacion'] = tabla_clientes['Ingresos_Recibidos'] - tabla_clientes['Presupuesto_Actual']
+    tabla_clientes['Efe_Actual'] = (tabla_clientes['Ingresos_Recibidos'] / tabla_clientes['Presupuesto_Actual'] * 100).replace([float('inf')], 0).fillna(0)
+    tabla_clientes['Efe_Mensual'] = (tabla_clientes['Ingresos_Recibidos'] / tabla_clientes['Presupuesto_Mensual'] * 100).replace([float('inf')], 0).fillna(0)
+
+    # --- AGREGADO: ORDENAR POR PRESUPUESTO MENSUAL MAYOR A MENOR ---
+    return tabla_clientes.sort_values(by='Presupuesto_Mensual', ascending=False)
+
+
+def _tabla_detalle(anio, mes):
+    def construir():
+        df = pd.DataFrame()
+        if os.path.exists(RUTA_CARTERA) and os.path.exists(RUTA_PAGOS):
+            df_filtrado = _presupuesto_periodo(anio, mes)
+            if not df_filtrado.empty:
+                df = _clientes_detalle(df_filtrado, _pagos_periodo(anio, mes), _dias_corte(anio, mes)[1])
+        return TablaIndexada(df, ['COD_CLIENTE', 'RAZON_SOCIAL'])
+
+    # "Corte ayer" depende del día: la tabla se reconstruye al cambiar de fecha
+    return obtener_tabla(('detalle', anio, mes, version_datos(), datetime.now().date()), construir)
 
 @app.route('/')
+@con_etag
 def index():
     vista = request.args.get('vista', 'cyres')
     ciudad = request.args.get('ciudad', 'Todas')
@@ -241,57 +159,35 @@ def index():
         'presupuesto_acc': [], 'ingresos_acc': []
     }
 
-    operaciones_tabla = []
-    detalle_clientes_grafica = {} # Inicializamos el diccionario de clientes
-    detalle_presupuesto_grafica = {}
-
     if vista == 'detalle_analisis':
+        cronometro = metricas.Cronometro('detalle')
         try:
             
-            folder_data = os.path.join(BASE_DIR, 'data')
-            ahora = datetime.now()
-            mes_actual = datetime.now().month
-            anio_actual = datetime.now().year
+            folder_data = cargador_datos.RUTA_DATA
+            # Periodo elegido en el selector; solo se leen las particiones de ese mes (historico.py)
+            anio_actual, mes_actual = obtener_periodo(request.args)
             ultimo_dia = calendar.monthrange(anio_actual, mes_actual)[1]
 
             # A.1. Leer Presupuesto (CORREGIDO)
             path_proyectado = os.path.join(folder_data, 'Proyectadoconsolidado.csv')
             df_filtrado = pd.DataFrame()
             if os.path.exists(path_proyectado):
-                df_proy = pd.read_csv(path_proyectado, sep=';', encoding='latin1')
-                df_proy.columns = df_proy.columns.str.strip()
-                
-                # 1. Intentamos leer la fecha sin forzar formato (Pandas detecta YYYY-MM-DD del CSV)
-                df_proy['Fecha_Vencimiento'] = pd.to_datetime(df_proy['Fecha_Vencimiento'], errors='coerce')
-                
-                # 2. Si falló (NaT), intentamos el formato con puntos que viene del Maestro
-                if df_proy['Fecha_Vencimiento'].isna().all():
-                    df_proy['Fecha_Vencimiento'] = pd.to_datetime(df_proy['Fecha_Vencimiento'], format='%d.%m.%Y', errors='coerce')
-                
-                # 3. FILTRO: Mes actual, Año actual Y que esté PENDIENTE
-                # Nota: Asegúrate de que anio_actual coincida con el de tus archivos (2026)
-                filtro = (df_proy['Fecha_Vencimiento'].dt.month == mes_actual) & \
-                         (df_proy['Fecha_Vencimiento'].dt.year == anio_actual)
-                
-                df_filtrado = df_proy[filtro].copy()
+                df_filtrado = _presupuesto_periodo(anio_actual, mes_actual)
 
-                def limpiar_monto(serie):
-                    return pd.to_numeric(serie.astype(str).str.replace(r'[^\d.]', '', regex=True), errors='coerce').fillna(0)
-                
                 # Cálculo del KPI Presupuesto Total del Mes
                 kpis_calculados['presupuesto'] = pd.to_numeric(df_filtrado['TOTAL CARTERA'], errors='coerce').fillna(0).sum()
 
                 if df_filtrado.empty:
                     print(f"ADVERTENCIA: No hay datos PENDIENTES para {mes_actual}/{anio_actual}")
+                cronometro.marca('presupuesto', filas=len(df_filtrado))
 
             # A.2. Leer Ingresos
             path_pagos = os.path.join(folder_data, 'PagosConsolidado.csv')
             if os.path.exists(path_pagos):
-                df_pagos = pd.read_csv(path_pagos, sep=';', encoding='latin1')
-                df_pagos.columns = df_pagos.columns.str.strip()
-                
+                df_pagos = _pagos_periodo(anio_actual, mes_actual)
+
                 if 'VALOR PAGADO' in df_pagos.columns:
-                    kpis_calculados['ingresos'] = pd.to_numeric(df_pagos['VALOR PAGADO'], errors='coerce').fillna(0).sum()
+                    kpis_calculados['ingresos'] = df_pagos['VALOR PAGADO'].sum()
                 
                 # A.3. Lógica para la Gráfica Diaria General
                 dias_mes = pd.date_range(start=f"{anio_actual}-{mes_actual}-01", end=f"{anio_actual}-{mes_actual}-{ultimo_dia}")
@@ -302,7 +198,6 @@ def index():
                 df_proy_dia['Fecha'] = pd.to_datetime(df_proy_dia['Fecha'])
 
                 if 'FECHA PAGO' in df_pagos.columns:
-                    df_pagos['FECHA_PAGO_DT'] = pd.to_datetime(df_pagos['FECHA PAGO'], dayfirst=True, errors='coerce')
                     df_pagos_dia = df_pagos.groupby(df_pagos['FECHA_PAGO_DT'].dt.date)['VALOR PAGADO'].sum().reset_index()
                     df_pagos_dia.columns = ['Fecha', 'Ingreso_Dia']
                     df_pagos_dia['Fecha'] = pd.to_datetime(df_pagos_dia['Fecha'])
@@ -321,96 +216,49 @@ def index():
                         'ingresos_acc': df_final['Ingreso_Acc'].tolist()
                     }
 
-                    # --- NUEVO: DICCIONARIO DE INGRESOS DIARIOS POR CLIENTE ---
-                    if 'COD. CLIENTE' in df_pagos.columns:
-                        ingresos_por_cli_dia = df_pagos.groupby(['COD. CLIENTE', df_pagos['FECHA_PAGO_DT'].dt.day])['VALOR PAGADO'].sum().unstack(fill_value=0)
-                        
-                        for cod, fila in ingresos_por_cli_dia.iterrows():
-                            lista_valores = [float(fila.get(d, 0)) for d in range(1, ultimo_dia + 1)]
-                            detalle_clientes_grafica[str(cod)] = lista_valores
-
-                    # --- PEGA AQUÍ EL NUEVO BLOQUE DE PRESUPUESTO ---
-                    if not df_filtrado.empty and 'COD. CLIENTE' in df_filtrado.columns:
-                        ppto_por_cli_dia = df_filtrado.groupby(['COD. CLIENTE', df_filtrado['Fecha_Vencimiento'].dt.day])['TOTAL CARTERA'].sum().unstack(fill_value=0)
-                        for cod, fila in ppto_por_cli_dia.iterrows():
-                            lista_ppto = [float(fila.get(d, 0)) for d in range(1, ultimo_dia + 1)]
-                            detalle_presupuesto_grafica[str(cod)] = lista_ppto
-
-                    # Cálculos "Actual" (Corte ayer)
-                    dia_hoy = datetime.now().day
-                    dia_ayer = dia_hoy - 1 if dia_hoy > 1 else 1
+                    cronometro.marca('grafica')
+
+                    # Las series diarias por cliente (gráfica filtrada por la tabla) se piden a
+                    # /api/cliente/<cod>/serie; ya no se incrustan en la página
+
+                    _, dia_ayer = _dias_corte(anio_actual, mes_actual)
 
                     filtro_ayer = df_filtrado['Fecha_Vencimiento'].dt.day <= dia_ayer
                     presupuesto_ayer = pd.to_numeric(df_filtrado[filtro_ayer]['TOTAL CARTERA'], errors='coerce').fillna(0).sum()
                     kpis_calculados['presupuesto_actual'] = presupuesto_ayer
 
                     # Reemplazo para asegurar que la caja de abajo siempre se actualice con el total
-                    filtro_hoy = df_filtrado['Fecha_Vencimiento'].dt.day <= dia_hoy
                     kpis_calculados['ingresos_actual'] = kpis_calculados['ingresos']
                     kpis_calculados['desviacion_actual'] = kpis_calculados['ingresos'] - kpis_calculados['presupuesto_actual']
                     kpis_calculados['ejecucion_actual'] = (kpis_calculados['ingresos'] / kpis_calculados['presupuesto_actual'] * 100) if kpis_calculados['presupuesto_actual'] > 0 else 0
 
-
-                    # --- CONSOLIDACIÓN POR CLIENTE PARA LA TABLA ---
-                    if not df_filtrado.empty:
-                        col_cod = 'COD. CLIENTE'
-                        col_razon = next((c for c in df_filtrado.columns if 'RAZON' in c.upper() or 'SOCIAL' in c.upper() or 'CLIENTE' in c.upper() and c != col_cod), df_filtrado.columns[1])
-
-                        df_cli_proy = df_filtrado.groupby([col_cod, col_razon]).agg(Presupuesto_Mensual=('TOTAL CARTERA', 'sum')).reset_index()
-                        df_cli_proy.columns = ['COD_CLIENTE', 'RAZON_SOCIAL', 'Presupuesto_Mensual']
-
-                        df_ayer_cli = df_filtrado[df_filtrado['Fecha_Vencimiento'].dt.day <= dia_ayer]
-                        df_cli_proy_actual = df_ayer_cli.groupby(col_cod)['TOTAL CARTERA'].sum().reset_index() if not df_ayer_cli.empty else pd.DataFrame(columns=[col_cod, 'Presupuesto_Actual'])
-                        df_cli_proy_actual.columns = ['COD_CLIENTE', 'Presupuesto_Actual']
-
-                        df_cli_pagos = df_pagos.groupby(col_cod)['VALOR PAGADO'].sum().reset_index() if col_cod in df_pagos.columns else pd.DataFrame(columns=[col_cod, 'Ingresos_Recibidos'])
-                        df_cli_pagos.columns = ['COD_CLIENTE', 'Ingresos_Recibidos']
-
-                        tabla_clientes = pd.merge(df_cli_proy, df_cli_proy_actual, on='COD_CLIENTE', how='left')
-                        tabla_clientes = pd.merge(tabla_clientes, df_cli_pagos, on='COD_CLIENTE', how='left').fillna(0)
-
-                        tabla_clientes['Desviacion'] = tabla_clientes['Ingresos_Recibidos'] - tabla_clientes['Presupuesto_Actual']
-                        tabla_clientes['Efe_Actual'] = (tabla_clientes['Ingresos_Recibidos'] / tabla_clientes['Presupuesto_Actual'] * 100).replace([float('inf')], 0).fillna(0)
-                        tabla_clientes['Efe_Mensual'] = (tabla_clientes['Ingresos_Recibidos'] / tabla_clientes['Presupuesto_Mensual'] * 100).replace([float('inf')], 0).fillna(0)
-
-                        # --- AGREGADO: ORDENAR POR PRESUPUESTO MENSUAL MAYOR A MENOR ---
-                        tabla_clientes = tabla_clientes.sort_values(by='Presupuesto_Mensual', ascending=False)
-
-                        operaciones_tabla = tabla_clientes.to_dict(orient='records')
+                    # La tabla por cliente ya no va en el HTML: se pide paginada a /api/detalle/clientes
 
             kpis_calculados['desviacion'] = kpis_calculados['ingresos'] - kpis_calculados['presupuesto']
             if kpis_calculados['presupuesto'] > 0:
                 kpis_calculados['efectividad'] = (kpis_calculados['ingresos'] / kpis_calculados['presupuesto']) * 100
         
-            if os.path.exists(path_proyectado):
-                df_proy = pd.read_csv(path_proyectado, sep=';', encoding='latin1')
-                print(f"DEBUG: Columnas encontradas: {df_proy.columns.tolist()}")
-                # ... resto del código ...
-                df_filtrado = df_proy[filtro]
-                print(f"DEBUG: Filas encontradas para el mes {mes_actual}: {len(df_filtrado)}")
-        
         except Exception as e:
             print(f"Error en detalle: {e}")
 
         # FUERZA BRUTA: Justo antes de enviar a la página, igualamos
         kpis_calculados['ingresos_actual'] = kpis_calculados['ingresos']
-        print(">>> SI VES ESTO, EL CODIGO SI SE ACTUALIZO <<<")
 
         return render_template('detalle.html', 
                                kpis=kpis_calculados, 
                                grafico_lineas=grafico_lineas, 
-                               detalle_clientes=detalle_clientes_grafica,
-                               detalle_presupuesto=detalle_presupuesto_grafica, 
                                vista_actual=vista,
-                               operaciones_tabla=operaciones_tabla, 
                                ciudad_actual=ciudad,
                                mes_actual=mes_actual,
                                anio_actual=anio_actual,
+                               periodos=periodos_disponibles((anio_actual, mes_actual)),
+                               meses=MESES,
                                fecha_proyectado=fecha_act_cartera, 
                                fecha_pagos=fecha_act_pagos)
     
 
-    datos = procesar_informacion(vista, ciudad)
+    # Lee el snapshot materializado al consolidar; si está desactualizado se calcula en vivo
+    datos = obtener_informacion(vista, ciudad)
     if datos is None: return "<h1>Error</h1>"
 
     return render_template('index.html', 
@@ -423,6 +271,18 @@ def index():
                            anio_actual=anio_actual)
                            
 
+def periodos_disponibles(elegido):
+    # Meses con presupuesto o pagos en el histórico, más el mes en curso y el elegido
+    ahora = datetime.now()
+    disponibles = {(ahora.year, ahora.month), elegido}
+    for fuente in ('proyectado', 'pagos'):
+        try:
+            disponibles.update(historico.periodos(fuente))
+        except Exception as e:
+            print(f"Error leyendo periodos de {fuente}: {e}")
+    return sorted(disponibles, reverse=True)
+
+
 def obtener_ultimo_archivo(ruta_carpeta):
     # Si la carpeta no existe, la creamos para evitar errores
     if not os.path.exists(ruta_carpeta):
@@ -439,8 +299,9 @@ def obtener_ultimo_archivo(ruta_carpeta):
 @app.route('/upload', methods=['GET', 'POST'])
 def upload_file():
     mensaje = None
-    RUTA_PROY = os.path.join(BASE_DIR, 'data', 'proyectados')
-    RUTA_PAGOS = os.path.join(BASE_DIR, 'data', 'pagos_diarios')
+    trabajo_id = None
+    RUTA_PROY = os.path.join(cargador_datos.RUTA_DATA, 'proyectados')
+    RUTA_PAGOS = os.path.join(cargador_datos.RUTA_DATA, 'pagos_diarios')
     
     if request.method == 'POST':
         # --- Lógica para Pagos ---
@@ -458,12 +319,12 @@ def upload_file():
                 path_destino = os.path.join(RUTA_PROY, file.filename)
                 file.save(path_destino)
                 
-                # 2. DISPARAMOS EL PROCESADOR MAESTRO (Las 11 columnas)
+                # 2. DISPARAMOS EL PROCESADOR MAESTRO (Las 11 columnas) en segundo plano
                 try:
-                    res_maestro = procesar_todo()
-                    mensaje = f"Archivo proyectado subido y Maestro actualizado: {res_maestro}"
+                    trabajo_id = tareas.encolar('maestro')
+                    mensaje = f"Archivo proyectado '{file.filename}' subido. Actualizando el Maestro en segundo plano."
                 except Exception as e:
-                    mensaje = f"Archivo subido, pero error en cálculos: {str(e)}"
+                    mensaje = f"Archivo subido, pero no se pudo encolar el Maestro: {str(e)}"
 
     # Mantenemos tu lógica de mostrar los últimos archivos en la interfaz
     ult_proy = obtener_ultimo_archivo(RUTA_PROY)
@@ -473,6 +334,7 @@ def upload_file():
                            mensaje=mensaje, 
                            ultimo_proy=ult_proy, 
                            ultimo_pago=ult_pago, 
+                           trabajo_id=trabajo_id,
                            vista_actual='upload')
 
 
@@ -481,48 +343,49 @@ def ejecutar_script():
     # Este es el espacio donde conectaremos el script .py aparte
     return "<h1>El botón funciona. Esperando instrucciones para el script aparte.</h1>"
 
-from procesador_pagos import consolidar_pagos # Importamos la función del nuevo script
+def _encolar_y_mostrar(tipo, descripcion):
+    # El proceso corre en la cola de trabajos (tareas.py); la página consulta su avance
+    ruta_p = os.path.join(cargador_datos.RUTA_DATA, 'proyectados')
+    ruta_pg = os.path.join(cargador_datos.RUTA_DATA, 'pagos_diarios')
+    try:
+        trabajo_id = tareas.encolar(tipo)
+        mensaje = f"{descripcion} en segundo plano (trabajo #{trabajo_id})."
+    except Exception as e:
+        trabajo_id = None
+        mensaje = f"❌ Error al encolar el proceso: {str(e)}"
+
+    return render_template('upload.html', 
+                           mensaje=mensaje, 
+                           ultimo_proy=obtener_ultimo_archivo(ruta_p), 
+                           ultimo_pago=obtener_ultimo_archivo(ruta_pg), 
+                           trabajo_id=trabajo_id,
+                           vista_actual='upload')
 
 @app.route('/ejecutar-pagos', methods=['POST'])
 def ejecutar_pagos():
-    try:
-        resultado = consolidar_pagos()
-        # Redirigimos de vuelta al upload con el mensaje de éxito del script
-        return render_template('upload.html', mensaje=resultado, vista_actual='upload')
-    except Exception as e:
-        return render_template('upload.html', mensaje=f"Error: {str(e)}", vista_actual='upload')
+    return _encolar_y_mostrar('pagos', "Generando PagosConsolidado")
 
 @app.route('/ejecutar-maestro', methods=['POST'])
 def ejecutar_maestro():
-    try:
-        # 1. Ejecutar el proceso que une las 11 columnas
-        resultado = procesar_todo()
-        
-        # 2. Definir rutas para refrescar la interfaz
-        ruta_p = os.path.join(BASE_DIR, 'data', 'proyectados')
-        ruta_pg = os.path.join(BASE_DIR, 'data', 'pagos_diarios')
-        
-        ult_proy = obtener_ultimo_archivo(ruta_p)
-        ult_pago = obtener_ultimo_archivo(ruta_pg)
-
-        return render_template('upload.html', 
-                               mensaje=f"✅ {resultado}", 
-                               ultimo_proy=ult_proy, 
-                               ultimo_pago=ult_pago, 
-                               vista_actual='upload')
-    except Exception as e:
-        return render_template('upload.html', 
-                               mensaje=f"❌ Error al procesar: {str(e)}", 
-                               vista_actual='upload')
+    # Ejecutar el proceso que une las 11 columnas
+    return _encolar_y_mostrar('maestro', "Generando Proyectadoconsolidado")
+
+@app.route('/api/jobs/<int:trabajo_id>')
+def api_trabajo(trabajo_id):
+    trabajo = tareas.consultar(trabajo_id)
+    if trabajo is None:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    return jsonify(trabajo)
     
 
 from procesador_gestion import calcular_gestion
 
 @app.route('/gestiones')
+@con_etag
 def gestiones():
     # 1. Definir rutas de archivos
-    path_cartera = os.path.join(BASE_DIR, 'data', 'Proyectadoconsolidado.csv') # Sigue siendo CSV
-    path_gestion = os.path.join(BASE_DIR, 'data', 'gestion.zip')
+    path_cartera = os.path.join(cargador_datos.RUTA_DATA, 'Proyectadoconsolidado.csv') # Sigue siendo CSV
+    path_gestion = os.path.join(cargador_datos.RUTA_DATA, 'gestion.zip')
     
     # 2. Capturar variables de la URL
     vista_activa = request.args.get('vista', 'general') # 'general' o 'analistas'
@@ -530,7 +393,13 @@ def gestiones():
     
     # 3. Llamar a la función pasando el filtro
     # Si la vista es 'general', podrías forzar 'Todos', pero pasar analista_f es más flexible
-    indicadores = calcular_gestion(path_cartera, path_gestion, analista_seleccionado=analista_f)
+    # El detalle por documento ya no va en el HTML: la tabla lo pide paginado a /api/gestiones/detalle
+    # ?ventana=N acredita los pagos a gestiones de hasta N días antes (por defecto, el mismo día)
+    ventana = request.args.get('ventana', type=int)
+    if ventana is not None:
+        ventana = max(ventana, 0)
+    indicadores = calcular_gestion(path_cartera, path_gestion, analista_seleccionado=analista_f, incluir_detalle=False,
+                                   ventana_atribucion=ventana)
     
     return render_template('gestiones.html',
                        stats=indicadores,
@@ -539,7 +408,168 @@ def gestiones():
                        analista_actual=analista_f,
                        now=datetime.now())
 
+# --- APIS PAGINADAS DE TABLAS (paginación, orden, búsqueda y filtros en el servidor) ---
+CANTIDAD_DEFECTO = 25
+CANTIDAD_MAXIMA = 500
+
+
+def _parametros_tabla(orden_defecto):
+    try:
+        inicio = max(int(request.args.get('inicio', 0)), 0)
+        cantidad = int(request.args.get('cantidad', CANTIDAD_DEFECTO))
+    except ValueError:
+        inicio, cantidad = 0, CANTIDAD_DEFECTO
+    # Una página a la vez: la tabla completa solo sale por ?formato=csv
+    cantidad = CANTIDAD_DEFECTO if cantidad <= 0 else min(cantidad, CANTIDAD_MAXIMA)
+    return {
+        'busqueda': request.args.get('q', ''),
+        'orden': request.args.get('orden', orden_defecto),
+        'descendente': request.args.get('dir', 'desc') == 'desc',
+        'inicio': inicio,
+        'cantidad': cantidad,
+    }
+
+
+def _respuesta_tabla(tabla, nombre_archivo, **consulta):
+    if request.args.get('formato') == 'csv':
+        df = tabla.exportar(**consulta)
+        contenido = df.to_csv(index=False, sep=';').encode('utf-8-sig')
+        return Response(contenido, mimetype='text/csv',
+                        headers={'Content-Disposition': f'attachment; filename={nombre_archivo}.csv'})
+    return jsonify(tabla.consultar(**consulta))
+
+
+@app.route('/api/clientes')
+@con_etag
+def api_clientes():
+    vista = clave_vista(request.args.get('vista', 'cyres'))
+    ciudad = request.args.get('ciudad', 'Todas')
+
+    def construir():
+        datos = obtener_informacion(vista, ciudad) or {}
+        df = pd.DataFrame(datos.get('tabla_clientes', []))
+        return TablaIndexada(df, ['COD. CLIENTE', 'NIT', 'RAZÓN SOCIAL'])
+
+    tabla = obtener_tabla(('clientes', vista, ciudad, version_datos()), construir)
+
+    # Franja: clientes con saldo en esa franja
+    franja = request.args.get('franja', '')
+    mascara = (tabla.df[franja] > 0).to_numpy() if franja in tabla.df.columns else None
+    return _respuesta_tabla(tabla, 'Reporte_Cartera_Clientes', mascara=mascara,
+                            **_parametros_tabla('TOTAL_CARTERA'))
+
+
+@app.route('/api/gestiones/detalle')
+@con_etag
+def api_gestiones_detalle():
+    analista = request.args.get('analista', 'Todos')
+    version = (firma_archivo(cargador_datos.RUTA_CARTERA), firma_archivo(cargador_datos.RUTA_GESTION))
+
+    def construir():
+        stats = calcular_gestion(cargador_datos.RUTA_CARTERA, cargador_datos.RUTA_GESTION, analista_seleccionado=analista)
+        df = pd.DataFrame(stats.get('detalle_maestro', []))
+        if not df.empty:
+            df['_FECHA_ORDEN'] = pd.to_datetime(df['FECHA_ULTIMA'], format='%d/%m/%Y', errors='coerce')
+        return TablaIndexada(df, ['ID', 'NOMBRE'], claves_orden={'FECHA_ULTIMA': '_FECHA_ORDEN'})
+
+    # La inactividad depende del día: la tabla se reconstruye al cambiar de fecha
+    tabla = obtener_tabla(('gestion', analista, version, datetime.now().date()), construir)
+
+    filtros = {
+        'FRANJA': request.args.get('franja', ''),
+        'ESTADO': request.args.get('estado', ''),
+        'CONTACTO': request.args.get('contacto', ''),
+        'CIUDAD': request.args.get('ciudad', ''),
+    }
+    return _respuesta_tabla(tabla, f"Reporte_Gestion_{datetime.now().date().isoformat()}", filtros=filtros,
+                            **_parametros_tabla('SALDO'))
+
+
+@app.route('/api/detalle/clientes')
+@con_etag
+def api_detalle_clientes():
+    anio, mes = obtener_periodo(request.args)
+    return _respuesta_tabla(_tabla_detalle(anio, mes), f"Reporte_Detalle_{anio}-{mes:02d}",
+                            **_parametros_tabla('Presupuesto_Mensual'))
+
+
+# --- SERIES DIARIAS POR CLIENTE (gráfica de detalle_analisis) ---
+@app.route('/api/cliente/<cod>/serie')
+@con_etag
+def api_serie_cliente(cod):
+    serie = obtener_matriz(*obtener_periodo(request.args)).serie(cod)
+    if serie is None:
+        return jsonify({'error': 'Cliente sin presupuesto ni pagos en el mes'}), 404
+    return jsonify({'cod': cod, **serie})
+
+
+@app.route('/api/clientes/serie', methods=['POST'])
+def api_serie_clientes():
+    # Suma de los clientes visibles en la tabla filtrada: una sola petición en lugar de una por cliente
+    datos = request.get_json(silent=True) or {}
+    anio, mes = obtener_periodo(datos)
+    codigos = datos.get('codigos')
+    if codigos is None:
+        # Tabla paginada: el navegador solo tiene una página, así que se manda la búsqueda
+        filtrada = _tabla_detalle(anio, mes).exportar(busqueda=datos.get('q', ''))
+        codigos = filtrada['COD_CLIENTE'].astype(str).tolist() if 'COD_CLIENTE' in filtrada.columns else []
+    return jsonify(obtener_matriz(anio, mes).suma(codigos))
+
+
+# --- CUBO DE CARTERA (consultas ad-hoc, ver cubo.py) ---
+# /api/cubo?dims=ciudad,jefatura&medidas=total,clientes&analista=DAVID DOMEC&orden=total&limite=20
+@app.route('/api/cubo')
+@con_etag
+def api_cubo():
+    cubo = obtener_cubo()
+    if cubo is None:
+        return jsonify({'error': 'No hay archivo maestro'}), 404
+    dimensiones = [d for d in request.args.get('dims', '').split(',') if d]
+    medidas = [m for m in request.args.get('medidas', '').split(',') if m] or None
+    # Filtros: ?<dimension>=valor (repetido para varios valores)
+    filtros = {nombre: request.args.getlist(nombre) for nombre in cubo.dimensiones if nombre in request.args}
+    try:
+        return jsonify(cubo.consultar(dimensiones, filtros, medidas, orden=request.args.get('orden') or None,
+                                      limite=request.args.get('limite', type=int)))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@app.route('/api/cubo/dimensiones')
+@con_etag
+def api_cubo_dimensiones():
+    cubo = obtener_cubo()
+    if cubo is None:
+        return jsonify({'error': 'No hay archivo maestro'}), 404
+    return jsonify({nombre: cubo.valores(nombre) for nombre in cubo.dimensiones})
+
+
+# --- AVISOS DE DATOS NUEVOS (SSE, ver eventos.py) ---
+@app.route('/api/eventos')
+def api_eventos():
+    # Al reconectar el navegador manda Last-Event-ID; la primera vez solo interesan los eventos nuevos
+    ultimo = request.headers.get('Last-Event-ID', type=int)
+    if ultimo is None:
+        ultimo = eventos.ultimo_id()
+    return Response(eventos.flujo(ultimo), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+# --- PRECARGA Y DISPONIBILIDAD ---
+@app.route('/listo')
+def listo():
+    # 200 cuando los datos ya están en memoria; 503 mientras se precargan
+    estado = precarga.estado()
+    return jsonify(estado), (200 if estado['listo'] else 503)
+
+
+# gunicorn.conf.py activa CARTERA_PRECARGA: el maestro carga los datos antes de crear los workers
+if os.environ.get('CARTERA_PRECARGA') == '1':
+    precarga.precargar()
+
 if __name__ == '__main__':
+    if not precarga.estado()['listo']:
+        precarga.en_segundo_plano()
     # Esto permite que Render asigne el puerto automáticamente
     port = int(os.environ.get("PORT", 5000))
     app.run(host='0.0.0.0', port=port)
\ No newline at end of file
@@ -0,0 +1,102 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+from cargador_datos import cargar_gestion, firma_archivo
+
+# --- ÍNDICE DE ATRIBUCIÓN PAGO -> ANALISTA (ranking de recaudo de /gestiones) ---
+# Un pago se acredita a la mejor gestión del mismo cliente en los VENTANA días anteriores
+# (0 = solo el mismo día): primero un contacto EFECTIVO, y entre varias, la más reciente.
+# Las gestiones se reducen a una por (cliente, día) y se guardan ordenadas por una clave entera
+# cliente * ESCALA_DIA + día; buscar el pago es un searchsorted (un merge_asof hacia atrás) sobre
+# ese arreglo. El índice se construye una vez por versión de gestion.zip.
+VENTANA_DIAS = max(int(os.environ.get('CARTERA_VENTANA_ATRIBUCION', 0)), 0)
+EXCLUIDOS = ['Jhon Polanco']
+SIN_GESTION = 'Sin Gestión'
+ESCALA_DIA = 100000  # días desde 1970: cabe hasta el año 2243
+
+_INDICES = {}
+_LOCK = threading.Lock()
+
+
+def codigo_entero(serie):
+    # Los códigos vienen como texto; los que no son numéricos quedan en -1 (nunca coinciden)
+    return pd.to_numeric(serie, errors='coerce').fillna(-1).to_numpy(dtype=np.int64)
+
+
+def dia_numero(fechas):
+    # Fecha -> días desde 1970 (NaT -> -1)
+    dias = fechas.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]').astype(np.int64)
+    return np.where(fechas.isna().to_numpy(), -1, dias)
+
+
+class IndiceAtribucion:
+    def __init__(self, claves_efectivas, analistas_efectivos, claves, analistas, nombres):
+        self._efectivas = (claves_efectivas, analistas_efectivos)
+        self._todas = (claves, analistas)
+        self.nombres = nombres  # código de analista -> nombre
+
+    @classmethod
+    def construir(cls, df_ges):
+        df = df_ges[~df_ges['USUARIO_GESTION'].isin(EXCLUIDOS)]
+        codigos = codigo_entero(df['CODIGO_CLIENTE'])
+        dias = dia_numero(df['FECHA_DT'])
+        validas = (codigos >= 0) & (dias >= 0)
+        clave = codigos[validas] * ESCALA_DIA + dias[validas]
+        efectiva = (df['CONTACTO'] == 'EFECTIVO').to_numpy()[validas]
+        analista, nombres = pd.factorize(df['USUARIO_GESTION'].astype(str).to_numpy()[validas])
+
+        # Una gestión por (cliente, día): la efectiva si hay; entre iguales, la primera registrada
+        orden = np.lexsort((np.arange(len(clave)), ~efectiva, clave))
+        clave, efectiva, analista = clave[orden], efectiva[orden], analista[orden]
+        primera = np.ones(len(clave), dtype=bool)
+        primera[1:] = clave[1:] != clave[:-1]
+
+        clave, efectiva, analista = clave[primera], efectiva[primera], analista[primera]
+        return cls(clave[efectiva], analista[efectiva], clave, analista, np.asarray(nombres, dtype=object))
+
+    @staticmethod
+    def _buscar(indice, claves_pago, ventana):
+        # Última gestión del mismo cliente con día <= día del pago y a no más de 'ventana' días
+        claves, analistas = indice
+        resultado = np.full(len(claves_pago), -1, dtype=np.int64)
+        if len(claves) == 0:
+            return resultado
+        posicion = np.searchsorted(claves, claves_pago, side='right') - 1
+        encontrada = posicion >= 0
+        candidata = claves[np.maximum(posicion, 0)]
+        encontrada &= (candidata // ESCALA_DIA == claves_pago // ESCALA_DIA) & (claves_pago - candidata <= ventana)
+        resultado[encontrada] = analistas[posicion[encontrada]]
+        return resultado
+
+    def atribuir(self, codigos_cliente, fechas_pago, ventana=None):
+        # Devuelve el nombre del analista acreditado por cada pago (SIN_GESTION si no hay)
+        # Una ventana negativa no encuentra ninguna gestión: se toma como 0
+        ventana = VENTANA_DIAS if ventana is None else max(ventana, 0)
+        codigos = codigo_entero(codigos_cliente)
+        dias = dia_numero(fechas_pago)
+        claves = codigos * ESCALA_DIA + dias
+        validas = (codigos >= 0) & (dias >= 0)
+
+        analista = np.full(len(claves), -1, dtype=np.int64)
+        analista[validas] = self._buscar(self._efectivas, claves[validas], ventana)
+        # Sin contacto efectivo en la ventana: la gestión más reciente, aunque no haya sido efectiva
+        faltan = validas & (analista < 0)
+        analista[faltan] = self._buscar(self._todas, claves[faltan], ventana)
+
+        nombres = np.append(self.nombres, SIN_GESTION)
+        return nombres[np.where(analista >= 0, analista, len(self.nombres))]
+
+
+def obtener_indice(ruta_gestion):
+    firma = firma_archivo(ruta_gestion)
+    with _LOCK:
+        entrada = _INDICES.get(ruta_gestion)
+    if entrada is not None and entrada[0] == firma:
+        return entrada[1]
+
+    indice = IndiceAtribucion.construir(cargar_gestion(ruta_gestion))
+    with _LOCK:
+        _INDICES[ruta_gestion] = (firma, indice)
+    return indice
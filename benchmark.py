@@ -0,0 +1,315 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import cargador_datos
+import procesador_dashboard
+from agregados import agregar_por_franja
+from app import app
+
+# --- BENCHMARK DE LAS VISTAS DEL DASHBOARD ---
+# Mide el tiempo de servidor de cada ruta con el cliente de pruebas de Flask, sobre los
+# archivos reales de data/. "frio" vacía la cache en memoria antes de cada petición
+# (incluye leer los archivos); "caliente" reutiliza los DataFrames ya cargados.
+#
+# --agregacion compara, sobre el maestro en memoria, el camino anterior de procesar_informacion
+# (pivot_table + groupby + merge por dimensión, vencido con apply fila por fila) contra la
+# agregación en un solo recorrido de agregados.py.
+#
+# --sintetico 1 5 50 genera datos con generador_datos.py a cada escala (en una carpeta temporal,
+# apuntando CARTERA_DATA a ella) y mide, en un proceso aparte por escala, cada etapa del
+# procesamiento (consolidar_pagos, procesar_todo, conversión de gestión, calcular_gestion,
+# procesar_informacion) y cada vista. Para cada medición guarda también el pico de memoria de
+# tracemalloc (asignaciones de Python y NumPy; los buffers de Arrow no aparecen) y, por escala, el
+# RSS máximo del proceso. --comparar base.json marca las mediciones que empeoraron más que
+# --tolerancia y termina con código 1, para correrlo antes de desplegar.
+#
+# Uso: python benchmark.py [--repeticiones 5] [--ruta /gestiones] [--agregacion] [--json salida.json]
+#      python benchmark.py --sintetico 1 10 --json actual.json [--comparar base.json]
+
+RUTAS = ['/gestiones']
+RUTAS_SINTETICAS = ['/', '/?vista=coca-cola', '/?vista=detalle_analisis', '/gestiones',
+                    '/api/clientes', '/api/gestiones/detalle']
+
+
+def medir(funcion, repeticiones, antes=None):
+    tiempos = []
+    for _ in range(repeticiones):
+        if antes is not None:
+            antes()
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return {
+        'min_ms': round(min(tiempos), 1),
+        'mediana_ms': round(statistics.median(tiempos), 1),
+        'media_ms': round(statistics.mean(tiempos), 1),
+    }
+
+
+def pico_memoria(funcion, antes=None):
+    # Pico de memoria (MB) de una ejecución, según tracemalloc
+    if antes is not None:
+        antes()
+    tracemalloc.start()
+    try:
+        funcion()
+        return round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def rss_maximo_mb():
+    # RSS máximo del proceso (no existe el módulo resource en Windows)
+    try:
+        import resource
+    except ImportError:
+        return None
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(maximo / (2**20 if sys.platform == 'darwin' else 2**10), 1)
+
+
+def medir_ruta(cliente, ruta, repeticiones, memoria=False):
+    def pedir():
+        respuesta = cliente.get(ruta)
+        if respuesta.status_code != 200:
+            raise RuntimeError(f"{ruta} respondió {respuesta.status_code}")
+
+    pedir()  # calentamiento (convierte gestion.zip a Feather si hace falta)
+    resultado = {
+        'frio': medir(pedir, repeticiones, antes=cargador_datos.invalidar),
+        'caliente': medir(pedir, repeticiones),
+    }
+    if memoria:
+        resultado['frio']['pico_mb'] = pico_memoria(pedir, antes=cargador_datos.invalidar)
+    return resultado
+
+
+# --- ETAPAS DEL PROCESAMIENTO (sobre la carpeta de CARTERA_DATA) ---
+def etapas():
+    # En orden: cada etapa usa lo que dejó la anterior en disco. Todas parten con la cache vacía.
+    import procesador_maestro
+    import procesador_pagos
+    from procesador_gestion import calcular_gestion
+
+    return [
+        ('consolidar_pagos', lambda: procesador_pagos.consolidar_pagos(completo=True)),
+        ('procesar_todo', lambda: procesador_maestro.procesar_todo(incremental=False)),
+        ('convertir_gestion', lambda: cargador_datos.convertir_gestion(forzar=True)),
+        ('calcular_gestion', lambda: calcular_gestion(cargador_datos.RUTA_CARTERA, cargador_datos.RUTA_GESTION)),
+    ] + [
+        (f'procesar_informacion[{vista}]', lambda vista=vista: procesador_dashboard.procesar_informacion(vista))
+        for vista in procesador_dashboard.VISTAS
+    ]
+
+
+def medir_carpeta(repeticiones):
+    # Corre en el proceso hijo de --sintetico, con CARTERA_DATA apuntando a los datos generados
+    resultados = {'etapas': {}, 'rutas': {}}
+    for nombre, funcion in etapas():
+        pico = pico_memoria(funcion, antes=cargador_datos.invalidar)  # también sirve de calentamiento
+        resultados['etapas'][nombre] = medir(funcion, repeticiones, antes=cargador_datos.invalidar)
+        resultados['etapas'][nombre]['pico_mb'] = pico
+
+    cliente = app.test_client()
+    for ruta in RUTAS_SINTETICAS:
+        resultados['rutas'][ruta] = medir_ruta(cliente, ruta, repeticiones, memoria=True)
+    resultados['rss_max_mb'] = rss_maximo_mb()
+    return resultados
+
+
+def medir_escala(escala, repeticiones, dias, conservar=False):
+    import generador_datos
+
+    carpeta = tempfile.mkdtemp(prefix=f'cartera_x{escala}_')
+    try:
+        inicio = time.perf_counter()
+        filas = generador_datos.generar(carpeta, escala=escala, dias=dias)
+        generacion_s = round(time.perf_counter() - inicio, 1)
+
+        # Proceso aparte: las rutas se fijan al importar y el RSS máximo es por proceso
+        salida = os.path.join(carpeta, 'resultado.json')
+        comando = [sys.executable, os.path.abspath(__file__), '--medir-carpeta',
+                   '--repeticiones', str(repeticiones), '--json', salida]
+        proceso = subprocess.run(comando, env={**os.environ, 'CARTERA_DATA': carpeta},
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        if proceso.returncode != 0:
+            raise RuntimeError(f"Falló la medición a escala {escala}:\n{proceso.stderr}")
+        with open(salida, 'r') as f:
+            resultado = json.load(f)
+    finally:
+        if conservar:
+            print(f"Datos de escala {escala} en {carpeta}")
+        else:
+            shutil.rmtree(carpeta, ignore_errors=True)
+
+    return {'escala': escala, 'filas': filas, 'generacion_s': generacion_s, **resultado}
+
+
+def metadatos():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'fecha': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'plataforma': platform.platform(),
+    }
+
+
+# --- COMPARACIÓN CONTRA UNA CORRIDA ANTERIOR ---
+def mediciones(escala):
+    # (nombre, mediana_ms, pico_mb) de cada etapa y ruta de una escala
+    for nombre, tiempos in escala.get('etapas', {}).items():
+        yield nombre, tiempos['mediana_ms'], tiempos.get('pico_mb')
+    for ruta, tiempos in escala.get('rutas', {}).items():
+        yield f"{ruta} (frío)", tiempos['frio']['mediana_ms'], tiempos['frio'].get('pico_mb')
+        yield f"{ruta} (caliente)", tiempos['caliente']['mediana_ms'], None
+
+
+def comparar(base, actual, tolerancia):
+    # Devuelve la lista de regresiones (tiempo o memoria por encima de base * (1 + tolerancia))
+    regresiones = []
+    for clave, escala in actual.get('escalas', {}).items():
+        previa = base.get('escalas', {}).get(clave)
+        if previa is None:
+            continue
+        anteriores = {nombre: (ms, mb) for nombre, ms, mb in mediciones(previa)}
+        for nombre, ms, mb in mediciones(escala):
+            if nombre not in anteriores:
+                continue
+            ms_base, mb_base = anteriores[nombre]
+            razon = ms / ms_base if ms_base else 1.0
+            marca = ''
+            if razon > 1 + tolerancia:
+                marca = '  <-- REGRESIÓN (tiempo)'
+                regresiones.append((clave, nombre, 'tiempo', razon))
+            if mb is not None and mb_base and mb / mb_base > 1 + tolerancia:
+                marca += '  <-- REGRESIÓN (memoria)'
+                regresiones.append((clave, nombre, 'memoria', mb / mb_base))
+            print(f"x{clave:<4} {nombre:<42} {ms_base:>10} -> {ms:>10} ms  ({razon:5.2f}x){marca}")
+    return regresiones
+
+
+def imprimir_escala(resultado):
+    print(f"--- escala x{resultado['escala']} {resultado['filas']} (RSS máx. {resultado['rss_max_mb']} MB)")
+    for nombre, tiempos in resultado['etapas'].items():
+        print(f"{nombre:<40} {tiempos['mediana_ms']:>10} ms   pico {tiempos['pico_mb']:>8} MB")
+    for ruta, tiempos in resultado['rutas'].items():
+        print(f"{ruta:<40} frío {tiempos['frio']['mediana_ms']:>8} ms   "
+              f"caliente {tiempos['caliente']['mediana_ms']:>8} ms   pico {tiempos['frio']['pico_mb']:>8} MB")
+
+
+def agregacion_pandas(df_pendientes, columna_franja):
+    # Referencia: lo que hacía procesar_informacion antes de agregados.py
+    df = df_pendientes.copy()
+    df['SALDO_ES_VENCIDO'] = df.apply(lambda x: x['TOTAL CARTERA'] if x['DIAS_MORA'] >= 1 else 0, axis=1)
+    resultados = {(): df.groupby(columna_franja, observed=True)['TOTAL CARTERA'].sum()}
+    for dims in procesador_dashboard.CONJUNTOS[:-1]:
+        dims = list(dims)
+        tabla = df.pivot_table(index=dims, columns=columna_franja, values='TOTAL CARTERA',
+                               aggfunc='sum', observed=True).fillna(0)
+        resumen = df.groupby(dims, observed=True).agg({'TOTAL CARTERA': 'sum', 'SALDO_ES_VENCIDO': 'sum'})
+        resultados[tuple(dims)] = tabla.merge(resumen, on=dims)
+    df.groupby('CIUDAD', observed=True)['TOTAL CARTERA'].sum()
+    df.groupby('CIUDAD', observed=True)['SALDO_ES_VENCIDO'].sum()
+    return resultados
+
+
+def agregacion_un_recorrido(df_pendientes, columna_franja):
+    df = df_pendientes.copy()
+    df['SALDO_ES_VENCIDO'] = np.where(df['DIAS_MORA'] >= 1, df['TOTAL CARTERA'], 0)
+    return agregar_por_franja(df, procesador_dashboard.CONJUNTOS, columna_franja,
+                              'TOTAL CARTERA', 'SALDO_ES_VENCIDO')
+
+
+def medir_agregacion(repeticiones):
+    df = cargador_datos.cargar_cartera(consumidor='dashboard')
+    df_pendientes = df[df['ESTADO'].astype(str).str.upper() == 'PENDIENTE']
+    resultados = {'filas': len(df_pendientes)}
+    for columna_franja in ['Franja Mora Cyres', 'Franja de Mora Coca-Cola']:
+        resultados[columna_franja] = {
+            'pandas': medir(lambda: agregacion_pandas(df_pendientes, columna_franja), repeticiones),
+            'un_recorrido': medir(lambda: agregacion_un_recorrido(df_pendientes, columna_franja), repeticiones),
+        }
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de las rutas del dashboard")
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--ruta', action='append', help="Ruta a medir (se puede repetir)")
+    parser.add_argument('--agregacion', action='store_true', help="Medir también la agregación del tablero")
+    parser.add_argument('--json', help="Archivo donde guardar los resultados")
+    parser.add_argument('--sintetico', type=int, nargs='+', metavar='ESCALA',
+                        help="Medir etapas y vistas sobre datos sintéticos a estas escalas (1 a 50)")
+    parser.add_argument('--dias', type=int, default=22, help="Archivos diarios de los datos sintéticos")
+    parser.add_argument('--conservar', action='store_true', help="No borrar los datos sintéticos")
+    parser.add_argument('--comparar', help="JSON de una corrida anterior con --sintetico")
+    parser.add_argument('--tolerancia', type=float, default=0.2, help="Empeoramiento aceptado (0.2 = 20%%)")
+    parser.add_argument('--medir-carpeta', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir_carpeta:
+        with open(args.json, 'w') as f:
+            json.dump(medir_carpeta(args.repeticiones), f, indent=2)
+        return
+
+    if args.sintetico:
+        resultados = {'meta': metadatos(), 'escalas': {}}
+        for escala in args.sintetico:
+            resultado = medir_escala(escala, args.repeticiones, args.dias, conservar=args.conservar)
+            resultados['escalas'][str(escala)] = resultado
+            imprimir_escala(resultado)
+
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(resultados, f, indent=2)
+
+        if args.comparar:
+            with open(args.comparar, 'r') as f:
+                base = json.load(f)
+            print(f"--- comparación contra {args.comparar} (commit {base.get('meta', {}).get('commit')})")
+            regresiones = comparar(base, resultados, args.tolerancia)
+            if regresiones:
+                print(f"{len(regresiones)} regresión(es) por encima del {args.tolerancia:.0%}")
+                sys.exit(1)
+        return
+
+    cliente = app.test_client()
+    resultados = {}
+    if args.agregacion:
+        resultados['agregacion'] = medir_agregacion(args.repeticiones)
+        for columna_franja, tiempos in resultados['agregacion'].items():
+            if columna_franja != 'filas':
+                print(f"agregación {columna_franja:<29} pandas {tiempos['pandas']['mediana_ms']:>8} ms   "
+                      f"un recorrido {tiempos['un_recorrido']['mediana_ms']:>8} ms")
+
+    for ruta in args.ruta or RUTAS:
+        resultados[ruta] = medir_ruta(cliente, ruta, args.repeticiones)
+        print(f"{ruta:<40} frío {resultados[ruta]['frio']['mediana_ms']:>8} ms   "
+              f"caliente {resultados[ruta]['caliente']['mediana_ms']:>8} ms")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(resultados, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,398 @@
+import os
+import copy
+import glob
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from functools import cached_property
+import numpy as np
+import pandas as pd
+
+from cargador_datos import cargar_gestion, firma_archivo
+
+try:
+    import fcntl
+except ImportError:  # Windows (desarrollo local): solo queda el candado entre hilos
+    fcntl = None
+
+# --- BITÁCORA DE GESTIONES E ÍNDICE INCREMENTAL POR CLIENTE ---
+# gestion.zip es una exportación que durante el mes solo crece. Cada versión nueva se compara con
+# lo ya ingerido y solo las filas nuevas se agregan como un lote a la bitácora
+# (data/gestion_bitacora/lotes, solo se agrega) y actualizan el índice persistido:
+# - ultimo: por cliente y por (analista, cliente), fecha más reciente y CONTACTO de la última
+#   gestión con contacto. El orden es (FECHA_DT, SECUENCIA) con las gestiones sin fecha al final,
+#   como el sort_values original; entre gestiones del mismo día gana la última registrada. El
+#   original las desempataba con un quicksort inestable (arbitrario, igual que en atribucion.py):
+#   el cambio es deliberado y puede mover el CONTACTO de clientes con varias gestiones en su
+#   último día.
+# - mejor: por (analista, día, cliente), el mejor contacto (EFECTIVO > NO EFECTIVO > otro);
+#   las gestiones sin fecha cuentan como un día más, igual que en el cálculo original.
+# - gestiones: número de gestiones por analista.
+# - hoy: contadores por analista de hoy (la fecha que usa calcular_gestion) y su ranking ya
+#   ordenado (AcumuladorDia). Al cambiar el día se rehace una vez con las gestiones de esa fecha.
+# ultimo y mejor solo tocan las claves de las filas nuevas, así el costo de una carga nueva va con
+# las filas nuevas (más copiar el índice, no ordenar ni agrupar la historia) y /gestiones lee el
+# índice. Si la exportación solo creció (se comprueba en una muestra de las filas ya ingeridas)
+# las filas nuevas son las del final; si no, se comparan las claves de todas las filas y, si faltan
+# filas ya ingeridas (empezó otro mes), la bitácora se reinicia.
+# Los workers de gunicorn y la cola de trabajos comparten la carpeta: leer lo publicado, ingerir y
+# publicar se hace bajo un candado de archivo (indice.lock), así uno solo ingiere cada versión y
+# los demás leen su índice; indice.pkl y los lotes se escriben con temporal + os.replace.
+VERSION_INDICE = 5
+COLUMNAS_CLAVE = ['NIT', 'CODIGO_CLIENTE', 'USUARIO_GESTION', 'ACCION', 'CONTACTO', 'FECHA_DT']
+ORDEN_CONTACTO = {'EFECTIVO': 1, 'NO EFECTIVO': 2}  # cualquier otro resultado: 3
+MUESTRA_PREFIJO = 256
+SIN_FECHA = np.iinfo(np.int64).max  # las gestiones sin fecha van al final del orden
+
+_INDICES = {}
+_LOCK = threading.Lock()
+
+
+def rutas_bitacora(ruta_gestion):
+    carpeta = os.path.splitext(ruta_gestion)[0] + '_bitacora'
+    return os.path.join(carpeta, 'lotes'), os.path.join(carpeta, 'indice.pkl')
+
+
+def contenido_filas(df):
+    return pd.util.hash_pandas_object(df[COLUMNAS_CLAVE], index=False).to_numpy()
+
+
+def _claves(contenido, repeticion):
+    return pd.util.hash_pandas_object(pd.DataFrame({'c': contenido, 'r': repeticion}), index=False).to_numpy()
+
+
+def claves_filas(df):
+    # Filas idénticas (misma gestión registrada dos veces) se distinguen por su número de repetición
+    contenido = contenido_filas(df)
+    repeticion = pd.Series(contenido).groupby(contenido).cumcount().to_numpy()
+    return _claves(contenido, repeticion)
+
+
+def _orden_contacto(contacto):
+    return contacto.astype(object).map(ORDEN_CONTACTO).fillna(3).astype(np.int8)
+
+
+class AcumuladorDia:
+    # Contadores por analista de un solo día (hoy). Cada gestión nueva de ese día los actualiza en
+    # O(1); las de otras fechas no cuentan.
+    def __init__(self, fecha=None):
+        self.fecha = fecha
+        self.gestiones = {}  # analista -> gestiones del día
+        self.efectivos = {}  # analista -> gestiones con contacto EFECTIVO
+        self.clientes = {}  # analista -> clientes distintos gestionados
+        self.mejor = {}  # (analista, cliente) -> mejor ORDEN_CONTACTO del día
+        self.ranking = []
+
+    def agregar(self, filas):
+        # filas: (fecha, analista, cliente, contacto) en el orden de la exportación
+        for fecha, analista, cliente, contacto in filas:
+            if fecha != self.fecha:
+                continue
+            self.gestiones[analista] = self.gestiones.get(analista, 0) + 1
+            self.efectivos[analista] = self.efectivos.get(analista, 0) + (contacto == 'EFECTIVO')
+            self.clientes.setdefault(analista, set()).add(cliente)
+            orden = ORDEN_CONTACTO.get(contacto, 3)
+            self.mejor[(analista, cliente)] = min(orden, self.mejor.get((analista, cliente), orden))
+        self.ranking = self._ordenar()
+
+    def _ordenar(self):
+        clientes_efectivos = {}
+        for (analista, _), orden in self.mejor.items():
+            clientes_efectivos[analista] = clientes_efectivos.get(analista, 0) + (orden == 1)
+        filas = [{
+            'USUARIO_GESTION': analista,
+            'clientes_unicos': len(self.clientes[analista]),
+            'gestiones_totales': total,
+            'efectivos': self.efectivos[analista],
+            # Efectivos / gestiones totales
+            'porc_efec': float(np.round(self.efectivos[analista] / total * 100, 1)),
+            'clientes_efectivos': clientes_efectivos.get(analista, 0),
+        } for analista, total in sorted(self.gestiones.items())]
+        # Por efectividad, de mayor a menor (entre iguales, por nombre)
+        return sorted(filas, key=lambda f: -f['porc_efec'])
+
+    @classmethod
+    def desde(cls, df, fecha):
+        # Acumulador de fecha con todas las gestiones de ese día (al cambiar de día)
+        acumulador = cls(fecha)
+        acumulador.agregar(_filas_dia(df, fecha))
+        return acumulador
+
+
+def _filas_dia(df, fecha):
+    # El ranking (como el groupby original) no cuenta gestiones sin analista
+    del_dia = df[(df['FECHA_DT'].dt.normalize() == pd.Timestamp(fecha)) & df['USUARIO_GESTION'].notna()]
+    return zip(del_dia['FECHA_DT'].dt.date, del_dia['USUARIO_GESTION'].astype(object),
+               del_dia['CODIGO_CLIENTE'].astype(str), del_dia['CONTACTO'].astype(object))
+
+
+def _ultimo_vacio(claves):
+    indice = pd.MultiIndex.from_arrays([pd.Index([], dtype=object)] * len(claves), names=claves) if len(claves) > 1 \
+        else pd.Index([], dtype=object, name=claves[0])
+    return pd.DataFrame({'FECHA_DT': pd.Series(dtype='datetime64[us]'), 'CONTACTO': pd.Series(dtype=object),
+                         'ORDEN_FECHA': pd.Series(dtype='int64'), 'SECUENCIA': pd.Series(dtype='int64')}, index=indice)
+
+
+def _ultimas(filas, claves):
+    # Por clave, solo con las filas nuevas: fecha más reciente y la última gestión con contacto
+    fecha = filas.groupby(claves, sort=False)['FECHA_DT'].max()
+    con_contacto = filas[filas['CONTACTO'].notna()].sort_values(['ORDEN_FECHA', 'SECUENCIA'], kind='stable')
+    contacto = (con_contacto.drop_duplicates(claves, keep='last').set_index(claves)[['CONTACTO', 'ORDEN_FECHA', 'SECUENCIA']]
+                .astype({'ORDEN_FECHA': 'Int64', 'SECUENCIA': 'Int64'}))  # sin pasar por float al unir
+    ultimas = pd.DataFrame({'FECHA_DT': fecha}).join(contacto)
+    # Sin gestión con contacto: pierde contra cualquiera que lo tenga
+    ultimas['ORDEN_FECHA'] = ultimas['ORDEN_FECHA'].fillna(np.iinfo(np.int64).min).astype('int64')
+    ultimas['SECUENCIA'] = ultimas['SECUENCIA'].fillna(-1).astype('int64')
+    ultimas['CONTACTO'] = ultimas['CONTACTO'].astype(object)
+    return ultimas
+
+
+def _fusionar_ultimo(actual, nuevo):
+    # Solo se comparan las claves que tocan las filas nuevas; el resto del índice se copia tal cual
+    en_actual = nuevo.index.isin(actual.index)
+    reciente = nuevo[en_actual]
+    previo = actual.reindex(reciente.index)
+    gana = ((reciente['ORDEN_FECHA'] > previo['ORDEN_FECHA'])
+            | ((reciente['ORDEN_FECHA'] == previo['ORDEN_FECHA']) & (reciente['SECUENCIA'] > previo['SECUENCIA'])))
+    combinado = pd.DataFrame({c: np.where(gana, reciente[c], previo[c]) for c in ['CONTACTO', 'ORDEN_FECHA', 'SECUENCIA']},
+                             index=reciente.index)
+    combinado.insert(0, 'FECHA_DT', np.fmax(previo['FECHA_DT'].to_numpy(), reciente['FECHA_DT'].to_numpy()))
+    return pd.concat([actual[~actual.index.isin(reciente.index)], combinado, nuevo[~en_actual]])
+
+
+class IndiceGestion:
+    def __init__(self, firma, claves, contenido, ultimo, ultimo_analista, mejor, gestiones, hoy):
+        self.firma = firma  # firma de gestion.zip ingerida
+        self.claves = claves  # uint64 ordenado: filas ya ingeridas
+        self.contenido = contenido  # uint64 en orden de SECUENCIA: hash de cada fila ingerida
+        self.ultimo = ultimo  # por CODIGO_CLIENTE
+        self.ultimo_analista = ultimo_analista  # por (USUARIO_GESTION, CODIGO_CLIENTE)
+        self.mejor = mejor  # (analista, día, cliente) -> mejor ORDEN_CONTACTO (None si falta)
+        self.gestiones = gestiones  # USUARIO_GESTION -> número de gestiones
+        self.hoy = hoy  # AcumuladorDia de hoy
+
+    @classmethod
+    def vacio(cls):
+        return cls(None, np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.uint64),
+                   _ultimo_vacio(['CODIGO_CLIENTE']), _ultimo_vacio(['USUARIO_GESTION', 'CODIGO_CLIENTE']),
+                   {}, pd.Series(dtype='int64'), AcumuladorDia())
+
+    @cached_property
+    def mejor_dia(self):
+        # Tabla de mejor, armada al primer uso (no al ingerir ni al guardar)
+        claves = list(self.mejor)
+        return pd.DataFrame({
+            'USUARIO_GESTION': pd.Series([c[0] for c in claves], dtype=object),
+            'SOLO_FECHA': pd.to_datetime(pd.Series([c[1] for c in claves], dtype=object)).astype('datetime64[us]'),
+            'CODIGO_CLIENTE': pd.Series([c[2] for c in claves], dtype='str'),
+            'ORDEN_CONTACTO': pd.Series(list(self.mejor.values()), dtype='int8'),
+        })
+
+    @property
+    def filas(self):
+        return len(self.claves)
+
+    def presentes(self, claves):
+        # Máscara de las claves que ya están en la bitácora
+        if not len(self.claves):
+            return np.zeros(len(claves), dtype=bool)
+        posicion = np.minimum(np.searchsorted(self.claves, claves), len(self.claves) - 1)
+        return self.claves[posicion] == claves
+
+    def es_continuacion(self, df):
+        # La exportación solo creció: las filas ingeridas siguen en sus posiciones. Se comprueba en
+        # una muestra (con la primera y la última) en lugar de volver a hashear toda la historia
+        if not self.filas or len(df) < self.filas:
+            return False
+        posiciones = np.unique(np.linspace(0, self.filas - 1, MUESTRA_PREFIJO).astype(np.int64))
+        return np.array_equal(contenido_filas(df.iloc[posiciones]), self.contenido[posiciones])
+
+    def claves_nuevas(self, contenido):
+        # Claves de filas que siguen a la bitácora: la repetición continúa la de las filas idénticas
+        # ya ingeridas (se prueba 0, 1, ... por contenido distinto, solo con las filas nuevas)
+        distintos = np.unique(contenido)
+        previas = np.zeros(len(distintos), dtype=np.int64)
+        pendientes = np.ones(len(distintos), dtype=bool)
+        while pendientes.any():
+            pendientes[pendientes] = self.presentes(_claves(distintos[pendientes], previas[pendientes]))
+            previas[pendientes] += 1
+        repeticion = previas[np.searchsorted(distintos, contenido)] + \
+            pd.Series(contenido).groupby(contenido).cumcount().to_numpy()
+        return _claves(contenido, repeticion)
+
+    def agregar(self, nuevas, claves, contenido, firma):
+        # nuevas: filas de gestión aún no ingeridas (con SECUENCIA), en el orden de la exportación
+        fecha = nuevas['FECHA_DT']
+        filas = pd.DataFrame({
+            'CODIGO_CLIENTE': nuevas['CODIGO_CLIENTE'].astype(str),
+            'USUARIO_GESTION': nuevas['USUARIO_GESTION'].astype(object),
+            'FECHA_DT': fecha,
+            'CONTACTO': nuevas['CONTACTO'].astype(object),
+            'ORDEN_FECHA': np.where(fecha.isna(), SIN_FECHA, fecha.to_numpy().view(np.int64)),
+            'SECUENCIA': nuevas['SECUENCIA'].to_numpy(dtype=np.int64),
+        })
+        ultimo = _fusionar_ultimo(self.ultimo, _ultimas(filas, ['CODIGO_CLIENTE']))
+        # Las gestiones sin analista cuentan para el cliente pero no para ningún analista
+        ultimo_analista = _fusionar_ultimo(self.ultimo_analista, _ultimas(filas, ['USUARIO_GESTION', 'CODIGO_CLIENTE']))
+
+        # Mejor contacto del día: se agrupan las filas nuevas y se combinan con min, clave por clave.
+        # dropna=False: las gestiones sin fecha (o sin analista) se conservan como en el original
+        dia = (pd.DataFrame({'USUARIO_GESTION': filas['USUARIO_GESTION'], 'SOLO_FECHA': fecha.dt.normalize(),
+                             'CODIGO_CLIENTE': filas['CODIGO_CLIENTE'], 'ORDEN_CONTACTO': _orden_contacto(nuevas['CONTACTO'])})
+               .groupby(['USUARIO_GESTION', 'SOLO_FECHA', 'CODIGO_CLIENTE'], sort=False, dropna=False)['ORDEN_CONTACTO'].min())
+        analistas = dia.index.get_level_values('USUARIO_GESTION').astype(object)
+        dias = dia.index.get_level_values('SOLO_FECHA').astype(object)
+        mejor = dict(self.mejor)
+        for clave, orden in zip(zip(analistas.where(analistas.notna(), None), dias.where(dias.notna(), None),
+                                    dia.index.get_level_values('CODIGO_CLIENTE')), dia.to_numpy().tolist()):
+            mejor[clave] = min(orden, mejor.get(clave, 3))
+
+        gestiones = self.gestiones.add(filas['USUARIO_GESTION'].value_counts(), fill_value=0).astype('int64')
+
+        # Solo recorren el acumulador las filas nuevas de hoy
+        hoy = copy.deepcopy(self.hoy)
+        if hoy.fecha is not None:
+            hoy.agregar(_filas_dia(nuevas, hoy.fecha))
+
+        claves = np.sort(claves)
+        claves = np.insert(self.claves, np.searchsorted(self.claves, claves), claves)
+        return IndiceGestion(firma, claves, np.concatenate([self.contenido, contenido]), ultimo, ultimo_analista,
+                             mejor, gestiones, hoy)
+
+    def ultima_gestion(self, analista='Todos'):
+        # Por cliente: CONTACTO y FECHA_DT de su gestión más reciente (de ese analista, si se filtra)
+        if analista == 'Todos':
+            return self.ultimo[['CONTACTO', 'FECHA_DT']]
+        propias = self.ultimo_analista[self.ultimo_analista.index.get_level_values('USUARIO_GESTION') == analista]
+        return propias.droplevel('USUARIO_GESTION')[['CONTACTO', 'FECHA_DT']]
+
+    def ranking_dia(self, fecha, analista='Todos'):
+        # Ranking ya calculado al ingerir; vacío si no hay gestiones de esa fecha (o no es hoy)
+        if self.hoy.fecha != fecha:
+            return []
+        if analista == 'Todos':
+            return self.hoy.ranking
+        return [fila for fila in self.hoy.ranking if fila['USUARIO_GESTION'] == analista]
+
+    def mejor_gestion_dia(self, analista='Todos'):
+        # Una fila por (analista, día, cliente) con su mejor contacto
+        mejor = self.mejor_dia if analista == 'Todos' else self.mejor_dia[self.mejor_dia['USUARIO_GESTION'] == analista]
+        return mejor.assign(ES_EFECTIVO=mejor['ORDEN_CONTACTO'] == 1)
+
+
+def _leer_lotes(carpeta):
+    archivos = sorted(glob.glob(os.path.join(carpeta, '*.feather')))
+    if not archivos:
+        return None
+    return pd.concat([pd.read_feather(a) for a in archivos], ignore_index=True)
+
+
+def _cargar_persistido(ruta_gestion):
+    carpeta, ruta_indice = rutas_bitacora(ruta_gestion)
+    try:
+        estado = pd.read_pickle(ruta_indice)
+        if estado.get('version') == VERSION_INDICE:
+            return estado['indice']
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Índice de gestión ilegible, se reconstruye desde la bitácora: {e}")
+
+    # Sin índice (o de otra versión): se rehace con los lotes ya guardados, sin releer gestion.zip
+    lotes = _leer_lotes(carpeta)
+    if lotes is None:
+        return None
+    return IndiceGestion.vacio().agregar(lotes, claves_filas(lotes), contenido_filas(lotes), None)
+
+
+def _guardar(indice, ruta_gestion):
+    _, ruta_indice = rutas_bitacora(ruta_gestion)
+    temporal = ruta_indice + '.tmp'
+    pd.to_pickle({'version': VERSION_INDICE, 'indice': indice}, temporal)
+    os.replace(temporal, ruta_indice)
+
+
+@contextmanager
+def _candado_archivo(ruta_gestion):
+    carpeta = os.path.dirname(rutas_bitacora(ruta_gestion)[1])
+    os.makedirs(carpeta, exist_ok=True)
+    with open(os.path.join(carpeta, 'indice.lock'), 'a') as archivo:
+        if fcntl is not None:
+            fcntl.flock(archivo, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(archivo, fcntl.LOCK_UN)
+
+
+def _ingerir(indice, ruta_gestion, firma, hoy):
+    carpeta, _ = rutas_bitacora(ruta_gestion)
+    df = cargar_gestion(ruta_gestion)
+
+    if indice is not None and indice.es_continuacion(df):
+        # Caso normal: las filas nuevas son las del final, solo ellas se hashean
+        nuevas = df.iloc[indice.filas:].copy()
+        contenido = contenido_filas(nuevas)
+        claves = indice.claves_nuevas(contenido)
+    else:
+        contenido_df = contenido_filas(df)
+        claves_df = claves_filas(df)
+        presentes = indice.presentes(claves_df) if indice is not None else np.zeros(len(df), dtype=bool)
+        if indice is None or presentes.sum() < indice.filas:
+            # Faltan filas ya ingeridas: es otra exportación (otro mes); la bitácora empieza de nuevo
+            if indice is not None:
+                print("gestion.zip ya no contiene la historia ingerida: se reinicia la bitácora")
+            for archivo in glob.glob(os.path.join(carpeta, '*.feather')):
+                os.remove(archivo)
+            indice = IndiceGestion.vacio()
+            presentes = np.zeros(len(df), dtype=bool)
+        nuevas = df[~presentes].copy()
+        contenido, claves = contenido_df[~presentes], claves_df[~presentes]
+
+    nuevas['SECUENCIA'] = np.arange(indice.filas, indice.filas + len(nuevas), dtype=np.int64)
+    if len(nuevas):
+        # El nombre del lote es su primera SECUENCIA: dos workers que ingieren lo mismo escriben el mismo archivo
+        os.makedirs(carpeta, exist_ok=True)
+        ruta_lote = os.path.join(carpeta, f"{indice.filas:09d}.feather")
+        nuevas.reset_index(drop=True).to_feather(ruta_lote + '.tmp')
+        os.replace(ruta_lote + '.tmp', ruta_lote)
+
+    indice = indice.agregar(nuevas, claves, contenido, firma)
+    if indice.hoy.fecha != hoy:
+        indice.hoy = AcumuladorDia.desde(df, hoy)
+    _guardar(indice, ruta_gestion)
+    return indice
+
+
+def _cambiar_dia(indice, ruta_gestion, hoy):
+    # Misma versión de gestion.zip, otro día: solo se rehace el acumulador
+    indice = copy.copy(indice)
+    indice.hoy = AcumuladorDia.desde(cargar_gestion(ruta_gestion), hoy)
+    _guardar(indice, ruta_gestion)
+    return indice
+
+
+def obtener_indice(ruta_gestion, hoy=None):
+    # hoy: fecha del ranking del día (por defecto, la de hoy)
+    hoy = hoy or datetime.now().date()
+    firma = firma_archivo(ruta_gestion)
+    if firma is None:
+        return None
+    with _LOCK:
+        indice = _INDICES.get(ruta_gestion)
+        if indice is None or indice.firma != firma or indice.hoy.fecha != hoy:
+            with _candado_archivo(ruta_gestion):
+                # Otro proceso pudo haber ingerido esta versión mientras se esperaba el candado
+                persistido = _cargar_persistido(ruta_gestion)
+                if persistido is not None:
+                    indice = persistido
+                firma = firma_archivo(ruta_gestion)
+                if firma is None:
+                    return None
+                if indice is None or indice.firma != firma:
+                    indice = _ingerir(indice, ruta_gestion, firma, hoy)
+                elif indice.hoy.fecha != hoy:
+                    indice = _cambiar_dia(indice, ruta_gestion, hoy)
+            _INDICES[ruta_gestion] = indice
+        return indice
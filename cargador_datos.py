@@ -0,0 +1,198 @@
+import os
+import json
+import threading
+import pandas as pd
+
+import esquema
+import metricas
+
+# --- RUTAS DE ARCHIVOS COMPARTIDAS ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# CARTERA_DATA permite apuntar a otra carpeta de datos (p. ej. los datos sintéticos del benchmark)
+RUTA_DATA = os.environ.get('CARTERA_DATA', os.path.join(BASE_DIR, 'data'))
+RUTA_CARTERA = os.path.join(RUTA_DATA, 'Proyectadoconsolidado.csv')
+RUTA_PAGOS = os.path.join(RUTA_DATA, 'PagosConsolidado.csv')
+RUTA_GESTION = os.path.join(RUTA_DATA, 'gestion.zip')
+RUTA_SNAPSHOT = os.path.join(RUTA_DATA, 'snapshot_dashboard.pkl')
+
+# Los tipos y las columnas que lee cada consumidor están en esquema.py
+
+# Cache en memoria del proceso: (ruta, consumidor) -> (firma del archivo, DataFrame limpio)
+# Los DataFrames que se entregan son compartidos entre peticiones: NO modificarlos en sitio,
+# filtrar o hacer .copy() antes de agregar columnas.
+_CACHE = {}
+_LOCK = threading.Lock()
+
+
+def firma_archivo(ruta):
+    # (mtime en ns, tamaño): si cualquiera cambia, el archivo se vuelve a leer
+    try:
+        info = os.stat(ruta)
+        return (info.st_mtime_ns, info.st_size)
+    except OSError:
+        return None
+
+
+def invalidar(ruta=None):
+    # Se llama al terminar procesar_todo / consolidar_pagos para no depender de la resolución del mtime
+    with _LOCK:
+        if ruta is None:
+            _CACHE.clear()
+        else:
+            for clave in [c for c in _CACHE if c[0] == ruta]:
+                del _CACHE[clave]
+
+
+def _obtener(ruta, cargador, consumidor=None):
+    # Cada consumidor tiene su propia proyección de columnas, cacheada por separado
+    firma = firma_archivo(ruta)
+    if firma is None:
+        return None
+
+    clave = (ruta, consumidor)
+    archivo = os.path.basename(ruta)
+    with _LOCK:
+        entrada = _CACHE.get(clave)
+    if entrada is not None and entrada[0] == firma:
+        metricas.contar('cartera_cache_total', archivo=archivo, resultado='acierto')
+        return entrada[1]
+
+    metricas.contar('cartera_cache_total', archivo=archivo, resultado='fallo')
+    with metricas.etapa(f"carga.{archivo}"):
+        df = cargador(ruta, consumidor) if consumidor is not None else cargador(ruta)
+    metricas.contar('cartera_bytes_leidos_total', firma[1], archivo=archivo)
+    if isinstance(df, pd.DataFrame):
+        metricas.contar('cartera_filas_total', len(df), etapa=f"carga.{archivo}")
+    with _LOCK:
+        _CACHE[clave] = (firma, df)
+    return df
+
+
+def _leer_cartera(ruta, consumidor=None):
+    cronometro = metricas.Cronometro('cartera')
+    compresion = 'zip' if ruta.endswith('.zip') else None
+    encabezados = pd.read_csv(ruta, sep=';', encoding='latin1', compression=compresion, nrows=0).columns
+    df = pd.read_csv(ruta, sep=';', encoding='latin1', compression=compresion,
+                     usecols=esquema.columnas_a_leer(consumidor),
+                     dtype=esquema.tipos_lectura(encabezados))
+    cronometro.marca('lectura_csv')
+
+    # LIMPIEZA TOTAL DE COLUMNAS
+    df.columns = df.columns.str.strip()
+
+    # Estandarización de la columna Administrador
+    col_admin_real = 'ADMINISTRADO POR'
+    if col_admin_real not in df.columns:
+        posibles = [c for c in df.columns if 'ADMINISTRADO' in c.upper()]
+        if posibles:
+            df = df.rename(columns={posibles[0]: col_admin_real})
+        elif consumidor is None or 'ADMINISTRADO POR' in esquema.PROYECCIONES[consumidor]:
+            df[col_admin_real] = 'NO ASIGNADO'
+
+    # Montos int64, NIT/COD. CLIENTE como texto sin el .0, categorías y fechas (ver esquema.py)
+    df = esquema.aplicar_tipos(df)
+
+    # Fecha de vencimiento ya convertida (el maestro la trae como dd.mm.yyyy)
+    if 'Fecha_Vencimiento' in df.columns:
+        vto = pd.to_datetime(df['Fecha_Vencimiento'], format='%d.%m.%Y', errors='coerce')
+        if vto.isna().all():
+            vto = pd.to_datetime(df['Fecha_Vencimiento'], errors='coerce')
+        df['VTO_FECHA_DT'] = vto
+
+    cronometro.marca('limpieza')
+    return df
+
+
+def _leer_pagos(ruta):
+    encabezados = pd.read_csv(ruta, sep=';', encoding='latin1', nrows=0).columns
+    tipos = {c: 'Int64' for c in encabezados if c.strip() in esquema.PAGOS_CODIGOS}
+    tipos.update({c: 'category' for c in encabezados if c.strip() in esquema.PAGOS_CATEGORIAS})
+    df = pd.read_csv(ruta, sep=';', encoding='latin1', dtype=tipos)
+    df.columns = df.columns.str.strip()
+
+    if 'COD. CLIENTE' in df.columns:
+        df['COD. CLIENTE'] = esquema.codigo_texto(df['COD. CLIENTE'])
+    if 'VALOR PAGADO' in df.columns:
+        df['VALOR PAGADO'] = pd.to_numeric(df['VALOR PAGADO'], errors='coerce').fillna(0)
+    if 'FECHA PAGO' in df.columns:
+        df['FECHA_PAGO_DT'] = pd.to_datetime(df['FECHA PAGO'], dayfirst=True, errors='coerce')
+
+    return df
+
+
+def cargar_cartera(ruta=RUTA_CARTERA, consumidor=None):
+    # consumidor: 'dashboard', 'gestion' o 'detalle' (solo sus columnas, ver esquema.PROYECCIONES)
+    return _obtener(ruta, _leer_cartera, consumidor)
+
+
+def cargar_pagos(ruta=RUTA_PAGOS):
+    return _obtener(ruta, _leer_pagos)
+
+
+def cargar_snapshot(ruta=None):
+    return _obtener(ruta or RUTA_SNAPSHOT, pd.read_pickle)
+
+
+def cargar_archivo(ruta, cargador, consumidor=None):
+    # Cualquier otro archivo derivado (p. ej. las particiones del histórico) con el mismo cache por
+    # firma; cargador(ruta) o cargador(ruta, consumidor)
+    return _obtener(ruta, cargador, consumidor)
+
+
+# --- GESTIÓN: CONVERSIÓN ÚNICA DEL ZIP A FEATHER ---
+def _rutas_columnar(ruta_gestion):
+    base = os.path.splitext(ruta_gestion)[0]
+    return base + '.feather', base + '.feather.json'
+
+
+def convertir_gestion(ruta_gestion=RUTA_GESTION, forzar=False):
+    # Descomprime gestion.zip una sola vez y lo guarda tipado en Feather (columnar).
+    # Solo se reconstruye si cambia la firma (mtime/tamaño) del zip.
+    ruta_feather, ruta_firma = _rutas_columnar(ruta_gestion)
+    firma = firma_archivo(ruta_gestion)
+    if firma is None:
+        return None
+
+    if not forzar and os.path.exists(ruta_feather) and os.path.exists(ruta_firma):
+        try:
+            with open(ruta_firma, 'r') as f:
+                if tuple(json.load(f)['firma']) == firma:
+                    return ruta_feather
+        except Exception as e:
+            print(f"Firma de gestión ilegible, se reconstruye: {e}")
+
+    compresion = 'zip' if ruta_gestion.endswith('.zip') else None
+    df = pd.read_csv(ruta_gestion, sep=';', encoding='latin1', compression=compresion,
+                     usecols=lambda c: c.strip() in esquema.GESTION_COLUMNAS)
+    df.columns = df.columns.str.strip()
+
+    df['CODIGO_CLIENTE'] = df['CODIGO_CLIENTE'].astype(str).str.replace(r'\.0$', '', regex=True).str.strip()
+    df['NIT'] = df['NIT'].astype(str).str.replace(r'\.0$', '', regex=True).str.strip()
+
+    # Forzamos Día/Mes/Año para que 10/01 no sea 01/10; dayfirst como respaldo
+    fecha = pd.to_datetime(df['FECHA_GESTION'], format='%d/%m/%Y', errors='coerce')
+    if fecha.isnull().all():
+        fecha = pd.to_datetime(df['FECHA_GESTION'], dayfirst=True, errors='coerce')
+    df['FECHA_DT'] = fecha
+    df = df.drop(columns=['FECHA_GESTION'])
+
+    for col in esquema.GESTION_CATEGORIAS:
+        df[col] = df[col].astype('category')
+
+    # Escritura atómica: los lectores nunca ven un archivo a medias
+    temporal = ruta_feather + '.tmp'
+    df.reset_index(drop=True).to_feather(temporal)
+    os.replace(temporal, ruta_feather)
+    with open(ruta_firma, 'w') as f:
+        json.dump({'firma': list(firma), 'filas': len(df)}, f)
+
+    return ruta_feather
+
+
+def _leer_gestion(ruta):
+    ruta_feather = convertir_gestion(ruta)
+    return pd.read_feather(ruta_feather)
+
+
+def cargar_gestion(ruta=RUTA_GESTION):
+    return _obtener(ruta, _leer_gestion)
@@ -0,0 +1,89 @@
+import threading
+import numpy as np
+import pandas as pd
+
+# --- TABLAS INDEXADAS PARA LAS APIS PAGINADAS ---
+# Cada tabla se construye una vez por versión de datos: guarda el texto de búsqueda ya en
+# minúsculas y las permutaciones de orden por columna (se calculan la primera vez que se
+# piden y se reutilizan). Una consulta solo filtra con máscaras y corta la página, sin re-ordenar.
+
+MAX_TABLAS_EN_CACHE = 32
+
+_TABLAS = {}
+_LOCK = threading.Lock()
+
+
+class TablaIndexada:
+    def __init__(self, df, columnas_busqueda, claves_orden=None):
+        # Las columnas que empiezan con '_' son auxiliares (orden/búsqueda) y no se devuelven
+        self.df = df.reset_index(drop=True)
+        self.columnas_salida = [c for c in self.df.columns if not str(c).startswith('_')]
+        self.claves_orden = claves_orden or {}
+        self._ordenes = {}
+
+        texto = pd.Series('', index=self.df.index, dtype=object)
+        for col in columnas_busqueda:
+            if col in self.df.columns:
+                texto = texto + ' ' + self.df[col].astype(object).fillna('').astype(str)
+        self.texto = texto.str.lower()
+
+    def __len__(self):
+        return len(self.df)
+
+    def _orden(self, columna, descendente):
+        clave = (columna, descendente)
+        if clave not in self._ordenes:
+            col_real = self.claves_orden.get(columna, columna)
+            orden = self.df[col_real].sort_values(ascending=not descendente, kind='stable', na_position='last')
+            self._ordenes[clave] = orden.index.to_numpy()
+        return self._ordenes[clave]
+
+    def consultar(self, filtros=None, mascara=None, busqueda='', orden=None, descendente=False,
+                  inicio=0, cantidad=25):
+        seleccion = np.ones(len(self.df), dtype=bool)
+        if mascara is not None:
+            seleccion &= np.asarray(mascara, dtype=bool)
+        for col, valor in (filtros or {}).items():
+            if valor and col in self.df.columns:
+                seleccion &= (self.df[col].astype(object) == valor).to_numpy()
+        if busqueda:
+            seleccion &= self.texto.str.contains(busqueda.strip().lower(), regex=False).to_numpy()
+
+        if orden in self.df.columns or orden in self.claves_orden:
+            permutacion = self._orden(orden, descendente)
+            posiciones = permutacion[seleccion[permutacion]]
+        else:
+            posiciones = np.flatnonzero(seleccion)
+
+        pagina = posiciones[inicio:] if cantidad < 0 else posiciones[inicio:inicio + cantidad]
+        return {
+            'total': len(self.df),
+            'filtrados': int(len(posiciones)),
+            'inicio': inicio,
+            'filas': registros(self.df.iloc[pagina][self.columnas_salida]),
+        }
+
+    def exportar(self, **parametros):
+        # Mismos filtros/orden de consultar, pero todas las filas y como DataFrame
+        parametros.update(inicio=0, cantidad=-1)
+        return pd.DataFrame(self.consultar(**parametros)['filas'], columns=self.columnas_salida)
+
+
+def registros(df):
+    # to_dict apto para JSON: NaN/NaT -> None
+    return df.astype(object).where(df.notna(), None).to_dict(orient='records')
+
+
+def obtener_tabla(clave, construir):
+    # clave debe incluir la versión de los datos; al cambiar los archivos se construye otra
+    with _LOCK:
+        tabla = _TABLAS.get(clave)
+    if tabla is not None:
+        return tabla
+
+    tabla = construir()
+    with _LOCK:
+        if len(_TABLAS) >= MAX_TABLAS_EN_CACHE:
+            _TABLAS.clear()
+        _TABLAS[clave] = tabla
+    return tabla
@@ -0,0 +1,160 @@
+import threading
+import numpy as np
+import pandas as pd
+
+import cargador_datos
+from cargador_datos import cargar_cartera, firma_archivo
+from agregados import codificar, agrupar
+
+# --- CUBO DE CARTERA PARA CONSULTAS AD-HOC (/api/cubo) ---
+# Se construye una vez por versión del maestro sobre los documentos PENDIENTES: cada dimensión
+# se codifica a enteros (diccionario de etiquetas) y los documentos se pre-agregan por la
+# combinación de TODAS las dimensiones y el cliente (NIT). Una consulta (agrupar por cualquier
+# subconjunto, filtrar por valores, elegir medidas) trabaja sobre esas celdas con bincount, sin
+# volver a recorrer el maestro. El cliente en la celda permite contar clientes distintos.
+# Los valores vacíos de una dimensión se agrupan en VACIO (no se pierden del total).
+
+DIMENSIONES = {
+    'ciudad': 'CIUDAD',
+    'administrador': 'ADMINISTRADO POR',
+    'segmento': 'SEGMENTO',
+    'jefatura': 'JEFATURA',
+    'ruta': 'RUTA',
+    'analista': 'ANALISTA A CARGO',
+    'condicion_pago': 'CONDICIÓN PAGO',
+    'division': 'DIVISIÓN',
+    'franja_top': 'FRANJA TOP',
+    'franja_actual': 'FRANJA ACTUAL',
+    'franja_cyres': 'Franja Mora Cyres',
+    'franja_coca': 'Franja de Mora Coca-Cola',
+    'franja_top_general': 'Franja Top General',
+    'reverso': 'REVERSO',
+}
+MEDIDAS = ['total', 'vencido', 'documentos', 'clientes']
+VACIO = '(Vacío)'
+
+_CUBOS = {}
+_LOCK = threading.Lock()
+
+
+def _codificar_con_vacios(serie):
+    codigos, etiquetas = codificar(serie)
+    if (codigos < 0).any():
+        codigos = np.where(codigos < 0, len(etiquetas), codigos)
+        etiquetas = etiquetas.append(pd.Index([VACIO]))
+    return codigos, pd.Index(etiquetas.astype(str))
+
+
+class Cubo:
+    def __init__(self, etiquetas, codigos, cliente, sumas):
+        self.etiquetas = etiquetas  # dimensión -> pd.Index de valores
+        self.codigos = codigos  # dimensión -> código por celda
+        self.cliente = cliente  # código de NIT por celda
+        self.sumas = sumas  # 'total' / 'vencido' / 'documentos' -> valor por celda
+
+    @classmethod
+    def construir(cls, df):
+        df = df[df['ESTADO'].astype(str).str.upper() == 'PENDIENTE']
+        n = len(df)
+        dims = {}
+        for nombre, columna in DIMENSIONES.items():
+            if columna not in df.columns:
+                continue
+            dims[nombre] = _codificar_con_vacios(df[columna])
+        cod_cliente, clientes = _codificar_con_vacios(df['NIT'])
+
+        # Una celda por combinación de todas las dimensiones y cliente
+        celda, representante = agrupar(list(dims.values()) + [(cod_cliente, clientes)], n)
+        total = df['TOTAL CARTERA'].to_numpy(dtype='float64')
+        vencido = np.where(df['DIAS_MORA'].to_numpy(dtype='float64', na_value=0) >= 1, total, 0)
+        n_celdas = len(representante)
+        sumas = {
+            'total': np.bincount(celda, weights=total, minlength=n_celdas),
+            'vencido': np.bincount(celda, weights=vencido, minlength=n_celdas),
+            'documentos': np.bincount(celda, minlength=n_celdas).astype('float64'),
+        }
+        return cls(
+            {nombre: etiquetas for nombre, (_, etiquetas) in dims.items()},
+            {nombre: codigos[representante] for nombre, (codigos, _) in dims.items()},
+            cod_cliente[representante],
+            sumas,
+        )
+
+    @property
+    def dimensiones(self):
+        return list(self.etiquetas)
+
+    def valores(self, dimension):
+        return self.etiquetas[dimension].tolist()
+
+    def consultar(self, dimensiones=(), filtros=None, medidas=None, orden=None, limite=None):
+        # dimensiones: nombres de DIMENSIONES; filtros: {dimension: [valores]}; medidas: de MEDIDAS
+        medidas = list(medidas or MEDIDAS)
+        for nombre in list(dimensiones) + list(filtros or {}):
+            if nombre not in self.etiquetas:
+                raise ValueError(f"Dimensión desconocida: {nombre}")
+        repetidas = sorted({nombre for nombre in dimensiones if list(dimensiones).count(nombre) > 1})
+        if repetidas:
+            raise ValueError(f"Dimensión repetida: {', '.join(repetidas)}")
+        for medida in medidas:
+            if medida not in MEDIDAS:
+                raise ValueError(f"Medida desconocida: {medida}")
+        if orden is not None and orden not in medidas:
+            raise ValueError(f"Solo se puede ordenar por una medida pedida: {orden}")
+        if limite is not None and limite < 1:
+            raise ValueError(f"El límite debe ser al menos 1: {limite}")
+
+        seleccion = np.ones(len(self.cliente), dtype=bool)
+        for nombre, valores in (filtros or {}).items():
+            permitidos = self.etiquetas[nombre].get_indexer([str(v) for v in valores])
+            seleccion &= np.isin(self.codigos[nombre], permitidos[permitidos >= 0])
+        celdas = np.flatnonzero(seleccion)
+
+        dims = [(self.codigos[nombre][celdas], self.etiquetas[nombre]) for nombre in dimensiones]
+        grupo, representante = agrupar(dims, len(celdas))
+        n_grupos = len(representante)
+
+        resultado = pd.DataFrame({
+            nombre: etiquetas[codigos[representante]] for nombre, (codigos, etiquetas) in zip(dimensiones, dims)
+        }, index=pd.RangeIndex(n_grupos))
+        for medida in medidas:
+            if medida == 'clientes':
+                # Pares (grupo, cliente) distintos; cada par suma un cliente a su grupo
+                n_clientes = int(self.cliente.max()) + 1 if len(self.cliente) else 1
+                pares = np.unique(grupo * n_clientes + self.cliente[celdas])
+                valores = np.bincount(pares // n_clientes, minlength=n_grupos)
+            else:
+                valores = np.bincount(grupo, weights=self.sumas[medida][celdas], minlength=n_grupos)
+            resultado[medida] = np.rint(valores).astype(np.int64)
+
+        if orden is not None:
+            resultado = resultado.sort_values(orden, ascending=False, kind='stable')
+        total_grupos = len(resultado)
+        if limite is not None:
+            resultado = resultado.head(limite)
+        respuesta = {
+            'dimensiones': list(dimensiones),
+            'medidas': medidas,
+            'grupos': total_grupos,
+            'filas': resultado.to_dict(orient='records'),
+        }
+        if dimensiones:
+            totales = self.consultar((), filtros, medidas)['filas']
+            respuesta['totales'] = totales[0] if totales else {medida: 0 for medida in medidas}
+        return respuesta
+
+
+def obtener_cubo():
+    firma = firma_archivo(cargador_datos.RUTA_CARTERA)
+    with _LOCK:
+        entrada = _CUBOS.get('cartera')
+    if entrada is not None and entrada[0] == firma:
+        return entrada[1]
+
+    df = cargar_cartera(consumidor='cubo')
+    if df is None:
+        return None
+    cubo = Cubo.construir(df)
+    with _LOCK:
+        _CUBOS['cartera'] = (firma, cubo)
+    return cubo
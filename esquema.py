@@ -0,0 +1,126 @@
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# --- ESQUEMA DE TIPOS DE LOS ARCHIVOS DE DATOS ---
+# Un solo lugar donde se declara cómo se lee cada columna del PROYECTADO / maestro, de los
+# pagos y de gestion.csv. Texto de baja cardinalidad -> category; códigos (NIT, COD. CLIENTE) se
+# leen como enteros directamente (sin pasar por float) y se guardan como texto categórico, que es
+# como se cruzan con gestión y pagos; montos -> int64 si son enteros (float64 si traen centavos);
+# fechas ya convertidas.
+
+# Texto con pocos valores distintos (ciudades, analistas, franjas, estados...)
+CATEGORIAS = [
+    'DIVISIÓN', 'CLASE DOC', 'CONDICIÓN SAP', 'MULTICÓDIGO', 'CONDICIÓN PAGO', 'SEGMENTO',
+    'CIUDAD', 'ANALISTA A CARGO', 'JEFATURA', 'ADMINISTRADO POR', 'FRANJA ACTUAL', 'FRANJA TOP',
+    'ESTADO', 'REVERSO', 'Franja Mora Cyres', 'Franja de Mora Coca-Cola', 'Franja Top General',
+]
+
+# Códigos de cliente: enteros en el archivo, texto sin el .0 en memoria
+CODIGOS = ['COD. CLIENTE', 'NIT']
+
+# Montos y contadores: vacíos -> 0; int64 solo si todos los valores son enteros
+NUMERICOS = [
+    'TOTAL CARTERA', 'DÍAS VENCIMIENTO', 'CONTAR ÚNICO',
+    '00- Corriente', '01- Vence -2 Días', '02- Vence mañana', '03- Vence hoy', '04- Venció Ayer',
+    '05- 1 a 4', '06- 5 a 14', '07- 15 a 21', '08- 22 a 30', '09- Mayor a 30', 'CARTERA VENCIDA',
+    'DIAS_MORA',
+]
+
+# Fechas que el maestro escribe en formato ISO (las de los PROYECTADO vienen dd.mm.yyyy)
+FECHAS_ISO = ['PRIMERA_APARICION', 'RECUPERACION', 'VTO_DT']
+
+# Columnas que lee cada consumidor del maestro (None = todas)
+PROYECCIONES = {
+    'dashboard': ['COD. CLIENTE', 'NIT', 'RAZÓN SOCIAL', 'CIUDAD', 'ADMINISTRADO POR', 'ESTADO',
+                  'TOTAL CARTERA', 'DIAS_MORA', 'Franja Mora Cyres', 'Franja de Mora Coca-Cola'],
+    'gestion': ['COD. CLIENTE', 'RAZÓN SOCIAL', 'CIUDAD', 'ESTADO', 'TOTAL CARTERA',
+                'Franja Mora Cyres'],
+    'detalle': ['COD. CLIENTE', 'RAZÓN SOCIAL', 'ESTADO', 'Fecha_Vencimiento', 'TOTAL CARTERA'],
+    # Dimensiones de cubo.DIMENSIONES más lo que necesitan las medidas
+    'cubo': ['CIUDAD', 'ADMINISTRADO POR', 'SEGMENTO', 'JEFATURA', 'RUTA', 'ANALISTA A CARGO',
+             'CONDICIÓN PAGO', 'DIVISIÓN', 'FRANJA TOP', 'FRANJA ACTUAL', 'Franja Mora Cyres',
+             'Franja de Mora Coca-Cola', 'Franja Top General', 'REVERSO',
+             'NIT', 'ESTADO', 'TOTAL CARTERA', 'DIAS_MORA'],
+}
+
+# --- PAGOS ---
+PAGOS_CODIGOS = ['FECHA DOCUMENTO', 'COD. CLIENTE']
+PAGOS_COLUMNAS = ['FECHA DOCUMENTO', 'COD. CLIENTE', 'VALOR PAGADO', 'FECHA PAGO',
+                  'MÉTODO DE PAGO', 'ARCHIVO_ORIGEN']
+PAGOS_CATEGORIAS = ['MÉTODO DE PAGO', 'ARCHIVO_ORIGEN']
+
+# --- GESTIÓN --- (solo las columnas que usan los indicadores; el resto son textos largos)
+GESTION_COLUMNAS = ['NIT', 'CODIGO_CLIENTE', 'USUARIO_GESTION', 'FECHA_GESTION', 'ACCION', 'CONTACTO']
+GESTION_CATEGORIAS = ['USUARIO_GESTION', 'ACCION', 'CONTACTO']
+
+
+def _es_administrador(columna):
+    # El archivo a veces trae 'ADMINISTRADO POR' con otro nombre/espacios
+    return 'ADMINISTRADO' in columna.upper()
+
+
+def columnas_a_leer(consumidor):
+    # usecols para read_csv: los nombres vienen con espacios, se comparan ya limpios
+    if consumidor is None:
+        return None
+    proyeccion = set(PROYECCIONES[consumidor])
+    return lambda c: c.strip() in proyeccion or ('ADMINISTRADO POR' in proyeccion and _es_administrador(c))
+
+
+def tipos_lectura(columnas_crudas, codigos=True):
+    # dtype para read_csv según los encabezados reales del archivo (pueden traer espacios).
+    # codigos=False deja COD. CLIENTE / NIT como los infiere pandas (ID_DOC se calcula con sus valores)
+    tipos = {}
+    for cruda in columnas_crudas:
+        col = cruda.strip()
+        if col in CATEGORIAS:
+            tipos[cruda] = 'category'
+        elif codigos and col in CODIGOS:
+            tipos[cruda] = 'Int64'
+    return tipos
+
+
+def codigo_texto(serie):
+    # Int64 -> '1224211845'; vacíos -> '0' (igual que antes de tipar)
+    return pd.to_numeric(serie, errors='coerce').fillna(0).astype('int64').astype(str)
+
+
+def numero(serie):
+    # Los montos con centavos se quedan en float64: convertirlos a int64 los truncaría
+    valores = pd.to_numeric(serie, errors='coerce').fillna(0).astype('float64')
+    if (valores % 1 == 0).all():
+        return valores.astype('int64')
+    return valores
+
+
+def aplicar_tipos(df):
+    # Normaliza un DataFrame del maestro ya leído (columnas ya sin espacios)
+    for col in NUMERICOS:
+        if col in df.columns:
+            df[col] = numero(df[col])
+    for col in CODIGOS:
+        if col in df.columns:
+            texto = codigo_texto(df[col])
+            if col == 'NIT':
+                texto = texto.replace('0', '')
+            df[col] = texto.astype('category')
+    for col in FECHAS_ISO:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], format='%Y-%m-%d', errors='coerce')
+    for col in CATEGORIAS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    return df
+
+
+def unificar_categorias(frames):
+    # Antes de concatenar: mismas categorías en todos, si no pandas convierte la columna a object
+    for col in CATEGORIAS:
+        series = [df[col] for df in frames if col in df.columns and isinstance(df[col].dtype, pd.CategoricalDtype)]
+        if len(series) < 2:
+            continue
+        categorias = union_categoricals(series, ignore_order=True).categories
+        for df in frames:
+            if col in df.columns:
+                df[col] = pd.Categorical(df[col], categories=categorias)
+    return frames
@@ -0,0 +1,142 @@
+import os
+import json
+import sqlite3
+import threading
+import time
+
+import cargador_datos
+import procesador_dashboard
+
+# --- AVISOS DE DATOS NUEVOS (SERVER-SENT EVENTS) ---
+# Cuando la cola termina procesar_todo o consolidar_pagos, publicar() guarda un evento con la nueva
+# versión de los archivos, los KPIs del tablero (snapshot, por vista y ciudad) y los de gestión
+# (todos los analistas), más la diferencia contra el evento anterior. Corre en el proceso hijo del
+# trabajo (tareas._ejecutar), así el cálculo de gestión no ocupa el worker web. Los eventos van en
+# la misma base SQLite de la cola (compartida por los workers); /api/eventos la sondea y los empuja
+# al navegador, que actualiza solo esos indicadores en lugar de recargar la página.
+# Cada flujo abierto ocupa un hilo de gthread: por proceso se atienden a lo sumo MAX_FLUJOS a la vez
+# para que las páginas y APIs siempre tengan hilos libres; por encima del tope se responde solo
+# "retry:" largo y se cierra (un 503 haría que EventSource dejara de reconectar para siempre).
+RUTA_DB = os.path.join(cargador_datos.RUTA_DATA, 'trabajos.sqlite3')
+
+INTERVALO_SONDEO = 2.0
+# Comentario SSE para que proxies y balanceadores no corten la conexión inactiva
+LATIDO = 20.0
+# Cada conexión dura a lo sumo esto (libera el hilo); el navegador se reconecta con Last-Event-ID
+DURACION_FLUJO = 60.0
+REINTENTO_MS = 5000
+MAX_FLUJOS = int(os.environ.get('CARTERA_MAX_FLUJOS', 2))
+REINTENTO_LLENO_MS = 30000
+EVENTOS_GUARDADOS = 100
+
+KPIS_GESTION = ['total_clientes', 'total_documentos', 'promedio_doc', 'cant_gestionados', 'cant_efectivos',
+                'cant_sin_gestion', 'porc_barrido', 'porc_contactado', 'porc_no_contactado', 'porc_sin_gestion']
+
+
+def _conectar():
+    conexion = sqlite3.connect(RUTA_DB, timeout=30, isolation_level=None)
+    conexion.row_factory = sqlite3.Row
+    conexion.execute("""
+        CREATE TABLE IF NOT EXISTS eventos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tipo TEXT NOT NULL,
+            creado REAL NOT NULL,
+            datos TEXT NOT NULL
+        )
+    """)
+    return conexion
+
+
+_CUPOS = threading.BoundedSemaphore(MAX_FLUJOS)
+
+
+def _version():
+    return {nombre: cargador_datos.firma_archivo(ruta) for nombre, ruta in
+            (('cartera', cargador_datos.RUTA_CARTERA), ('pagos', cargador_datos.RUTA_PAGOS),
+             ('gestion', cargador_datos.RUTA_GESTION))}
+
+
+def _kpis_dashboard():
+    # Del snapshot que acaba de generar el trabajo; si no corresponde a los archivos no se informa
+    snapshot = cargador_datos.cargar_snapshot()
+    if snapshot is None or snapshot['version'] != procesador_dashboard.version_datos():
+        return {}
+    return {f"{vista}|{ciudad}": {k: float(v) for k, v in datos['kpis'].items()}
+            for (vista, ciudad), datos in snapshot['datos'].items()}
+
+
+def _kpis_gestion():
+    from procesador_gestion import calcular_gestion
+    if cargador_datos.firma_archivo(cargador_datos.RUTA_GESTION) is None:
+        return {}
+    stats = calcular_gestion(cargador_datos.RUTA_CARTERA, cargador_datos.RUTA_GESTION, incluir_detalle=False)
+    return {k: float(stats[k]) for k in KPIS_GESTION if k in stats}
+
+
+def _diferencias(nuevos, anteriores):
+    return {k: round(v - anteriores[k], 4) for k, v in nuevos.items() if k in anteriores}
+
+
+def publicar(tipo):
+    datos = {'version': _version(), 'dashboard': {}, 'gestion': {}}
+    for clave, funcion in (('dashboard', _kpis_dashboard), ('gestion', _kpis_gestion)):
+        try:
+            datos[clave] = funcion()
+        except Exception as e:
+            print(f"No se pudieron calcular los KPIs de {clave} para el evento: {e}")
+
+    conexion = _conectar()
+    try:
+        fila = conexion.execute("SELECT datos FROM eventos ORDER BY id DESC LIMIT 1").fetchone()
+        anterior = json.loads(fila['datos']) if fila is not None else {'dashboard': {}, 'gestion': {}}
+        datos['deltas'] = {
+            'dashboard': {clave: _diferencias(kpis, anterior['dashboard'][clave])
+                          for clave, kpis in datos['dashboard'].items() if clave in anterior['dashboard']},
+            'gestion': _diferencias(datos['gestion'], anterior['gestion']),
+        }
+        cursor = conexion.execute("INSERT INTO eventos (tipo, creado, datos) VALUES (?, ?, ?)",
+                                  (tipo, time.time(), json.dumps(datos)))
+        conexion.execute("DELETE FROM eventos WHERE id <= ?", (cursor.lastrowid - EVENTOS_GUARDADOS,))
+        return cursor.lastrowid
+    finally:
+        conexion.close()
+
+
+def ultimo_id():
+    conexion = _conectar()
+    try:
+        return conexion.execute("SELECT COALESCE(MAX(id), 0) FROM eventos").fetchone()[0]
+    finally:
+        conexion.close()
+
+
+def desde(id_evento):
+    conexion = _conectar()
+    try:
+        filas = conexion.execute("SELECT * FROM eventos WHERE id > ? ORDER BY id", (id_evento,)).fetchall()
+    finally:
+        conexion.close()
+    return [{'id': f['id'], 'tipo': f['tipo'], 'creado': f['creado'], **json.loads(f['datos'])} for f in filas]
+
+
+def flujo(id_evento, duracion=DURACION_FLUJO):
+    # Generador text/event-stream: los eventos posteriores a id_evento y un latido cada LATIDO s
+    if not _CUPOS.acquire(blocking=False):
+        yield f"retry: {REINTENTO_LLENO_MS}\n\n"
+        return
+    try:
+        yield f"retry: {REINTENTO_MS}\n\n"
+        fin = time.monotonic() + duracion
+        ultimo_envio = time.monotonic()
+        while time.monotonic() < fin:
+            for evento in desde(id_evento):
+                id_evento = evento['id']
+                ultimo_envio = time.monotonic()
+                yield f"id: {id_evento}\nevent: datos\ndata: {json.dumps(evento)}\n\n"
+            if time.monotonic() - ultimo_envio >= LATIDO:
+                ultimo_envio = time.monotonic()
+                yield ": latido\n\n"
+            time.sleep(INTERVALO_SONDEO)
+    finally:
+        # También al cerrarse la conexión (GeneratorExit en el yield)
+        _CUPOS.release()
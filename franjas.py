@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+# --- ESQUEMAS DE FRANJAS DE MORA ---
+# Cada esquema es una tabla de (límite superior en días, etiqueta), en orden. Un valor cae en el
+# primer tramo cuyo límite es >= a sus días de mora; el último tramo (límite None) recoge el resto,
+# incluidos los vacíos (NaN), igual que hacían las funciones fila por fila.
+FRANJAS_CYRES = [
+    (-2, "0- Corriente"),
+    (-1, "1- Vence mañana"),
+    (0, "2- Vence hoy"),
+    (1, "3- Venció ayer"),
+    (4, "4- 2 a 4"),
+    (7, "5- 5 a 7"),
+    (14, "6- 8 a 14"),
+    (21, "7- 15 a 21"),
+    (30, "8- 22 a 30"),
+    (None, "9- Mayor a 30"),
+]
+
+FRANJAS_COCA = [
+    (0, "0- Corriente"),
+    (7, "1- 1 a 7"),
+    (14, "2- 8 a 14"),
+    (21, "3- 15 a 21"),
+    (30, "4- 22 a 30"),
+    (None, "5- Mayor a 30"),
+]
+
+# Días desde la última gestión (vista /gestiones). Los clientes sin gestión (NaN) se marcan aparte.
+RANGOS_INACTIVIDAD = [
+    (0, "2. Gestión Hoy"),
+    (1, "3. Gestión Ayer"),
+    (5, "4. Sin gestión (2-5 días)"),
+    (10, "5. Sin gestión (6-10 días)"),
+    (15, "6. Sin gestión (11-15 días)"),
+    (None, "7. Sin gestión (+15 días)"),
+]
+SIN_GESTION = "1. Sin Gestión"
+
+ESQUEMAS = {
+    'cyres': FRANJAS_CYRES,
+    'coca-cola': FRANJAS_COCA,
+}
+
+
+def etiquetas(esquema):
+    return [etiqueta for _, etiqueta in esquema]
+
+
+def clasificar(dias, esquema):
+    # Clasifica todo el arreglo de días de una vez (búsqueda binaria sobre los límites).
+    # Devuelve una Serie categórica ordenada con el mismo índice que la entrada.
+    if isinstance(esquema, str):
+        esquema = ESQUEMAS[esquema]
+
+    serie = dias if isinstance(dias, pd.Series) else pd.Series(dias)
+    valores = pd.to_numeric(serie, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    limites = np.array([limite for limite, _ in esquema if limite is not None], dtype='float64')
+
+    # NaN queda al final del searchsorted -> último tramo
+    codigos = np.searchsorted(limites, valores, side='left')
+    categorias = pd.Categorical.from_codes(codigos, categories=etiquetas(esquema), ordered=True)
+    return pd.Series(categorias, index=serie.index, name=serie.name)
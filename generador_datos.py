@@ -0,0 +1,334 @@
+import os
+import sys
+import argparse
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# --- GENERADOR DE DATOS SINTÉTICOS PARA EL BENCHMARK ---
+# Escribe en una carpeta con la misma estructura que data/ (proyectados/, pagos_diarios/ y
+# gestion.zip) archivos con los mismos encabezados, separador ';', codificación latin1 y formatos
+# de fecha que los reales: PROYECTADOddmmyyyy.csv (51 columnas, fechas dd.mm.yyyy),
+# PAGOSddmmyyyy.csv (5 columnas; el consolidado agrega ARCHIVO_ORIGEN) y gestion.csv dentro del zip
+# (19 columnas). La escala 1 se parece al mes real de enero de 2026: ~3.000 documentos abiertos por
+# día de ~1.500 clientes, ~150 pagos y ~1.000 gestiones diarias; escala N multiplica todo por N.
+#
+# La cartera se simula documento a documento: cada uno entra en un día (o ya estaba abierto al
+# inicio) y sale cuando se paga, así que entre archivos hay altas, bajas y documentos que nunca se
+# recuperan, igual que lo que consolida procesador_maestro.
+#
+# Uso: python generador_datos.py carpeta_destino [--escala 5] [--dias 22] [--semilla 0]
+
+COLUMNAS_PROYECTADO = [
+    'DOC. CONTABLE', 'COD. CLIENTE', 'DIVISIÓN', 'CLASE DOC', 'Referencia', 'Asignación', 'FECHA DOC',
+    'Fecha_Vencimiento', 'CONDICIÓN SAP', 'TOTAL CARTERA', 'TEXTO', 'DÍAS VENCIMIENTO', 'NIT',
+    'RAZÓN SOCIAL', 'MULTICÓDIGO', 'CONDICIÓN PAGO', 'SEGMENTO', 'CIUDAD', 'ANALISTA A CARGO', 'TEL1',
+    'TEL2', 'TEL3', 'TEL4', 'CORREO', 'JEFATURA', 'ADMINISTRADO POR', 'NOTIFICADO CARTA',
+    'ID SUSCEPTIBLE CASTIGO', 'SUSCEPTIBLE DE CASTIGO', 'FECHA DOC ARREGLADA', 'FECHA VTO ARREGLADA',
+    'RUTA', 'FRANJA ACTUAL', 'FRANJA TOP', 'CONTAR ÚNICO', '00- Corriente', '01- Vence -2 Días',
+    '02- Vence mañana', '03- Vence hoy', '04- Venció Ayer', '05- 1 a 4', '06- 5 a 14', '07- 15 a 21',
+    '08- 22 a 30', '09- Mayor a 30', 'CARTERA VENCIDA', 'Teléfono adicional 1', 'Teléfono adicional 2',
+    'Teléfono adicional 3', 'Teléfonos Validados', 'Correos Vallidados',
+]
+COLUMNAS_PAGOS = ['FECHA DOCUMENTO', 'COD. CLIENTE', 'VALOR PAGADO', 'FECHA PAGO', 'MÉTODO DE PAGO']
+COLUMNAS_GESTION = [
+    'NIT', 'CEDULA', 'NOMBRE', 'CODIGO_CLIENTE', 'ASESOR_CASA', 'USUARIO_GESTION', 'FECHA_GESTION',
+    'ACCION', 'CONTACTO', 'EFECTO', 'FACTURAS_PAGAS', 'FECHA_PROMESA', 'VALOR_PROMESA', 'ESTADO_PROMESA',
+    'CUOTAS_PROMESA', 'DURACION_GESTION', 'MASIVO', 'CANAL_GESTION', 'OBSERVACION',
+]
+
+# Volúmenes por escala 1
+CLIENTES = 1500
+ABIERTOS_INICIO = 3000
+ALTAS_DIA = 370
+GESTIONES_DIA = 1000
+PROPORCION_PAGOS = 0.3  # de los documentos que salen, cuántos llegan en el archivo de pagos
+
+CIUDADES = ['BOGOTA', 'MEDELLIN', 'CALI', 'BARRANQUILLA', 'CARTAGENA', 'BUCARAMANGA', 'PEREIRA',
+            'MANIZALES', 'IBAGUE', 'SANTA MARTA', 'VILLAVICENCIO', 'PASTO', 'MONTERIA', 'NEIVA',
+            'ARMENIA', 'CUCUTA', 'TUNJA', 'POPAYAN', 'VALLEDUPAR', 'SINCELEJO', 'RIOHACHA']
+ANALISTAS = ['ANGÉLICA SANABRIA', 'DAVID DOMEC', 'JEIMMY CANTOR', 'ANDRÉS IBARRA', 'ADRIÁN BAYONA',
+             'ANDREA MARENTES', 'LAURA PÉREZ']
+USUARIOS_GESTION = ['Angelica Sanabria', 'David Domec', 'Jeimmy Cantor', 'Andres Ibarra',
+                    'Adrian Bayona', 'Andrea Marentes']
+ASESORES = ['OGOMEZ', 'AIBARRA', 'JCANTOR', 'LPEREZ', 'DDOMEC', 'ASANABRIA', 'ABAYONA', 'AMARENTES', 'MROJAS']
+DIVISIONES = ['CFA' + letra for letra in 'ABCDEFGHIJKLMNOPQRSTUVW']
+CLASES_DOC = ['RH', 'RH', 'RH', 'RH', 'AB', 'X1', 'RG', 'DZ', 'DG', 'RV', 'ZP', 'DA']
+CONDICIONES = ['OI08', 'OI15', 'OF15', 'OF08']
+PLAZOS = {'OI08': 8, 'OI15': 15, 'OF15': 15, 'OF08': 8}
+TEXTOS = ['', '', '', '', '', '', 'Factura cancelada al aliado', 'ABONO A FUTURAS FACTURAS',
+          'ABONO FUTURA FACT', 'PAGO PARCIAL']
+METODOS_PAGO = ['WALLET', 'CONSIGNACIÓN', 'TRANSFERENCIA']
+ACCIONES = ['Whatsapp Recibido', 'Whatsapp Enviado', 'Llamada Saliente', 'Llamada Entrante',
+            'Correo Enviado', 'Correo Recibido', 'SMS Enviado', 'Visita', 'Agente Virtual']
+EFECTOS = ['1.1. Pago realizado y compensado', '1.2. Se envía Link para Pago',
+           '1.3. Envio de Estado de Cuenta', '1.4. Promesa de pago', '2.1. Número equivocado',
+           '2.4. No Contesta', '2.5. Buzón de voz']
+MASIVOS = ['GESTION ASESOR', 'WHATSAPP', 'SMS', 'AGENTE VIRTUAL']
+OBSERVACIONES = ['Se envía estado de cuenta para validación y programación de pago.',
+                 'Se envía Link de pago para programación de cancelación de facturas.  Suma Importe: ',
+                 'Cliente no contesta, se deja mensaje.', 'reporta pago  Suma Importe: ',
+                 'Cliente indica que paga el fin de semana.']
+PALABRAS = ['TIENDA', 'MINI MARKET', 'SUPERMERCADO', 'RESTAURANTE', 'CAFE', 'PANADERIA', 'LICORES',
+            'ABARROTES', 'DROGUERIA', 'ASADERO', 'HOTEL', 'MISCELANEA']
+NOMBRES = ['LA ESQUINA', 'EL PORVENIR', 'DOÑA MARIA', 'SAN JOSE', 'LOS ANDES', 'LA 30', 'EL PARQUE',
+           'DON PEPE', 'LA BENDICION', 'EL DORADO', 'VILLA CARMELITA', 'AUSTRAL']
+
+# Franjas del archivo diario (FRANJA ACTUAL y columnas de saldo por franja)
+LIMITES_ACTUAL = [-3, -2, -1, 0, 1, 4, 14, 21, 30]
+COLUMNAS_FRANJA = COLUMNAS_PROYECTADO[35:45]
+FRANJAS_TOP = ['00- Corriente', '01- 1 a 4', '02- 5 a 14', '03- 15 a 21', '04- 22 a 30', '05- Mayor a 30']
+LIMITES_TOP = [0, 4, 14, 21, 30]
+
+
+def _fechas_archivos(hasta, dias):
+    # Un archivo por día hábil (sin domingos), terminando en 'hasta'
+    fechas = []
+    fecha = hasta
+    while len(fechas) < dias:
+        if fecha.weekday() != 6:
+            fechas.append(fecha)
+        fecha -= timedelta(days=1)
+    return fechas[::-1]
+
+
+def _texto_fechas(ordinales, formato):
+    # strftime solo sobre las fechas distintas (muchas filas comparten fecha)
+    unicos, inverso = np.unique(ordinales, return_inverse=True)
+    textos = np.array([datetime.fromordinal(int(o)).strftime(formato) for o in unicos], dtype=object)
+    return textos[inverso]
+
+
+def _dia_sin_cero(ordinales, separador, con_separador_anio=True):
+    # '2/01/2026' (pagos y gestión) o '2012026' (FECHA DOCUMENTO de pagos)
+    unicos, inverso = np.unique(ordinales, return_inverse=True)
+    textos = []
+    for o in unicos:
+        f = datetime.fromordinal(int(o))
+        textos.append(f"{f.day}{separador}{f.month:02d}{separador if con_separador_anio else ''}{f.year}")
+    return np.array(textos, dtype=object)[inverso]
+
+
+def _clientes(rng, n):
+    codigos = 1224000000 + rng.choice(900000, size=n, replace=False)
+    nombres = (np.array(PALABRAS, dtype=object)[rng.integers(0, len(PALABRAS), n)] + ' '
+               + np.array(NOMBRES, dtype=object)[rng.integers(0, len(NOMBRES), n)] + ' '
+               + np.arange(n).astype(str).astype(object))
+    telefonos = (3000000000 + rng.integers(0, 299999999, n)).astype(str).astype(object)
+    return pd.DataFrame({
+        'COD. CLIENTE': codigos.astype(str),
+        'NIT': (800000000 + rng.integers(0, 199999999, n)).astype(str),
+        'RAZÓN SOCIAL': nombres,
+        'DIVISIÓN': np.array(DIVISIONES)[rng.integers(0, len(DIVISIONES), n)],
+        'CONDICIÓN SAP': np.array(CONDICIONES)[rng.integers(0, len(CONDICIONES), n)],
+        'MULTICÓDIGO': np.where(rng.random(n) < 0.1, 'SI', 'NO'),
+        # Pocas ciudades concentran la mayoría de clientes
+        'CIUDAD': np.array(CIUDADES)[np.minimum(rng.geometric(0.25, n) - 1, len(CIUDADES) - 1)],
+        'ANALISTA A CARGO': np.array(ANALISTAS)[rng.integers(0, len(ANALISTAS), n)],
+        'TEL': telefonos,
+        'CORREO': 'cliente' + np.arange(n).astype(str).astype(object) + '@correo.com',
+        'JEFATURA': np.array([f"O{chr(65 + i // 10)}{i % 10}" for i in range(123)])[rng.integers(0, 123, n)],
+        'RUTA': np.array([f"KA2A{i:02d}" for i in range(100)])[rng.integers(0, 100, n)],
+        'ASESOR': np.array(ASESORES)[rng.integers(0, len(ASESORES), n)],
+        'CEDULA': codigos.astype(str),
+    })
+
+
+def _documentos(rng, n_clientes, fechas, escala):
+    # Cada documento: cliente, alta (índice del primer archivo donde aparece), baja (primer archivo
+    # donde ya no aparece; len(fechas) = sigue abierto), fecha del documento y monto
+    n_archivos = len(fechas)
+    n_inicio = ABIERTOS_INICIO * escala
+    n_altas = ALTAS_DIA * escala * (n_archivos - 1)
+    n = n_inicio + n_altas
+
+    alta = np.concatenate([np.zeros(n_inicio, dtype=np.int64),
+                           rng.integers(1, max(n_archivos, 2), n_altas)])[:n]
+    # Vida media ~8 archivos; un 10% nunca se recupera (la cola de mora mayor a 30)
+    vida = rng.geometric(1 / 8, n)
+    vida[rng.random(n) < 0.10] = n_archivos
+    baja = np.minimum(alta + vida, n_archivos)
+
+    inicio = fechas[0].toordinal()
+    ordinal_archivo = np.array([f.toordinal() for f in fechas])
+    # Los abiertos al inicio tienen documentos antiguos (hasta ~400 días); los nuevos, del día
+    antiguedad = np.where(alta == 0, np.minimum(rng.exponential(45, n), 400), rng.integers(0, 3, n))
+    fecha_doc = np.where(alta == 0, inicio, ordinal_archivo[alta]) - antiguedad.astype(np.int64)
+
+    monto = np.round(rng.lognormal(12.6, 0.9, n) / 50) * 50
+    monto[rng.random(n) < 0.03] *= -1  # notas crédito / abonos
+    return pd.DataFrame({
+        'cliente': rng.integers(0, n_clientes, n),
+        'alta': alta,
+        'baja': baja,
+        'fecha_doc': fecha_doc,
+        'monto': monto.astype(np.int64),
+        'clase': np.array(CLASES_DOC)[rng.integers(0, len(CLASES_DOC), n)],
+        'texto': np.array(TEXTOS, dtype=object)[rng.integers(0, len(TEXTOS), n)],
+    })
+
+
+def _proyectado(docs, clientes, fecha_archivo):
+    cli = clientes.iloc[docs['cliente'].to_numpy()].reset_index(drop=True)
+    ids = docs.index.to_numpy()
+    plazo = cli['CONDICIÓN SAP'].map(PLAZOS).to_numpy()
+    fecha_doc = docs['fecha_doc'].to_numpy()
+    vencimiento = fecha_doc + plazo
+    dias = fecha_archivo.toordinal() - vencimiento
+    monto = docs['monto'].to_numpy()
+
+    franja = np.searchsorted(LIMITES_ACTUAL, dias, side='left')
+    franja_top = np.searchsorted(LIMITES_TOP, dias, side='left')
+    vacio = np.full(len(docs), '', dtype=object)
+
+    df = pd.DataFrame({
+        'DOC. CONTABLE': 1200000000 + ids,
+        'COD. CLIENTE': cli['COD. CLIENTE'],
+        'DIVISIÓN': cli['DIVISIÓN'],
+        'CLASE DOC': docs['clase'].to_numpy(),
+        'Referencia': 'FVCN' + ids.astype(str).astype(object),
+        'Asignación': 3500000000 + ids,
+        'FECHA DOC': _texto_fechas(fecha_doc, '%d.%m.%Y'),
+        'Fecha_Vencimiento': _texto_fechas(vencimiento, '%d.%m.%Y'),
+        'CONDICIÓN SAP': cli['CONDICIÓN SAP'],
+        'TOTAL CARTERA': monto,
+        'TEXTO': docs['texto'].to_numpy(),
+        'DÍAS VENCIMIENTO': dias,
+        'NIT': cli['NIT'],
+        'RAZÓN SOCIAL': cli['RAZÓN SOCIAL'],
+        'MULTICÓDIGO': cli['MULTICÓDIGO'],
+        'CONDICIÓN PAGO': cli['CONDICIÓN SAP'],
+        'SEGMENTO': 'CREDITO',
+        'CIUDAD': cli['CIUDAD'],
+        'ANALISTA A CARGO': cli['ANALISTA A CARGO'],
+        'TEL1': cli['TEL'], 'TEL2': cli['TEL'], 'TEL3': '0', 'TEL4': cli['TEL'],
+        'CORREO': cli['CORREO'],
+        'JEFATURA': cli['JEFATURA'],
+        'ADMINISTRADO POR': 'CYRES',
+        'NOTIFICADO CARTA': vacio, 'ID SUSCEPTIBLE CASTIGO': vacio, 'SUSCEPTIBLE DE CASTIGO': vacio,
+        'FECHA DOC ARREGLADA': _texto_fechas(fecha_doc, '%d/%m/%Y'),
+        'FECHA VTO ARREGLADA': _texto_fechas(vencimiento, '%d/%m/%Y'),
+        'RUTA': cli['RUTA'],
+        'FRANJA ACTUAL': np.array(COLUMNAS_FRANJA)[franja],
+        'FRANJA TOP': np.array(FRANJAS_TOP)[franja_top],
+        # 1 en el primer documento de cada cliente
+        'CONTAR ÚNICO': (~pd.Series(docs['cliente'].to_numpy()).duplicated()).astype(int).to_numpy(),
+    })
+    for j, columna in enumerate(COLUMNAS_FRANJA):
+        df[columna] = np.where(franja == j, monto, 0)
+    df['CARTERA VENCIDA'] = np.where(dias >= 1, monto, 0)
+    df['Teléfono adicional 1'] = cli['TEL']
+    df['Teléfono adicional 2'] = vacio
+    df['Teléfono adicional 3'] = vacio
+    df['Teléfonos Validados'] = cli['TEL']
+    df['Correos Vallidados'] = vacio
+    return df[COLUMNAS_PROYECTADO]
+
+
+def _pagos(rng, docs, clientes, fecha_pago):
+    n = len(docs)
+    ordinal = np.full(n, fecha_pago.toordinal())
+    # Algunos pagos son parciales
+    valor = np.where(rng.random(n) < 0.2, docs['monto'].to_numpy() // 2, docs['monto'].to_numpy())
+    return pd.DataFrame({
+        'FECHA DOCUMENTO': _dia_sin_cero(ordinal, '', con_separador_anio=False),
+        'COD. CLIENTE': clientes['COD. CLIENTE'].to_numpy()[docs['cliente'].to_numpy()],
+        'VALOR PAGADO': valor,
+        'FECHA PAGO': _dia_sin_cero(ordinal, '/'),
+        'MÉTODO DE PAGO': np.array(METODOS_PAGO)[rng.integers(0, len(METODOS_PAGO), n)],
+    })
+
+
+def _gestion(rng, clientes, fechas, escala):
+    n_dia = GESTIONES_DIA * escala
+    n = n_dia * len(fechas)
+    cli = clientes.iloc[rng.integers(0, len(clientes), n)].reset_index(drop=True)
+    ordinal = np.repeat([f.toordinal() for f in fechas], n_dia)
+    efectivo = rng.random(n) < 0.55
+    promesa = rng.random(n) < 0.15
+    segundos = rng.integers(10, 400, n)
+    facturas = ('FVCN' + rng.integers(100000, 999999, n).astype(str).astype(object) + ', FVCN'
+                + rng.integers(100000, 999999, n).astype(str).astype(object))
+    valor_promesa = rng.integers(50000, 2000000, n).astype(str).astype(object)
+    observacion = np.array(OBSERVACIONES, dtype=object)[rng.integers(0, len(OBSERVACIONES), n)] + ' ' + facturas
+    vacio = np.full(n, '', dtype=object)
+    return pd.DataFrame({
+        'NIT': cli['NIT'],
+        'CEDULA': cli['CEDULA'],
+        'NOMBRE': cli['RAZÓN SOCIAL'],
+        'CODIGO_CLIENTE': cli['COD. CLIENTE'],
+        'ASESOR_CASA': cli['ASESOR'],
+        'USUARIO_GESTION': np.array(USUARIOS_GESTION)[rng.integers(0, len(USUARIOS_GESTION), n)],
+        'FECHA_GESTION': _dia_sin_cero(ordinal, '/'),
+        'ACCION': np.array(ACCIONES)[rng.integers(0, len(ACCIONES), n)],
+        'CONTACTO': np.where(efectivo, 'EFECTIVO', 'NO EFECTIVO'),
+        'EFECTO': np.array(EFECTOS)[rng.integers(0, len(EFECTOS), n)],
+        'FACTURAS_PAGAS': facturas,
+        'FECHA_PROMESA': np.where(promesa, _texto_fechas(ordinal + 2, '%Y-%m-%d'), vacio),
+        'VALOR_PROMESA': np.where(promesa, valor_promesa, vacio),
+        'ESTADO_PROMESA': np.where(promesa, 'PENDIENTE', ''),
+        'CUOTAS_PROMESA': np.where(promesa, '1', ''),
+        'DURACION_GESTION': [f"00:{s // 60:02d}:{s % 60:02d}" for s in segundos],
+        'MASIVO': np.array(MASIVOS)[rng.integers(0, len(MASIVOS), n)],
+        'CANAL_GESTION': cli['TEL'],
+        'OBSERVACION': observacion,
+    })[COLUMNAS_GESTION]
+
+
+def _fijar_fecha(ruta, fecha):
+    # procesar_todo toma la fecha del archivo de su fecha de modificación
+    marca = datetime(fecha.year, fecha.month, fecha.day, 7, 0).timestamp()
+    os.utime(ruta, (marca, marca))
+
+
+def generar(destino, escala=1, dias=22, hasta=None, semilla=0):
+    # Devuelve el número de filas escritas por tipo de archivo
+    rng = np.random.default_rng(semilla)
+    hasta = hasta or datetime.now().date()
+    fechas = _fechas_archivos(hasta, dias)
+
+    ruta_proy = os.path.join(destino, 'proyectados')
+    ruta_pagos = os.path.join(destino, 'pagos_diarios')
+    os.makedirs(ruta_proy, exist_ok=True)
+    os.makedirs(ruta_pagos, exist_ok=True)
+
+    clientes = _clientes(rng, CLIENTES * escala)
+    docs = _documentos(rng, len(clientes), fechas, escala)
+    filas = {'clientes': len(clientes), 'documentos': len(docs), 'proyectado': 0, 'pagos': 0}
+
+    for k, fecha in enumerate(fechas):
+        nombre = fecha.strftime('%d%m%Y') + '.csv'
+
+        abiertos = docs[(docs['alta'] <= k) & (docs['baja'] > k)]
+        ruta = os.path.join(ruta_proy, 'PROYECTADO' + nombre)
+        _proyectado(abiertos, clientes, fecha).to_csv(ruta, sep=';', encoding='latin1', index=False)
+        _fijar_fecha(ruta, fecha)
+        filas['proyectado'] += len(abiertos)
+
+        # Pagos del día: parte de los documentos que ya no aparecen en el archivo siguiente
+        salen = docs[docs['baja'] == k + 1]
+        pagados = salen[rng.random(len(salen)) < PROPORCION_PAGOS]
+        ruta = os.path.join(ruta_pagos, 'PAGOS' + nombre)
+        _pagos(rng, pagados, clientes, fecha).to_csv(ruta, sep=';', encoding='latin1', index=False)
+        _fijar_fecha(ruta, fecha)
+        filas['pagos'] += len(pagados)
+
+    df_gestion = _gestion(rng, clientes, fechas, escala)
+    df_gestion.to_csv(os.path.join(destino, 'gestion.zip'), sep=';', encoding='latin1', index=False,
+                      compression={'method': 'zip', 'archive_name': 'gestion.csv'})
+    filas['gestion'] = len(df_gestion)
+    filas['archivos'] = len(fechas)
+    return filas
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Genera datos sintéticos con el formato de data/")
+    parser.add_argument('destino')
+    parser.add_argument('--escala', type=int, default=1)
+    parser.add_argument('--dias', type=int, default=22, help="Archivos diarios (días hábiles)")
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args()
+    if os.path.abspath(args.destino) == os.path.abspath(os.path.join(os.path.dirname(__file__), 'data')):
+        sys.exit("No se generan datos sintéticos sobre data/")
+    print(generar(args.destino, escala=args.escala, dias=args.dias, semilla=args.semilla))
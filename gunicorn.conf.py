@@ -0,0 +1,27 @@
+import gc
+import os
+
+# --- CONFIGURACIÓN DE GUNICORN (render.yaml: gunicorn -c gunicorn.conf.py app:app) ---
+# preload_app: el maestro importa app.py una sola vez y precarga los datos (precarga.py) antes de
+# crear los workers; cada worker hereda la cache por fork en lugar de leer los CSV por su cuenta.
+# El número de workers sale de WEB_CONCURRENCY (gunicorn lo lee por defecto).
+os.environ.setdefault('CARTERA_PRECARGA', '1')
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '10000')}"
+preload_app = True
+# La precarga y el primer cálculo de /gestiones pueden pasar del límite por defecto (30 s)
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+# Workers con hilos (gthread). Las conexiones /api/eventos (SSE) ocupan un hilo cada una, por eso
+# eventos.py las limita a CARTERA_MAX_FLUJOS por worker, muy por debajo de los hilos
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+
+def when_ready(server):
+    # Lo precargado ya no cambia: se saca del recolector para que al recorrerlo los workers no
+    # escriban en esas páginas y dejen de compartirlas (copy-on-write)
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import metricas
+    metricas.reiniciar()
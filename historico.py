@@ -0,0 +1,122 @@
+import os
+import json
+import threading
+from functools import partial
+import pandas as pd
+
+import cargador_datos
+import esquema
+import metricas
+
+# --- HISTÓRICO PARTICIONADO POR MES ---
+# Cada fuente (proyectado = maestro, pagos, gestion) se guarda en Feather con un archivo por mes:
+# historico/<fuente>/AAAA-MM.feather, según su fecha (vencimiento, fecha de pago, fecha de gestión).
+# Una consulta de un periodo lee solo esa partición (y solo las columnas del consumidor).
+# Cuando cambia el archivo de origen se reescriben los meses que trae; los meses que ya no trae
+# (p. ej. pagos de meses anteriores que se limpiaron de la carpeta) se conservan: así el histórico
+# sigue creciendo aunque los archivos de trabajo solo tengan el mes en curso.
+# Las filas sin fecha no caen en ningún periodo y no se guardan.
+RUTA_HISTORICO = os.path.join(cargador_datos.RUTA_DATA, 'historico')
+RUTA_MANIFIESTO = os.path.join(RUTA_HISTORICO, 'manifiesto.json')
+
+FUENTES = {
+    # fuente: (ruta del origen, cargador, columna de fecha que define el mes)
+    'proyectado': (lambda: cargador_datos.RUTA_CARTERA, cargador_datos.cargar_cartera, 'VTO_FECHA_DT'),
+    'pagos': (lambda: cargador_datos.RUTA_PAGOS, cargador_datos.cargar_pagos, 'FECHA_PAGO_DT'),
+    'gestion': (lambda: cargador_datos.RUTA_GESTION, cargador_datos.cargar_gestion, 'FECHA_DT'),
+}
+
+_SINCRONIZADAS = {}  # fuente -> firma del origen ya particionada (evita releer el manifiesto)
+_LOCK = threading.Lock()
+
+
+def _leer_manifiesto():
+    if not os.path.exists(RUTA_MANIFIESTO):
+        return {}
+    try:
+        with open(RUTA_MANIFIESTO, 'r') as f:
+            return json.load(f)
+    except Exception as e:
+        # Se reconstruye: las particiones se vuelven a escribir en la próxima sincronización
+        metricas.contar('cartera_historico_errores_total', fuente='manifiesto', error=type(e).__name__)
+        return {}
+
+
+def _guardar_manifiesto(manifiesto):
+    temporal = RUTA_MANIFIESTO + '.tmp'
+    with open(temporal, 'w') as f:
+        json.dump(manifiesto, f, indent=1)
+    os.replace(temporal, RUTA_MANIFIESTO)
+
+
+def ruta_particion(fuente, anio, mes):
+    return os.path.join(RUTA_HISTORICO, fuente, f"{anio:04d}-{mes:02d}.feather")
+
+
+def sincronizar(fuente):
+    # Reescribe las particiones si el archivo de origen cambió desde la última vez
+    ruta_origen, cargador, col_fecha = FUENTES[fuente]
+    ruta = ruta_origen()
+    firma = cargador_datos.firma_archivo(ruta)
+    if firma is None:
+        return
+    if _SINCRONIZADAS.get(fuente) == firma:
+        return
+
+    with _LOCK:
+        manifiesto = _leer_manifiesto()
+        entrada = manifiesto.get(fuente, {})
+        if entrada.get('firma') == list(firma):
+            _SINCRONIZADAS[fuente] = firma
+            return
+
+        df = cargador(ruta)
+        os.makedirs(os.path.join(RUTA_HISTORICO, fuente), exist_ok=True)
+        particiones = dict(entrada.get('particiones', {}))
+        fechas = df[col_fecha]
+        for (anio, mes), filas in df.groupby([fechas.dt.year, fechas.dt.month], observed=True).groups.items():
+            destino = ruta_particion(fuente, int(anio), int(mes))
+            temporal = destino + '.tmp'
+            df.loc[filas].reset_index(drop=True).to_feather(temporal)
+            os.replace(temporal, destino)
+            cargador_datos.invalidar(destino)
+            particiones[f"{int(anio):04d}-{int(mes):02d}"] = len(filas)
+
+        manifiesto[fuente] = {'firma': list(firma), 'particiones': particiones}
+        _guardar_manifiesto(manifiesto)
+        _SINCRONIZADAS[fuente] = firma
+
+
+def sincronizar_todo():
+    for fuente in FUENTES:
+        try:
+            sincronizar(fuente)
+        except Exception as e:
+            metricas.contar('cartera_historico_errores_total', fuente=fuente, error=type(e).__name__)
+
+
+def periodos(fuente):
+    # [(anio, mes), ...] disponibles, del más reciente al más antiguo
+    sincronizar(fuente)
+    claves = _leer_manifiesto().get(fuente, {}).get('particiones', {})
+    return sorted(((int(c[:4]), int(c[5:])) for c in claves), reverse=True)
+
+
+def _columnas(fuente, consumidor):
+    if consumidor is None:
+        return None
+    # La columna de fecha puede estar ya en la proyección del consumidor
+    return list(dict.fromkeys(esquema.PROYECCIONES[consumidor] + [FUENTES[fuente][2]]))
+
+
+def _leer_particion(fuente, ruta, consumidor=None):
+    columnas = _columnas(fuente, consumidor)
+    if columnas is None:
+        return pd.read_feather(ruta)
+    return pd.read_feather(ruta, columns=columnas)
+
+
+def leer_periodo(fuente, anio, mes, consumidor=None):
+    # Solo el mes pedido (y, si se indica consumidor, solo sus columnas); None si no hay datos
+    sincronizar(fuente)
+    return cargador_datos.cargar_archivo(ruta_particion(fuente, anio, mes), partial(_leer_particion, fuente), consumidor)
@@ -0,0 +1,191 @@
+import os
+import re
+import time
+import cProfile
+import pstats
+import threading
+from contextlib import contextmanager
+
+from flask import g, request, has_request_context, Response, before_render_template, template_rendered
+
+# --- MÉTRICAS DE RENDIMIENTO ---
+# Tiempos por etapa (carga de CSV, limpieza, pivots, atribución de gestión, render...), bytes y
+# filas leídas y aciertos de la cache, en memoria del proceso. /metrics los expone en formato
+# Prometheus y cada respuesta lleva un encabezado Server-Timing con las etapas de esa petición.
+# Con gunicorn cada worker tiene sus propios contadores (Prometheus los suma por instancia).
+#
+# Perfil de una petición: con CARTERA_PERFIL=1 en el entorno, agregar ?perfil=1 a la URL guarda
+# un volcado de cProfile (.prof, para snakeviz/pstats) y un resumen en texto en data/perfiles/.
+
+CUBETAS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_AYUDA = {
+    'cartera_etapa_segundos': ('histogram', "Duración de cada etapa del procesamiento"),
+    'cartera_peticion_segundos': ('histogram', "Duración de las peticiones por ruta"),
+    'cartera_trabajo_segundos': ('histogram', "Duración de los trabajos de la cola"),
+    'cartera_bytes_leidos_total': ('counter', "Bytes de archivos de datos leídos desde disco"),
+    'cartera_filas_total': ('counter', "Filas leídas o procesadas por etapa"),
+    'cartera_cache_total': ('counter', "Consultas a la cache de DataFrames (acierto/fallo)"),
+}
+
+_CONTADORES = {}  # (nombre, etiquetas) -> valor
+_HISTOGRAMAS = {}  # (nombre, etiquetas) -> [conteos por cubeta, suma, total]
+_LOCK = threading.Lock()
+
+
+def _etiquetas(etiquetas):
+    return tuple(sorted((k, str(v)) for k, v in etiquetas.items()))
+
+
+def contar(nombre, valor=1, **etiquetas):
+    clave = (nombre, _etiquetas(etiquetas))
+    with _LOCK:
+        _CONTADORES[clave] = _CONTADORES.get(clave, 0) + valor
+
+
+def observar(nombre, segundos, **etiquetas):
+    clave = (nombre, _etiquetas(etiquetas))
+    with _LOCK:
+        histograma = _HISTOGRAMAS.get(clave)
+        if histograma is None:
+            histograma = _HISTOGRAMAS[clave] = [[0] * len(CUBETAS), 0.0, 0]
+        for i, limite in enumerate(CUBETAS):
+            if segundos <= limite:
+                histograma[0][i] += 1
+        histograma[1] += segundos
+        histograma[2] += 1
+
+
+def registrar_etapa(nombre, segundos):
+    observar('cartera_etapa_segundos', segundos, etapa=nombre)
+    # Dentro de una petición, también va al Server-Timing de la respuesta
+    if has_request_context():
+        etapas = g.setdefault('_etapas', {})
+        etapas[nombre] = etapas.get(nombre, 0.0) + segundos
+
+
+@contextmanager
+def etapa(nombre):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar_etapa(nombre, time.perf_counter() - inicio)
+
+
+class Cronometro:
+    # Para funciones largas sin reindentar: cada marca registra el tiempo desde la anterior
+    def __init__(self, prefijo):
+        self.prefijo = prefijo
+        self._anterior = time.perf_counter()
+
+    def marca(self, nombre, filas=None):
+        ahora = time.perf_counter()
+        registrar_etapa(f"{self.prefijo}.{nombre}", ahora - self._anterior)
+        if filas is not None:
+            contar('cartera_filas_total', filas, etapa=f"{self.prefijo}.{nombre}")
+        self._anterior = ahora
+
+
+def reiniciar():
+    # Cada worker de gunicorn empieza de cero: lo heredado del maestro (la precarga) no se repite
+    with _LOCK:
+        _CONTADORES.clear()
+        _HISTOGRAMAS.clear()
+
+
+# --- FORMATO PROMETHEUS ---
+def _texto_etiquetas(etiquetas, extra=()):
+    pares = list(etiquetas) + list(extra)
+    if not pares:
+        return ''
+    escapar = lambda v: v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{k}="{escapar(v)}"' for k, v in pares) + '}'
+
+
+def exportar():
+    with _LOCK:
+        contadores = dict(_CONTADORES)
+        histogramas = {clave: (list(h[0]), h[1], h[2]) for clave, h in _HISTOGRAMAS.items()}
+
+    lineas = []
+    nombres = sorted({n for n, _ in contadores} | {n for n, _ in histogramas})
+    for nombre in nombres:
+        tipo, ayuda = _AYUDA.get(nombre, ('untyped', nombre))
+        lineas.append(f"# HELP {nombre} {ayuda}")
+        lineas.append(f"# TYPE {nombre} {tipo}")
+        for (n, etiquetas), valor in sorted(contadores.items()):
+            if n == nombre:
+                lineas.append(f"{nombre}{_texto_etiquetas(etiquetas)} {valor}")
+        for (n, etiquetas), (cubetas, suma, total) in sorted(histogramas.items()):
+            if n != nombre:
+                continue
+            for limite, conteo in zip(CUBETAS, cubetas):
+                lineas.append(f"{nombre}_bucket{_texto_etiquetas(etiquetas, [('le', str(limite))])} {conteo}")
+            lineas.append(f"{nombre}_bucket{_texto_etiquetas(etiquetas, [('le', '+Inf')])} {total}")
+            lineas.append(f"{nombre}_sum{_texto_etiquetas(etiquetas)} {round(suma, 6)}")
+            lineas.append(f"{nombre}_count{_texto_etiquetas(etiquetas)} {total}")
+    return '\n'.join(lineas) + '\n'
+
+
+def server_timing(etapas, total):
+    # Nombres como tokens válidos del encabezado; duración en milisegundos
+    partes = [f"{re.sub(r'[^A-Za-z0-9_.-]', '_', nombre)};dur={segundos * 1000:.1f}"
+              for nombre, segundos in etapas.items()]
+    partes.append(f"total;dur={total * 1000:.1f}")
+    return ', '.join(partes)
+
+
+# --- INTEGRACIÓN CON FLASK ---
+def instrumentar(app, carpeta_perfiles):
+    perfil_habilitado = os.environ.get('CARTERA_PERFIL') == '1'
+
+    @app.before_request
+    def _iniciar():
+        g._inicio = time.perf_counter()
+        if perfil_habilitado and request.args.get('perfil') == '1':
+            g._perfil = cProfile.Profile()
+            g._perfil.enable()
+
+    @app.after_request
+    def _terminar(respuesta):
+        inicio = g.pop('_inicio', None)
+        if inicio is None:
+            return respuesta
+        total = time.perf_counter() - inicio
+        # La regla y no la URL: /api/cliente/<cod>/serie es una sola serie
+        ruta = request.url_rule.rule if request.url_rule is not None else 'sin_ruta'
+        observar('cartera_peticion_segundos', total, ruta=ruta, metodo=request.method,
+                 estado=respuesta.status_code)
+        respuesta.headers['Server-Timing'] = server_timing(g.get('_etapas', {}), total)
+
+        perfil = g.pop('_perfil', None)
+        if perfil is not None:
+            perfil.disable()
+            respuesta.headers['X-Perfil'] = _guardar_perfil(perfil, carpeta_perfiles, request.endpoint)
+        return respuesta
+
+    def _inicio_render(sender, template, context, **extra):
+        g._inicio_render = time.perf_counter()
+
+    def _fin_render(sender, template, context, **extra):
+        inicio = g.pop('_inicio_render', None)
+        if inicio is not None:
+            registrar_etapa(f"render.{template.name}", time.perf_counter() - inicio)
+
+    # weak=False: son funciones locales, blinker las soltaría al salir de instrumentar
+    before_render_template.connect(_inicio_render, app, weak=False)
+    template_rendered.connect(_fin_render, app, weak=False)
+
+    @app.route('/metrics')
+    def metricas():
+        return Response(exportar(), mimetype='text/plain; version=0.0.4')
+
+
+def _guardar_perfil(perfil, carpeta, endpoint):
+    os.makedirs(carpeta, exist_ok=True)
+    base = os.path.join(carpeta, f"{endpoint or 'peticion'}_{time.strftime('%Y%m%d_%H%M%S')}")
+    perfil.dump_stats(base + '.prof')
+    with open(base + '.txt', 'w') as f:
+        pstats.Stats(perfil, stream=f).sort_stats('cumulative').print_stats(40)
+    return os.path.basename(base) + '.prof'
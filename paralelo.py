@@ -0,0 +1,34 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# --- LECTURA EN PARALELO DE LOS ARCHIVOS DIARIOS ---
+# procesar_todo y consolidar_pagos leen y limpian cada CSV en un proceso del pool y reciben los
+# resultados en el MISMO orden de la lista de entrada: la consolidación (PRIMERA_APARICION,
+# keep='last', orden del consolidado de pagos) no cambia respecto de la lectura secuencial.
+# CARTERA_PROCESOS fija el número de procesos (por defecto, uno por núcleo; 1 = secuencial).
+PROCESOS = int(os.environ.get('CARTERA_PROCESOS', 0)) or os.cpu_count() or 1
+
+
+def mapear(funcion, elementos, procesos=None):
+    # Genera (elemento, resultado, error) en orden; error es la excepción si ese elemento falló.
+    # funcion debe estar definida a nivel de módulo (el pool la envía por pickle con spawn)
+    elementos = list(elementos)
+    procesos = min(procesos or PROCESOS, len(elementos))
+    if procesos <= 1:
+        for elemento in elementos:
+            try:
+                yield elemento, funcion(elemento), None
+            except Exception as e:
+                yield elemento, None, e
+        return
+
+    # spawn: el llamador puede ser un worker con hilos (cola de trabajos, gunicorn)
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=contexto) as pool:
+        futuros = [pool.submit(funcion, elemento) for elemento in elementos]
+        for elemento, futuro in zip(elementos, futuros):
+            try:
+                yield elemento, futuro.result(), None
+            except Exception as e:
+                yield elemento, None, e
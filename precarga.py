@@ -0,0 +1,92 @@
+import threading
+import time
+from datetime import datetime
+
+import atribucion
+import bitacora_gestion
+import cargador_datos
+import cubo
+import historico
+import metricas
+import procesador_dashboard
+import series_clientes
+
+# --- PRECARGA DE DATOS ANTES DE ATENDER PETICIONES ---
+# Con gunicorn.conf.py (preload_app) el proceso maestro importa app.py y corre precargar() antes de
+# crear los workers: cartera, pagos, gestión, los índices de la bitácora de gestiones y de atribución,
+# el snapshot del tablero, las particiones del mes y el cubo quedan en la cache de cargador_datos y
+# los workers la heredan por fork
+# (copy-on-write), así que ninguno vuelve a leer los CSV y las páginas de datos se comparten.
+# /listo responde 503 hasta que la precarga terminó (para el health check de Render).
+
+_ESTADO = {'listo': False, 'inicio': None, 'fin': None, 'etapas': {}, 'errores': {}, 'versiones': None}
+_LOCK = threading.Lock()
+
+
+def _version():
+    return {
+        'cartera': cargador_datos.firma_archivo(cargador_datos.RUTA_CARTERA),
+        'pagos': cargador_datos.firma_archivo(cargador_datos.RUTA_PAGOS),
+        'gestion': cargador_datos.firma_archivo(cargador_datos.RUTA_GESTION),
+    }
+
+
+def _snapshot():
+    # Si el snapshot no corresponde a los archivos actuales se regenera una sola vez aquí
+    snapshot = cargador_datos.cargar_snapshot()
+    if snapshot is None or snapshot['version'] != procesador_dashboard.version_datos():
+        procesador_dashboard.generar_snapshot()
+        cargador_datos.cargar_snapshot()
+
+
+def _etapas():
+    ahora = datetime.now()
+    return [
+        ('historico', historico.sincronizar_todo),
+        ('cartera', lambda: cargador_datos.cargar_cartera(consumidor='gestion')),
+        ('pagos', cargador_datos.cargar_pagos),
+        ('gestion', cargador_datos.cargar_gestion),
+        ('bitacora_gestion', lambda: bitacora_gestion.obtener_indice(cargador_datos.RUTA_GESTION)),
+        ('atribucion', lambda: atribucion.obtener_indice(cargador_datos.RUTA_GESTION)),
+        ('snapshot', _snapshot),
+        ('cubo', cubo.obtener_cubo),
+        ('mes_actual', lambda: series_clientes.obtener_matriz(ahora.year, ahora.month)),
+    ]
+
+
+def precargar():
+    with _LOCK:
+        _ESTADO.update(listo=False, inicio=time.time(), fin=None, etapas={}, errores={})
+
+    for nombre, funcion in _etapas():
+        inicio = time.perf_counter()
+        try:
+            funcion()
+        except Exception as e:
+            # Un archivo que falta o no se puede leer no impide arrancar: se cargará en la petición
+            print(f"Precarga de {nombre} fallida: {e}")
+            _ESTADO['errores'][nombre] = str(e)
+        segundos = time.perf_counter() - inicio
+        metricas.registrar_etapa(f"precarga.{nombre}", segundos)
+        _ESTADO['etapas'][nombre] = round(segundos, 3)
+
+    with _LOCK:
+        _ESTADO.update(listo=True, fin=time.time(), versiones=_version())
+    print(f"Precarga terminada en {_ESTADO['fin'] - _ESTADO['inicio']:.1f} s")
+
+
+def en_segundo_plano():
+    # Sin gunicorn (python app.py): se precarga en un hilo y /listo avisa cuando termina
+    threading.Thread(target=precargar, name='precarga', daemon=True).start()
+
+
+def estado():
+    with _LOCK:
+        resultado = {k: (dict(v) if isinstance(v, dict) else v) for k, v in _ESTADO.items()}
+    if resultado['inicio'] is not None:
+        fin = resultado['fin'] or time.time()
+        resultado['duracion'] = round(fin - resultado['inicio'], 3)
+    # Si los archivos cambiaron después de la precarga, la próxima petición los vuelve a leer
+    resultado['vigente'] = resultado['listo'] and resultado['versiones'] == _version()
+    resultado.pop('versiones')
+    return resultado
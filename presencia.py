@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+# --- PRESENCIA DE CADA DOCUMENTO EN LOS ARCHIVOS DIARIOS ---
+# Matriz de bits documento x archivo (en orden de ingesta): bit = el ID_DOC aparece en ese
+# PROYECTADO. Las filas van ordenadas por ID_DOC (búsqueda con searchsorted) y se guarda
+# empaquetada (packbits) en el estado del maestro. Un archivo nuevo agrega una columna sin releer
+# los anteriores; de la matriz salen, vectorizados:
+# - PENDIENTE / RECUPERADA: está o no en el último archivo.
+# - RECUPERACION: fecha del primer archivo donde ya no aparece, tras su última aparición.
+# - REVERSO: volvió a aparecer después de haber desaparecido (hay un hueco entre apariciones).
+# - DIAS_EN_CARTERA: días cubiertos por los archivos donde aparece (cada archivo cuenta hasta el
+#   siguiente; el último, hasta hoy).
+
+
+class Presencia:
+    def __init__(self, fechas, ids, bits):
+        self.fechas = list(fechas)  # fecha de cada archivo (columna)
+        self.ids = ids  # int64 ordenado (fila)
+        self.bits = bits  # bool (documentos x archivos)
+
+    @classmethod
+    def vacia(cls):
+        return cls([], np.empty(0, dtype=np.int64), np.zeros((0, 0), dtype=bool))
+
+    def agregar(self, archivos):
+        # archivos: [(fecha, ID_DOC del archivo), ...] en orden de ingesta
+        if not archivos:
+            return self
+        ids_archivos = [np.unique(np.asarray(ids, dtype=np.int64)) for _, ids in archivos]
+        ids = np.unique(np.concatenate([self.ids] + ids_archivos))
+
+        bits = np.zeros((len(ids), len(self.fechas) + len(archivos)), dtype=bool)
+        bits[np.searchsorted(ids, self.ids), :len(self.fechas)] = self.bits
+        for j, ids_archivo in enumerate(ids_archivos):
+            bits[np.searchsorted(ids, ids_archivo), len(self.fechas) + j] = True
+        return Presencia(self.fechas + [fecha for fecha, _ in archivos], ids, bits)
+
+    def indicadores(self, ids_documentos, hoy):
+        # Columnas del maestro para los ID_DOC pedidos (todos deben estar en la matriz)
+        bits = self.bits[np.searchsorted(self.ids, np.asarray(ids_documentos, dtype=np.int64))]
+        n = bits.shape[1]
+        fechas = pd.DatetimeIndex(self.fechas)
+
+        primera = bits.argmax(axis=1)
+        ultima = n - 1 - bits[:, ::-1].argmax(axis=1)
+        apariciones = bits.sum(axis=1)
+        pendiente = bits[:, -1]
+
+        # Archivo siguiente a la última aparición (no existe si sigue pendiente)
+        siguiente = np.minimum(ultima + 1, n - 1)
+        recuperacion = np.where(pendiente, np.datetime64('NaT'), fechas.values[siguiente])
+
+        dias_archivo = np.append(np.diff(fechas.values).astype('timedelta64[D]').astype(np.int64),
+                                 max((hoy - fechas[-1]).days, 0))
+        dias_en_cartera = np.zeros(len(bits), dtype=np.int64)
+        for j, dias in enumerate(dias_archivo):
+            dias_en_cartera[bits[:, j]] += dias
+        return pd.DataFrame({
+            'PENDIENTE': pendiente,
+            'RECUPERACION': pd.to_datetime(recuperacion),
+            'REVERSO': apariciones < (ultima - primera + 1),
+            'DIAS_EN_CARTERA': dias_en_cartera,
+        })
+
+    # Empaquetada en el pickle del estado: 1 bit por documento y archivo
+    def __getstate__(self):
+        return {'fechas': self.fechas, 'ids': self.ids, 'columnas': self.bits.shape[1],
+                'bits': np.packbits(self.bits, axis=1)}
+
+    def __setstate__(self, estado):
+        self.fechas = estado['fechas']
+        self.ids = estado['ids']
+        self.bits = np.unpackbits(estado['bits'], axis=1, count=estado['columnas']).astype(bool)
@@ -0,0 +1,189 @@
+import os
+import numpy as np
+import pandas as pd
+
+import cargador_datos
+import metricas
+from cargador_datos import cargar_cartera, cargar_pagos, firma_archivo
+from agregados import agregar_por_franja
+
+# Vistas del tablero principal (la columna de franja cambia según la vista)
+VISTAS = ['cyres', 'coca-cola']
+
+# Conjuntos de agrupación del tablero: se calculan todos en un solo recorrido (agregados.py)
+COL_ADMIN = 'ADMINISTRADO POR'
+DIMS_CLIENTE = ('COD. CLIENTE', 'NIT', 'RAZÓN SOCIAL')
+CONJUNTOS = [('CIUDAD',), (COL_ADMIN,), DIMS_CLIENTE, ()]
+
+def procesar_informacion(tipo_vista, ciudad_filtro=None):
+    cronometro = metricas.Cronometro('dashboard')
+    try:
+        # --- 1. Cargar datos (cache compartida, solo las columnas del tablero y ya tipadas: ver esquema.py) ---
+        df_cartera = cargar_cartera(consumidor='dashboard')
+        col_admin_real = COL_ADMIN
+        cronometro.marca('carga')
+
+        # 2. Lista de ciudades para el filtro
+        ciudades = sorted(df_cartera['CIUDAD'].dropna().unique().tolist())
+
+        # 4. Primero filtramos solo PENDIENTES
+        df_pendientes = df_cartera[df_cartera['ESTADO'].astype(str).str.upper() == 'PENDIENTE'].copy()
+
+        # 5. Aplicar Filtro de Ciudad
+        if ciudad_filtro and ciudad_filtro != "Todas":
+            df_pendientes = df_pendientes[df_pendientes['CIUDAD'] == ciudad_filtro]
+
+        # 6. Selección de columna de mora según vista
+        columna_franja = 'Franja de Mora Coca-Cola' if tipo_vista == 'coca-cola' else 'Franja Mora Cyres'
+        
+        # Validación de existencia de columna de franja para evitar errores en el pivot
+        if columna_franja not in df_pendientes.columns:
+            df_pendientes[columna_franja] = 'Sin Clasificar'
+
+        # 7. Procesar Recaudo (Pagos)
+        total_recaudo = 0
+        if os.path.exists(cargador_datos.RUTA_PAGOS):
+            try:
+                df_pagos = cargar_pagos()
+                if 'VALOR PAGADO' in df_pagos.columns:
+                    total_recaudo = df_pagos['VALOR PAGADO'].sum()
+            except:
+                total_recaudo = 0
+
+        # Saldo vencido: el documento cuenta completo si ya tiene al menos un día de mora
+        df_pendientes['SALDO_ES_VENCIDO'] = np.where(df_pendientes['DIAS_MORA'] >= 1, df_pendientes['TOTAL CARTERA'], 0)
+
+        cronometro.marca('limpieza', filas=len(df_pendientes))
+
+        # Todas las sumas por franja / total / vencido de ciudad, administrador, cliente y general
+        rollups = agregar_por_franja(df_pendientes, CONJUNTOS, columna_franja, 'TOTAL CARTERA', 'SALDO_ES_VENCIDO')
+        general = rollups[()]
+        franjas_general = general.columns.drop(['TOTAL CARTERA', 'SALDO_ES_VENCIDO'])
+        resumen_grafico = general[franjas_general].iloc[0].to_dict() if len(general) else {}
+        cronometro.marca('pivots')
+
+        # --- 8. GRÁFICO 1: PARTICIPACIÓN TOTAL POR CIUDAD ---
+        por_ciudad = rollups[('CIUDAD',)]
+        df_ciudades = por_ciudad['TOTAL CARTERA'].sort_values(ascending=False).reset_index()
+        if len(df_ciudades) > 10:
+            top_10 = df_ciudades.head(10).copy()
+            otros_valor = df_ciudades.iloc[10:]['TOTAL CARTERA'].sum()
+            fila_otros = pd.DataFrame({'CIUDAD': ['Otras'], 'TOTAL CARTERA': [otros_valor]})
+            df_final_ciudades = pd.concat([top_10, fila_otros], ignore_index=True)
+        else:
+            df_final_ciudades = df_ciudades
+
+        # --- 9. GRÁFICO 2: RANKING MORA ---
+        df_mora = por_ciudad['SALDO_ES_VENCIDO'].sort_values(ascending=False).reset_index()
+        if len(df_mora) > 10:
+            top_10_mora = df_mora.head(10).copy()
+            otros_mora = df_mora.iloc[10:]['SALDO_ES_VENCIDO'].sum()
+            fila_otros_mora = pd.DataFrame({'CIUDAD': ['Otras'], 'SALDO_ES_VENCIDO': [otros_mora]})
+            df_final_mora = pd.concat([top_10_mora, fila_otros_mora], ignore_index=True)
+        else:
+            df_final_mora = df_mora
+
+        # --- 10. TABLA DE COMPOSICIÓN (CIUDADES) ---
+        tabla_comp = tabla_por_franja(por_ciudad)
+        lista_composicion = tabla_comp.reset_index().sort_values(by='TOTAL_CARTERA', ascending=False).to_dict(orient='records')
+        columnas_franjas = [c for c in tabla_comp.columns if c not in ['TOTAL_CARTERA', 'TOTAL_VENCIDO', 'PORCENTAJE_VENCIDO', 'CIUDAD']]
+
+        # --- 11. TABLA POR ADMINISTRADOR ---
+        tabla_admin_df = tabla_por_franja(rollups[(col_admin_real,)])
+        lista_admin = tabla_admin_df.reset_index().sort_values(by='TOTAL_CARTERA', ascending=False).to_dict(orient='records')
+
+        # --- 12. TABLA POR CLIENTE ---
+        tabla_cliente_df = tabla_por_franja(rollups[DIMS_CLIENTE])
+        lista_clientes = tabla_cliente_df.reset_index() \
+                                         .sort_values(by='TOTAL_CARTERA', ascending=False) \
+                                         .to_dict(orient='records')
+
+        # --- 13. Retorno final ---
+        total_cartera_final = general['TOTAL CARTERA'].sum()
+        total_vencido_final = general['SALDO_ES_VENCIDO'].sum()
+        cronometro.marca('tablas')
+
+        return {
+            'ciudades': ciudades,
+            'kpis': {
+                'total_cartera': total_cartera_final,
+                'vencida': total_vencido_final,
+                'morosidad': (total_vencido_final / total_cartera_final * 100) if total_cartera_final > 0 else 0,
+                'recaudo': total_recaudo,
+                'clientes_total': df_pendientes['NIT'].nunique()
+            },
+            'graficos': {
+                'dona_labels': list(resumen_grafico.keys()),
+                'dona_valores': list(resumen_grafico.values()),
+                'ciudades_labels': df_final_ciudades['CIUDAD'].tolist(),
+                'ciudades_valores': df_final_ciudades['TOTAL CARTERA'].tolist(),
+                'mora_ciudades_labels': df_final_mora['CIUDAD'].tolist(),
+                'mora_ciudades_valores': df_final_mora['SALDO_ES_VENCIDO'].tolist(),
+            },
+            'tabla_composicion': lista_composicion,
+            'tabla_admin': lista_admin,
+            'tabla_clientes': lista_clientes, # <--- Ahora esta variable sí existe arriba
+            'columnas_franjas': columnas_franjas,
+            'detalles': []
+        }
+
+    except Exception as e:
+        print(f"❌ Error en procesar_informacion: {str(e)}")
+        return None
+
+
+def tabla_por_franja(rollup):
+    # Formato de las tablas del tablero: franjas, TOTAL_CARTERA, TOTAL_VENCIDO y % vencido
+    tabla = rollup.rename(columns={'TOTAL CARTERA': 'TOTAL_CARTERA', 'SALDO_ES_VENCIDO': 'TOTAL_VENCIDO'})
+    tabla.columns = list(tabla.columns)
+    tabla['PORCENTAJE_VENCIDO'] = (tabla['TOTAL_VENCIDO'] / tabla['TOTAL_CARTERA'] * 100).fillna(0)
+    return tabla
+
+
+# --- SNAPSHOT MATERIALIZADO DEL TABLERO ---
+# procesar_todo / consolidar_pagos lo generan al terminar: guarda el resultado de
+# procesar_informacion para cada vista x ciudad, junto con la versión (firma) de los
+# archivos de los que salió. La ruta / solo lo busca; si la versión no coincide se calcula en vivo.
+def version_datos():
+    return (firma_archivo(cargador_datos.RUTA_CARTERA), firma_archivo(cargador_datos.RUTA_PAGOS))
+
+
+def clave_vista(tipo_vista):
+    return 'coca-cola' if tipo_vista == 'coca-cola' else 'cyres'
+
+
+def generar_snapshot():
+    version = version_datos()
+    if version[0] is None:
+        return "No hay archivo maestro para generar el snapshot."
+
+    df_cartera = cargar_cartera(consumidor='dashboard')
+    ciudades = sorted(df_cartera['CIUDAD'].dropna().unique().tolist())
+
+    resultados = {}
+    for vista in VISTAS:
+        for ciudad in ['Todas'] + ciudades:
+            datos = procesar_informacion(vista, ciudad)
+            if datos is not None:
+                resultados[(vista, ciudad)] = datos
+
+    # Escritura atómica: un lector nunca ve un snapshot a medio escribir
+    temporal = cargador_datos.RUTA_SNAPSHOT + '.tmp'
+    pd.to_pickle({'version': version, 'datos': resultados}, temporal)
+    os.replace(temporal, cargador_datos.RUTA_SNAPSHOT)
+    cargador_datos.invalidar(cargador_datos.RUTA_SNAPSHOT)
+    return f"Snapshot del tablero generado ({len(resultados)} combinaciones vista x ciudad)."
+
+
+def obtener_informacion(tipo_vista, ciudad_filtro=None):
+    ciudad = ciudad_filtro if ciudad_filtro else 'Todas'
+    try:
+        snapshot = cargador_datos.cargar_snapshot()
+        if snapshot is not None and snapshot['version'] == version_datos():
+            datos = snapshot['datos'].get((clave_vista(tipo_vista), ciudad))
+            if datos is not None:
+                return datos
+    except Exception as e:
+        print(f"Snapshot ilegible, se calcula en vivo: {e}")
+
+    return procesar_informacion(tipo_vista, ciudad_filtro)
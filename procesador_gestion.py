@@ -1,36 +1,50 @@
+import numpy as np
 import pandas as pd
 import os
 from datetime import datetime
 
-def calcular_gestion(ruta_cartera, ruta_gestion, analista_seleccionado='Todos'):
+import metricas
+import bitacora_gestion
+from atribucion import obtener_indice
+from cargador_datos import cargar_cartera, cargar_pagos
+from franjas import clasificar, RANGOS_INACTIVIDAD, SIN_GESTION
+
+def construir_detalle(df_master, col_car_id, col_nom, col_franja, col_sal):
+    # Una fila por documento pendiente con su última gestión
+    contacto = df_master['CONTACTO'].astype(object).str.strip().str.upper()
+    return pd.DataFrame({
+        'ID': df_master[col_car_id],
+        'NOMBRE': df_master[col_nom],
+        'FRANJA': df_master[col_franja],
+        'ESTADO': np.where(df_master['CONTACTO'].notnull(), 'GESTIONADO', 'SIN GESTIÓN'),
+        'CONTACTO': contacto.where(contacto.notnull() & (contacto != ''), 'PTE / SIN CONTACTO'),
+        'SALDO': df_master[col_sal],
+        'RANGO_INACTIVIDAD': df_master['RANGO_GESTION'],
+        'FECHA_ULTIMA': df_master['FECHA_DT'].dt.strftime('%d/%m/%Y').fillna("—"),
+        'CIUDAD': df_master['CIUDAD'] if 'CIUDAD' in df_master.columns else '',
+    })
+
+def calcular_gestion(ruta_cartera, ruta_gestion, analista_seleccionado='Todos', incluir_detalle=True,
+                     ventana_atribucion=None):
+    # ventana_atribucion: días hacia atrás en que una gestión se acredita un pago (None = atribucion.VENTANA_DIAS)
+    cronometro = metricas.Cronometro('gestion')
     try:
-        # --- CARGA INTELIGENTE DE CARTERA ---
-        if ruta_cartera.endswith('.zip'):
-            df_car = pd.read_csv(ruta_cartera, sep=';', encoding='latin1', compression='zip')
-        else:
-            df_car = pd.read_csv(ruta_cartera, sep=';', encoding='latin1')
-
-        # --- CARGA INTELIGENTE DE GESTIÓN ---
-        if ruta_gestion.endswith('.zip'):
-            df_ges = pd.read_csv(ruta_gestion, sep=';', encoding='latin1', compression='zip')
-        else:
-            df_ges = pd.read_csv(ruta_gestion, sep=';', encoding='latin1')
-
-        df_car.columns = df_car.columns.str.strip()
-        df_ges.columns = df_ges.columns.str.strip()
+        # --- CARGA INTELIGENTE DE CARTERA (cache compartida, soporta .zip y .csv) ---
+        df_car = cargar_cartera(ruta_cartera, consumidor='gestion')
 
-        # CREAMOS LA COPIA MAESTRA ANTES DE FILTRAR PARA EL RANKING
-        df_ges_maestra = df_ges.copy()
-        df_ges_maestra['FECHA_DT'] = pd.to_datetime(df_ges_maestra['FECHA_GESTION'], dayfirst=True, errors='coerce') 
-
-        # 3. FILTRO DE ANALISTA (Este ya lo tienes, déjalo igual)
-        if analista_seleccionado != 'Todos':
-            if 'USUARIO_GESTION' in df_ges.columns:
-                df_ges = df_ges[df_ges['USUARIO_GESTION'] == analista_seleccionado]
+        # --- GESTIÓN: índice incremental de la bitácora (bitacora_gestion.py) ---
+        # Última gestión por cliente, mejor contacto del día y ranking de hoy ya agregados;
+        # el filtro de analista se aplica al consultarlo. El ranking del día es el de hoy (la misma
+        # fecha de la inactividad)
+        hoy = datetime.now()
+        indice_ges = bitacora_gestion.obtener_indice(ruta_gestion, hoy.date())
+        cronometro.marca('carga', filas=len(df_car) + indice_ges.filas)
 
         # 4. Filtro de Pendientes
         if 'ESTADO' in df_car.columns:
             df_car = df_car[df_car['ESTADO'].str.strip() == 'PENDIENTE'].copy()
+        else:
+            df_car = df_car.copy()
 
         col_car_id = 'COD. CLIENTE'
         col_ges_id = 'CODIGO_CLIENTE'
@@ -39,63 +53,41 @@ def calcular_gestion(ruta_cartera, ruta_gestion, analista_seleccionado='Todos'):
         col_sal = 'TOTAL CARTERA'
         col_user = 'USUARIO_GESTION'
 
-        df_car[col_car_id] = df_car[col_car_id].astype(str).str.replace(r'\.0$', '', regex=True).str.strip()
-        df_ges[col_ges_id] = df_ges[col_ges_id].astype(str).str.replace(r'\.0$', '', regex=True).str.strip()
-
-        # --- SOLUCIÓN AL ERROR DE FECHA (COHERENCIA) ---
-        # Forzamos el formato Día/Mes/Año para que 10/01 no sea 01/10
-        df_ges['FECHA_DT'] = pd.to_datetime(df_ges['FECHA_GESTION'], format='%d/%m/%Y', errors='coerce')
-        
-        # Si el formato anterior falla (por cambios en el CSV), usamos dayfirst=True como respaldo
-        if df_ges['FECHA_DT'].isnull().all():
-            df_ges['FECHA_DT'] = pd.to_datetime(df_ges['FECHA_GESTION'], dayfirst=True, errors='coerce')
-
-        gestiones_mes = df_ges.copy()
-
         # --- LÓGICA DE ANALISTAS MEJORADA ---
-        df_ana = gestiones_mes.copy()
-        df_ana = df_ana[df_ana[col_user] != 'Jhon Polanco']
-        df_ana['SOLO_FECHA'] = df_ana['FECHA_DT'].dt.date
-
-        df_ana['ORDEN_CONTACTO'] = df_ana['CONTACTO'].map({'EFECTIVO': 1, 'NO EFECTIVO': 2}).fillna(3)
-        df_mejor_gestion = df_ana.sort_values([col_user, 'SOLO_FECHA', col_ges_id, 'ORDEN_CONTACTO']).drop_duplicates(subset=[col_user, 'SOLO_FECHA', col_ges_id])
+        # Mejor contacto por (analista, día, cliente), mantenido por el índice de la bitácora
+        df_mejor_gestion = indice_ges.mejor_gestion_dia(analista_seleccionado)
+        df_mejor_gestion = df_mejor_gestion[df_mejor_gestion[col_user] != 'Jhon Polanco']
 
-        res_analistas = df_mejor_gestion.groupby(col_user).agg(
+        res_analistas = df_mejor_gestion.groupby(col_user, observed=True).agg(
             Clientes_Unicos_Dia=(col_ges_id, 'count'),
-            Efectivos=(col_ges_id, lambda x: (df_mejor_gestion.loc[x.index, 'CONTACTO'] == 'EFECTIVO').sum())
+            Efectivos=('ES_EFECTIVO', 'sum')
         ).reset_index()
 
-        total_gestiones_raw = df_ana.groupby(col_user).size()
-        res_analistas['Intensidad'] = (res_analistas[col_user].map(total_gestiones_raw) / res_analistas['Clientes_Unicos_Dia']).round(1)
+        total_gestiones_raw = indice_ges.gestiones
+        gestiones_usuario = res_analistas[col_user].map(total_gestiones_raw).astype('float64')
+        res_analistas['Intensidad'] = (gestiones_usuario / res_analistas['Clientes_Unicos_Dia']).round(1)
         res_analistas['Efec_Porc'] = ((res_analistas['Efectivos'] / res_analistas['Clientes_Unicos_Dia']) * 100).round(1).fillna(0)
         res_analistas = res_analistas.sort_values(by='Efec_Porc', ascending=False).reset_index(drop=True)
 
         df_timeline = df_mejor_gestion.groupby('SOLO_FECHA').agg(
             Gestionados=(col_ges_id, 'count'),
-            Efectivos=(col_ges_id, lambda x: (df_mejor_gestion.loc[x.index, 'CONTACTO'] == 'EFECTIVO').sum())
+            Efectivos=('ES_EFECTIVO', 'sum')
         ).reset_index()
         
         df_timeline['Efec_P'] = (df_timeline['Efectivos'] / df_timeline['Gestionados'] * 100).round(1).fillna(0)
         df_timeline['No_Efec_P'] = (100 - df_timeline['Efec_P']).round(1)
-        df_timeline['FECHA_STR'] = df_timeline['SOLO_FECHA'].apply(lambda x: x.strftime('%d-%m') if pd.notnull(x) else "")
+        df_timeline['FECHA_STR'] = df_timeline['SOLO_FECHA'].dt.strftime('%d-%m').fillna("")
+        cronometro.marca('analistas')
 
         # --- CONTINUACIÓN LÓGICA ORIGINAL ---
-        ultima_gest = gestiones_mes.sort_values('FECHA_DT').groupby(col_ges_id).last()
+        ultima_gest = indice_ges.ultima_gestion(analista_seleccionado)
         df_master = pd.merge(df_car, ultima_gest[['CONTACTO', 'FECHA_DT']], left_on=col_car_id, right_index=True, how='left')
 
-        # Usar la fecha actual del sistema para la inactividad
-        hoy = datetime.now()
-        def clasificar_antiguedad(fecha):
-            if pd.isnull(fecha): return "1. Sin Gestión"
-            dias = (hoy - fecha).days
-            if dias <= 0: return "2. Gestión Hoy"
-            if dias == 1: return "3. Gestión Ayer"
-            if 2 <= dias <= 5: return "4. Sin gestión (2-5 días)"
-            if 6 <= dias <= 10: return "5. Sin gestión (6-10 días)"
-            if 11 <= dias <= 15: return "6. Sin gestión (11-15 días)"
-            return "7. Sin gestión (+15 días)"
-
-        df_master['RANGO_GESTION'] = df_master['FECHA_DT'].apply(clasificar_antiguedad)
+        # Usar la fecha actual del sistema para la inactividad (días completos desde la última gestión)
+        dias_sin_gestion = (pd.Timestamp(hoy) - df_master['FECHA_DT']).dt.days
+        df_master['RANGO_GESTION'] = np.where(
+            dias_sin_gestion.isna(), SIN_GESTION, clasificar(dias_sin_gestion, RANGOS_INACTIVIDAD).astype(str)
+        )
 
         df_uni_matriz = df_master.drop_duplicates(subset=[col_car_id])
         matriz = pd.crosstab(df_uni_matriz['RANGO_GESTION'], df_uni_matriz[col_franja])
@@ -109,84 +101,41 @@ def calcular_gestion(ruta_cartera, ruta_gestion, analista_seleccionado='Todos'):
         cant_gest = len(df_uni_matriz[df_uni_matriz['CONTACTO'].notnull()])
         cant_efec = len(df_uni_matriz[df_uni_matriz['CONTACTO'] == 'EFECTIVO'])
 
-        res_franja = df_uni_matriz.groupby([col_franja]).agg(Total=(col_car_id, 'size'), Gestionados=('CONTACTO', 'count')).reset_index()
-        efec_f = df_uni_matriz[df_uni_matriz['CONTACTO'] == 'EFECTIVO'].groupby(col_franja).size()
+        res_franja = df_uni_matriz.groupby([col_franja], observed=True).agg(Total=(col_car_id, 'size'), Gestionados=('CONTACTO', 'count')).reset_index()
+        efec_f = df_uni_matriz[df_uni_matriz['CONTACTO'] == 'EFECTIVO'].groupby(col_franja, observed=True).size()
         res_franja['Sin_Gestion'] = res_franja['Total'] - res_franja['Gestionados']
         res_franja['Efectivo'] = res_franja[col_franja].map(efec_f).fillna(0).astype(int)
+        cronometro.marca('matriz', filas=len(df_master))
         
+        # Detalle por documento (una sola conversión a registros, sin iterrows).
+        # La página /gestiones ya no lo incrusta: lo sirve paginado /api/gestiones/detalle.
         lista_det = []
-        for _, fila in df_master.iterrows():
-            contacto_original = fila.get('CONTACTO')
-            contacto_limpio = str(contacto_original).strip().upper() if pd.notnull(contacto_original) and str(contacto_original).strip() != "" else 'PTE / SIN CONTACTO'
-            
-            fecha_gest = "—"
-            if pd.notnull(fila.get('FECHA_DT')):
-                fecha_gest = fila['FECHA_DT'].strftime('%d/%m/%Y')
-
-            lista_det.append({
-                'ID': fila.get(col_car_id, ''), 
-                'NOMBRE': fila.get(col_nom, ''), 
-                'FRANJA': fila.get(col_franja, ''),
-                'ESTADO': 'GESTIONADO' if pd.notnull(fila.get('CONTACTO')) else 'SIN GESTIÓN',
-                'CONTACTO': contacto_limpio, 
-                'SALDO': fila.get(col_sal, 0), 
-                'RANGO_INACTIVIDAD': fila.get('RANGO_GESTION', '1. Sin Gestión'),
-                'FECHA_ULTIMA': fecha_gest
-            })
-
-        # --- RANKING DEL DÍA (Sustituye tu bloque actual por este) ---
-        hoy_dt = hoy.date()
-        gestiones_hoy = df_ges[df_ges['FECHA_DT'].dt.date == hoy_dt].copy()
-        ranking_dia_final = []
+        if incluir_detalle:
+            lista_det = construir_detalle(df_master, col_car_id, col_nom, col_franja, col_sal).to_dict(orient='records')
+            cronometro.marca('detalle')
 
         # --- RANKING DEL DÍA (ORDENADO POR EFECTIVIDAD) ---
-        hoy_dt = hoy.date()
-        gestiones_hoy = df_ges[df_ges['FECHA_DT'].dt.date == hoy_dt].copy()
-        ranking_dia_final = []
-
-        if not gestiones_hoy.empty:
-            ranking_dia_df = gestiones_hoy.groupby(col_user).agg(
-                clientes_unicos=(col_ges_id, 'nunique'),
-                gestiones_totales=(col_ges_id, 'count')
-            ).reset_index()
-
-            efec_hoy = gestiones_hoy[gestiones_hoy['CONTACTO'] == 'EFECTIVO'].groupby(col_user).size()
-            ranking_dia_df['efectivos'] = ranking_dia_df[col_user].map(efec_hoy).fillna(0).astype(int)
-            
-            # Cálculo: Efectivos / Gestiones Totales
-            ranking_dia_df['porc_efec'] = ((ranking_dia_df['efectivos'] / ranking_dia_df['gestiones_totales']) * 100).round(1).fillna(0)
-            
-            ranking_dia_df = ranking_dia_df[ranking_dia_df[col_user] != 'Jhon Polanco']
-
-            # --- CAMBIO AQUÍ: Ordenamos por porcentaje de mayor a menor ---
-            ranking_dia_final = ranking_dia_df.sort_values(by='porc_efec', ascending=False).to_dict(orient='records')
+        # Contadores de hoy mantenidos al ingerir las gestiones: aquí solo se leen
+        ranking_dia_final = [fila for fila in indice_ges.ranking_dia(hoy.date(), analista_seleccionado)
+                             if fila[col_user] != 'Jhon Polanco']
+        cronometro.marca('ranking_dia')
 
         # --- LÓGICA DE RECAUDO MODIFICADA ---
         recaudo_stats_final = {'labels': [], 'valores': [], 'ranking': []}
         try:
             ruta_pagos = ruta_gestion.replace('gestion.zip', 'PagosConsolidado.csv')
             if os.path.exists(ruta_pagos):
-                df_pagos = pd.read_csv(ruta_pagos, sep=';', encoding='latin1')
-                df_pagos.columns = df_pagos.columns.str.strip()
+                df_pagos = cargar_pagos(ruta_pagos).copy()
                 col_pag_id = 'COD. CLIENTE'
-                df_pagos[col_pag_id] = df_pagos[col_pag_id].astype(str).str.replace(r'\.0$', '', regex=True).str.strip()
                 
-                df_pagos['FECHA_PAGO_DT'] = pd.to_datetime(df_pagos['FECHA PAGO'], dayfirst=True, errors='coerce')
-                df_pagos['FECHA_REF'] = df_pagos['FECHA_PAGO_DT'].dt.strftime('%Y-%m-%d')
                 df_pagos['VALOR_PAGADO'] = pd.to_numeric(df_pagos['VALOR PAGADO'], errors='coerce').fillna(0)
                 df_pagos = df_pagos[df_pagos['VALOR_PAGADO'] > 0].copy()
 
-                # --- ATRIBUCIÓN ESTÁTICA (Usa la maestra) ---
-                df_atrib_base = df_ges_maestra.copy() 
-                df_atrib_base[col_ges_id] = df_atrib_base[col_ges_id].astype(str).str.replace(r'\.0$', '', regex=True).str.strip()
-                df_atrib_base['FECHA_REF'] = df_atrib_base['FECHA_DT'].dt.strftime('%Y-%m-%d')
-                
-                gest_prio = df_atrib_base[df_atrib_base[col_user] != 'Jhon Polanco'].copy()
-                gest_prio['PRIO'] = gest_prio['CONTACTO'].apply(lambda x: 1 if x == 'EFECTIVO' else 2)
-                gest_prio = gest_prio.sort_values(['PRIO']).drop_duplicates(subset=[col_ges_id, 'FECHA_REF'], keep='first')
-
-                mapa_resp = dict(zip(gest_prio[col_ges_id] + gest_prio['FECHA_REF'], gest_prio[col_user]))
-                df_pagos['ANALISTA_REAL'] = (df_pagos[col_pag_id] + df_pagos['FECHA_REF']).map(mapa_resp).fillna('Sin Gestión')
+                # --- ATRIBUCIÓN (todas las gestiones, sin el filtro de analista) ---
+                # Índice por (cliente, día) construido una vez por versión de gestion.zip (atribucion.py)
+                indice = obtener_indice(ruta_gestion)
+                df_pagos['ANALISTA_REAL'] = indice.atribuir(df_pagos[col_pag_id], df_pagos['FECHA_PAGO_DT'],
+                                                            ventana=ventana_atribucion)
 
                 # 1. Ranking: Siempre todos los analistas
                 total_global = float(df_pagos['VALOR_PAGADO'].sum())
@@ -219,6 +168,7 @@ def calcular_gestion(ruta_cartera, ruta_gestion, analista_seleccionado='Todos'):
                 }
         except:
             pass # Mantiene el dict vacío inicial si falla algo
+        cronometro.marca('atribucion')
 
         return {
             'total_clientes': int(total_clientes), 
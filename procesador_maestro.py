@@ -1,112 +1,261 @@
+import numpy as np
 import pandas as pd
 import os
+import re
 import glob
 from datetime import datetime
 
-# --- FUNCIONES DE APOYO PARA LAS FRANJAS ---
-def obtener_franja_cyres(dias):
-    if dias < -1: return "0- Corriente"
-    if dias == -1: return "1- Vence mañana"
-    if dias == 0: return "2- Vence hoy"
-    if dias == 1: return "3- Venció ayer"
-    if 2 <= dias <= 4: return "4- 2 a 4"
-    if 5 <= dias <= 7: return "5- 5 a 7"
-    if 8 <= dias <= 14: return "6- 8 a 14"
-    if 15 <= dias <= 21: return "7- 15 a 21"
-    if 22 <= dias <= 30: return "8- 22 a 30"
-    return "9- Mayor a 30"
-
-def obtener_franja_coca(dias):
-    if dias <= 0: return "0- Corriente"
-    if 1 <= dias <= 7: return "1- 1 a 7"
-    if 8 <= dias <= 14: return "2- 8 a 14"
-    if 15 <= dias <= 21: return "3- 15 a 21"
-    if 22 <= dias <= 30: return "4- 22 a 30"
-    return "5- Mayor a 30"
-
-def procesar_todo():
-    ruta_proy = r'C:\Dashboard\data\proyectados'
-    ruta_maestro = r'C:\Dashboard\data\Proyectadoconsolidado.csv'
+import cargador_datos
+import esquema
+import historico
+import metricas
+import paralelo
+import procesador_dashboard
+from presencia import Presencia
+from franjas import clasificar, FRANJAS_CYRES, FRANJAS_COCA
+
+# --- ESTADO PERSISTIDO PARA EL MODO INCREMENTAL ---
+# Guarda el maestro ya deduplicado (una fila por ID_DOC con su PRIMERA_APARICION y la fecha del
+# último archivo donde se vio), el manifiesto de archivos ya ingeridos y la matriz de presencia de
+# cada documento en cada archivo (presencia.py).
+RUTA_ESTADO = os.path.join(cargador_datos.RUTA_DATA, 'estado_maestro.pkl')
+VERSION_ESTADO = 4
+
+# --- IDENTIDAD DEL DOCUMENTO ---
+# ID_DOC: hash de 64 bits (int64) de los campos que identifican un documento, calculado vectorizado.
+# Montos y códigos entran como número (un archivo donde pandas los infiera float da el mismo hash).
+# ID_VERIFICACION combina los mismos hashes por columna con otro multiplicador: si dos documentos
+# distintos chocaran en ID_DOC, sus verificaciones diferirían y la consolidación se detiene en
+# lugar de mezclarlos.
+CAMPOS_ID = ['COD. CLIENTE', 'Referencia', 'FECHA DOC', 'Fecha_Vencimiento', 'TOTAL CARTERA']
+CAMPOS_ID_NUMERICOS = ['COD. CLIENTE', 'TOTAL CARTERA']
+MULTIPLICADOR_ID = np.uint64(0x9E3779B97F4A7C15)
+MULTIPLICADOR_VERIFICACION = np.uint64(0xC2B2AE3D27D4EB4F)
+
+
+def _texto(serie):
+    # Con pandas 3 astype(str) deja los vacíos como NaN y el ID legible completo quedaría NaN
+    return serie.astype(str).fillna('nan')
+
+
+def _combinar(hashes, multiplicador):
+    # Mezcla en orden los hashes por columna (uint64, la multiplicación desborda a propósito)
+    resultado = np.zeros(len(hashes[0]), dtype=np.uint64)
+    for h in hashes:
+        resultado = (resultado ^ h) * multiplicador
+        resultado ^= resultado >> np.uint64(29)
+    return resultado.view(np.int64)
+
+
+def claves_documento(df):
+    # (ID_DOC, ID_VERIFICACION) como int64 para cada fila
+    hashes = []
+    for col in CAMPOS_ID:
+        if col in CAMPOS_ID_NUMERICOS:
+            valores = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+        else:
+            valores = _texto(df[col]).str.strip().to_numpy(dtype=object)
+        hashes.append(pd.util.hash_array(valores))
+    return _combinar(hashes, MULTIPLICADOR_ID), _combinar(hashes, MULTIPLICADOR_VERIFICACION)
+
+
+def verificar_colisiones(verificacion_por_id):
+    # Un mismo ID_DOC con dos verificaciones distintas = dos documentos con el mismo hash
+    rango = verificacion_por_id.agg(['min', 'max'])
+    choques = rango.index[rango['min'] != rango['max']]
+    if len(choques):
+        raise ValueError(f"Colisión de ID_DOC entre documentos distintos: {choques[:5].tolist()}")
+
+
+def id_legible(df):
+    # La concatenación de texto que antes se guardaba como ID_S, solo cuando se necesita mostrarla
+    return (_texto(df['COD. CLIENTE']) + _texto(df['Referencia']) + _texto(df['FECHA DOC']) +
+            _texto(df['Fecha_Vencimiento']).str.strip() + _texto(df['TOTAL CARTERA']))
+
+
+def fecha_archivo(nombre, mtime_ns):
+    # La fecha va en el nombre (PROYECTADO02012026.csv = 02/01/2026); si no, la de modificación
+    coincidencia = re.search(r'(\d{8})', nombre)
+    if coincidencia:
+        fecha = pd.to_datetime(coincidencia.group(1), format='%d%m%Y', errors='coerce')
+        if not pd.isna(fecha):
+            return fecha
+    return pd.to_datetime(datetime.fromtimestamp(mtime_ns / 1e9).date())
+
+
+def leer_proyectado(archivo):
+    # Texto de baja cardinalidad como category (esquema.py); los campos del ID_DOC se leen como siempre
+    encabezados = pd.read_csv(archivo, sep=';', encoding='latin1', nrows=0).columns
+    df_temp = pd.read_csv(archivo, sep=';', encoding='latin1',
+                          dtype=esquema.tipos_lectura(encabezados, codigos=False))
+    df_temp['Fecha_Vencimiento'] = _texto(df_temp['Fecha_Vencimiento']).str.strip()
+    # COL 1: ID_DOC (Generado para cada registro en cada archivo)
+    df_temp['ID_DOC'], df_temp['ID_VERIFICACION'] = claves_documento(df_temp)
+    # Guardamos la fecha del archivo para saber cuándo apareció
+    df_temp['FECHA_ORIGEN_ARCHIVO'] = fecha_archivo(os.path.basename(archivo), os.stat(archivo).st_mtime_ns)
+    df_temp['PRIMERA_APARICION'] = df_temp['FECHA_ORIGEN_ARCHIVO']
+    return df_temp
+
+
+def manifiesto_archivos(archivos):
+    # Orden determinista de ingesta: por la fecha del archivo (nombre) y luego por nombre
+    entradas = []
+    for archivo in archivos:
+        info = os.stat(archivo)
+        entradas.append((os.path.basename(archivo), info.st_mtime_ns, info.st_size))
+    return sorted(entradas, key=lambda e: (fecha_archivo(e[0], e[1]), e[0]))
+
+
+def cargar_estado():
+    if not os.path.exists(RUTA_ESTADO):
+        return None
+    try:
+        estado = pd.read_pickle(RUTA_ESTADO)
+        if estado.get('version') != VERSION_ESTADO:
+            return None
+        return estado
+    except Exception as e:
+        print(f"Estado incremental ilegible, se hace reconstrucción completa: {e}")
+        return None
+
+
+def guardar_estado(estado):
+    temporal = RUTA_ESTADO + '.tmp'
+    pd.to_pickle(estado, temporal)
+    os.replace(temporal, RUTA_ESTADO)
+
+
+def consolidar(df_previo, nuevos):
+    # Une el maestro previo (ya deduplicado) con los archivos nuevos, en orden de ingesta.
+    # El sort estable conserva el orden de archivos dentro de la misma fecha, así que el
+    # resultado es idéntico al de consolidar todos los archivos desde cero.
+    lista_df = esquema.unificar_categorias(([df_previo] if df_previo is not None else []) + nuevos)
+    df_maestro = pd.concat(lista_df, ignore_index=True)
+    df_maestro = df_maestro.sort_values(by='FECHA_ORIGEN_ARCHIVO', kind='stable')
+    grupos = df_maestro.groupby('ID_DOC')
+    verificar_colisiones(grupos['ID_VERIFICACION'])
+
+    # 2. COL 3: PRIMERA_APARICION (Antes de quitar duplicados, capturamos la fecha mínima)
+    df_maestro['PRIMERA_APARICION'] = grupos['PRIMERA_APARICION'].transform('min')
+
+    # Ahora sí, dejamos un solo registro por ID_DOC (el más reciente para los datos actuales)
+    return df_maestro.drop_duplicates(subset=['ID_DOC'], keep='last')
+
+
+def procesar_todo(incremental=True, progreso=None):
+    # progreso(fraccion, mensaje): avance opcional para la cola de trabajos (tareas.py)
+    avanzar = progreso or (lambda fraccion, mensaje: None)
+    cronometro = metricas.Cronometro('maestro')
+    ruta_proy = os.path.join(cargador_datos.RUTA_DATA, 'proyectados')
+    ruta_maestro = cargador_datos.RUTA_CARTERA
     hoy = pd.to_datetime(datetime.now().date())
 
-    # 1. CONSOLIDACIÓN INICIAL
+    # 1. CONSOLIDACIÓN (incremental si el manifiesto guardado es prefijo de los archivos actuales)
     archivos = glob.glob(os.path.join(ruta_proy, "*.csv"))
     if not archivos:
         return "No se encontraron archivos para procesar."
 
-    lista_df = []
-    for archivo in archivos:
-        df_temp = pd.read_csv(archivo, sep=';', encoding='latin1')
-        df_temp['Fecha_Vencimiento'] = df_temp['Fecha_Vencimiento'].astype(str).str.strip()
-        # COL 1: ID_S (Generado para cada registro en cada archivo)
-        df_temp['ID_S'] = (df_temp['COD. CLIENTE'].astype(str) + df_temp['Referencia'].astype(str) + 
-                           df_temp['FECHA DOC'].astype(str) + df_temp['Fecha_Vencimiento'].astype(str) + 
-                           df_temp['TOTAL CARTERA'].astype(str))
-        # Guardamos la fecha del archivo para saber cuándo apareció
-        df_temp['FECHA_ORIGEN_ARCHIVO'] = pd.to_datetime(datetime.fromtimestamp(os.path.getmtime(archivo)).date())
-        lista_df.append(df_temp)
-
-    # Unimos todo y eliminamos duplicados (dejamos la primera aparición para la fecha)
-    df_maestro = pd.concat(lista_df, ignore_index=True)
-    df_maestro = df_maestro.sort_values(by='FECHA_ORIGEN_ARCHIVO')
-    
-    # 2. COL 3: PRIMERA_APARICION (Antes de quitar duplicados, capturamos la fecha mínima)
-    df_maestro['PRIMERA_APARICION'] = df_maestro.groupby('ID_S')['FECHA_ORIGEN_ARCHIVO'].transform('min')
-    
-    # Ahora sí, dejamos un solo registro por ID_S (el más reciente para los datos actuales)
-    df_maestro = df_maestro.drop_duplicates(subset=['ID_S'], keep='last')
-
-    # 3. DETERMINAR ESTADOS (Basado en el ÚLTIMO archivo cargado)
-    ultimo_archivo_path = max(archivos, key=os.path.getmtime)
-    df_ultimo = pd.read_csv(ultimo_archivo_path, sep=';', encoding='latin1')
-    df_ultimo['Fecha_Vencimiento'] = df_ultimo['Fecha_Vencimiento'].astype(str).str.strip()
-    ids_en_ultimo = set((df_ultimo['COD. CLIENTE'].astype(str) + df_ultimo['Referencia'].astype(str) + 
-                         df_ultimo['FECHA DOC'].astype(str) + df_ultimo['Fecha_Vencimiento'].astype(str) + 
-                         df_ultimo['TOTAL CARTERA'].astype(str)).unique())
-
-    # COL 2: ESTADO
-    df_maestro['ESTADO'] = df_maestro['ID_S'].apply(lambda x: 'PENDIENTE' if x in ids_en_ultimo else 'RECUPERADA')
-
-    # COL 4: RECUPERACION (Fecha del archivo más reciente donde apareció antes de desaparecer)
-    # Si está PENDIENTE, no tiene fecha de recuperación. Si está RECUPERADA, usamos su última fecha de origen.
-    df_maestro['RECUPERACION'] = df_maestro.apply(
-        lambda row: row['FECHA_ORIGEN_ARCHIVO'] if row['ESTADO'] == 'RECUPERADA' else pd.NaT, axis=1
-    )
-
-    # COL 5: REVERSO (Lógica: Si el archivo de origen es más reciente que su "supuesta" recuperación previa)
-    # En una consolidación total, el reverso se detecta si el estado vuelve a ser PENDIENTE tras haber sido RECUPERADA
-    # Por ahora marcamos NO por defecto, ya que la consolidación lo maneja al marcarlo PENDIENTE de nuevo
-    df_maestro['REVERSO'] = 'NO' 
+    manifiesto = manifiesto_archivos(archivos)
+    estado = cargar_estado() if incremental else None
+    if estado is not None and manifiesto[:len(estado['manifiesto'])] != estado['manifiesto']:
+        # Se modificó, borró o agregó un archivo "en medio": no se puede mezclar, se reconstruye
+        estado = None
+
+    ya_ingeridos = len(estado['manifiesto']) if estado is not None else 0
+    pendientes = manifiesto[ya_ingeridos:]
+    # Lectura y armado del ID_DOC en paralelo (paralelo.py); los resultados llegan en orden de ingesta
+    nuevos = []
+    rutas = [os.path.join(ruta_proy, nombre) for nombre, _, _ in pendientes]
+    for i, (ruta, df_temp, error) in enumerate(paralelo.mapear(leer_proyectado, rutas)):
+        if error is not None:
+            raise error
+        nuevos.append(df_temp)
+        avanzar(0.6 * (i + 1) / len(pendientes), f"Leído {os.path.basename(ruta)}")
+    cronometro.marca('lectura', filas=sum(len(df) for df in nuevos))
+    avanzar(0.6, "Consolidando documentos")
+
+    if nuevos:
+        df_maestro = consolidar(estado['maestro'] if estado is not None else None, nuevos)
+        # Una columna de presencia por archivo nuevo; los anteriores no se releen
+        presencia = (estado['presencia'] if estado is not None else Presencia.vacia()).agregar(
+            [(fecha_archivo(nombre, mtime), df['ID_DOC'].to_numpy()) for (nombre, mtime, _), df in zip(pendientes, nuevos)])
+        guardar_estado({
+            'version': VERSION_ESTADO,
+            'manifiesto': manifiesto,
+            'maestro': df_maestro,
+            'presencia': presencia,
+        })
+    else:
+        df_maestro = estado['maestro']
+        presencia = estado['presencia']
+    df_maestro = df_maestro.copy()
+    cronometro.marca('consolidacion', filas=len(df_maestro))
+
+    avanzar(0.7, "Calculando estados y franjas")
+
+    # 3. DETERMINAR ESTADOS (matriz de presencia en todos los archivos, ver presencia.py)
+    indicadores = presencia.indicadores(df_maestro['ID_DOC'].to_numpy(), hoy)
+
+    # COL 2: ESTADO (PENDIENTE si aparece en el último archivo cargado)
+    df_maestro['ESTADO'] = np.where(indicadores['PENDIENTE'], 'PENDIENTE', 'RECUPERADA')
+
+    # COL 4: RECUPERACION (Fecha del primer archivo en que ya no aparece; PENDIENTE no tiene)
+    df_maestro['RECUPERACION'] = indicadores['RECUPERACION'].to_numpy()
+
+    # COL 5: REVERSO (Volvió a aparecer después de haber desaparecido de algún archivo)
+    df_maestro['REVERSO'] = np.where(indicadores['REVERSO'], 'SI', 'NO')
+    df_maestro['DIAS_EN_CARTERA'] = indicadores['DIAS_EN_CARTERA'].to_numpy()
 
     # COL 6: VTO_DT
     df_maestro['Fecha_Vencimiento'] = df_maestro['Fecha_Vencimiento'].astype(str).str.strip()
     df_maestro['VTO_DT'] = pd.to_datetime(df_maestro['Fecha_Vencimiento'], format='%d.%m.%Y', errors='coerce')
 
-    # COL 7: DIAS_MORA
-    def calc_mora(row):
-        if row['ESTADO'] == 'PENDIENTE':
-            return (hoy - row['VTO_DT']).days
-        else:
-            return (row['RECUPERACION'] - row['VTO_DT']).days
-    
-    df_maestro['DIAS_MORA'] = df_maestro.apply(calc_mora, axis=1)
+    # COL 7: DIAS_MORA (PENDIENTE contra hoy, RECUPERADA contra su fecha de recuperación)
+    fecha_corte = df_maestro['RECUPERACION'].where(df_maestro['ESTADO'] == 'RECUPERADA', hoy)
+    df_maestro['DIAS_MORA'] = (fecha_corte - df_maestro['VTO_DT']).dt.days
 
-    # COL 8 Y 9: FRANJAS
-    df_maestro['Franja Mora Cyres'] = df_maestro['DIAS_MORA'].apply(obtener_franja_cyres)
-    df_maestro['Franja de Mora Coca-Cola'] = df_maestro['DIAS_MORA'].apply(obtener_franja_coca)
+    # COL 8 Y 9: FRANJAS (clasificación vectorizada, ver franjas.py)
+    df_maestro['Franja Mora Cyres'] = clasificar(df_maestro['DIAS_MORA'], FRANJAS_CYRES)
+    df_maestro['Franja de Mora Coca-Cola'] = clasificar(df_maestro['DIAS_MORA'], FRANJAS_COCA)
 
     # COL 10: MAX_MORA (Solo de los PENDIENTES)
     mora_activa = df_maestro[df_maestro['ESTADO'] == 'PENDIENTE'].groupby('COD. CLIENTE')['DIAS_MORA'].max()
     df_maestro['MAX_MORA'] = df_maestro['COD. CLIENTE'].map(mora_activa).fillna(0)
 
     # COL 11: FRANJA TOP GENERAL
-    df_maestro['Franja Top General'] = df_maestro['MAX_MORA'].apply(obtener_franja_coca)
+    df_maestro['Franja Top General'] = clasificar(df_maestro['MAX_MORA'], FRANJAS_COCA)
 
     # Limpieza final de columnas técnicas y guardado
-    columnas_finales = [col for col in df_maestro.columns if col != 'FECHA_ORIGEN_ARCHIVO']
-    df_maestro[columnas_finales].to_csv(ruta_maestro, index=False, sep=';', encoding='latin1')
+    # Se escribe en un temporal y se publica con os.replace: nadie lee un maestro a medio escribir
+    cronometro.marca('estados')
+    avanzar(0.8, "Publicando el maestro")
+    columnas_finales = [col for col in df_maestro.columns if col not in ('FECHA_ORIGEN_ARCHIVO', 'ID_VERIFICACION')]
+    temporal = ruta_maestro + '.tmp'
+    df_maestro[columnas_finales].to_csv(temporal, index=False, sep=';', encoding='latin1')
+    os.replace(temporal, ruta_maestro)
+    cargador_datos.invalidar(ruta_maestro)
+    cronometro.marca('escritura')
+
+    # Agregados del tablero materializados para esta versión del maestro
+    avanzar(0.9, "Generando el snapshot del tablero")
+    try:
+        procesador_dashboard.generar_snapshot()
+    except Exception as e:
+        print(f"No se pudo generar el snapshot del tablero: {e}")
+    cronometro.marca('snapshot')
+
+    # Particiones mensuales del histórico (historico.py)
+    avanzar(0.95, "Actualizando el histórico mensual")
+    try:
+        historico.sincronizar('proyectado')
+    except Exception as e:
+        print(f"No se pudo actualizar el histórico del maestro: {e}")
+    cronometro.marca('historico')
     
-    return f"Consolidación exitosa. Archivo maestro actualizado con {len(df_maestro)} registros únicos."
+    modo = f"incremental, {len(nuevos)} archivo(s) nuevo(s)" if ya_ingeridos else f"completa, {len(nuevos)} archivo(s)"
+    return f"Consolidación exitosa ({modo}). Archivo maestro actualizado con {len(df_maestro)} registros únicos."
 
 if __name__ == "__main__":
-    print(procesar_todo())
\ No newline at end of file
+    import sys
+    # python procesador_maestro.py --completo  -> ignora el estado y reconstruye desde cero
+    print(procesar_todo(incremental='--completo' not in sys.argv))
\ No newline at end of file
@@ -1,39 +1,182 @@
 import pandas as pd
 import os
 import glob
+import json
+import shutil
+import sys
+
+import cargador_datos
+import esquema
+import historico
+import metricas
+import paralelo
+import procesador_dashboard
+
+# --- CONSOLIDACIÓN INCREMENTAL DE PAGOS ---
+# El manifiesto guarda qué ARCHIVO_ORIGEN ya están en PagosConsolidado.csv (con su firma) y la
+# firma del consolidado al terminar. Cada corrida solo lee los archivos nuevos, por bloques, y los
+# agrega al final. Si un archivo ya ingerido cambió o desapareció, o el consolidado no coincide
+# con el manifiesto, se reconstruye todo. En ambos casos se escribe en un temporal (copia del
+# consolidado para agregar) que reemplaza al anterior de forma atómica, y el manifiesto se
+# actualiza solo después del reemplazo: un lector nunca ve filas a medias y una corrida que se
+# interrumpe no deja filas que el manifiesto no conozca.
+RUTA_MANIFIESTO = os.path.join(cargador_datos.RUTA_DATA, 'PagosConsolidado.manifiesto.json')
+VERSION_MANIFIESTO = 1
+TAMANO_BLOQUE = 50000
+
+
+def leer_manifiesto():
+    if not os.path.exists(RUTA_MANIFIESTO):
+        return None
+    try:
+        with open(RUTA_MANIFIESTO, 'r') as f:
+            manifiesto = json.load(f)
+        if manifiesto.get('version') != VERSION_MANIFIESTO:
+            return None
+        return manifiesto
+    except Exception as e:
+        print(f"Manifiesto de pagos ilegible, se reconstruye el consolidado: {e}")
+        return None
+
+
+def guardar_manifiesto(archivos, ruta_destino):
+    temporal = RUTA_MANIFIESTO + '.tmp'
+    with open(temporal, 'w') as f:
+        json.dump({
+            'version': VERSION_MANIFIESTO,
+            'archivos': archivos,
+            'firma_salida': list(cargador_datos.firma_archivo(ruta_destino)),
+        }, f, indent=1)
+    os.replace(temporal, RUTA_MANIFIESTO)
+
+
+def normalizar_bloque(df, nombre_archivo):
+    # Tipos explícitos: códigos enteros (sin el .0), FECHA PAGO como fecha, VALOR PAGADO numérico
+    df.columns = df.columns.str.strip()
+    df = df.dropna(how='all')  # filas vacías del Excel de origen
+
+    for col in esquema.PAGOS_CODIGOS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').round().astype('Int64')
+    if 'VALOR PAGADO' in df.columns:
+        df['VALOR PAGADO'] = pd.to_numeric(df['VALOR PAGADO'], errors='coerce').fillna(0)
+    if 'FECHA PAGO' in df.columns:
+        df['FECHA PAGO'] = pd.to_datetime(df['FECHA PAGO'], dayfirst=True, errors='coerce')
+
+    df['ARCHIVO_ORIGEN'] = nombre_archivo
+    return df.reindex(columns=esquema.PAGOS_COLUMNAS)
+
+
+def texto_archivo(archivo):
+    # Lee el archivo diario por bloques y devuelve (filas ya en formato CSV, sin encabezado; cantidad).
+    # Corre en un proceso del pool (paralelo.py): solo viaja el texto, no el DataFrame
+    filas = 0
+    partes = []
+    nombre = os.path.basename(archivo)
+    lector = pd.read_csv(archivo, sep=';', encoding='latin1', dtype=str, chunksize=TAMANO_BLOQUE)
+    for bloque in lector:
+        bloque = normalizar_bloque(bloque, nombre)
+        partes.append(bloque.to_csv(index=False, sep=';', header=False, date_format='%d/%m/%Y'))
+        filas += len(bloque)
+    return ''.join(partes), filas
+
+
+def consolidar_pagos(completo=False, progreso=None):
+    # progreso(fraccion, mensaje): avance opcional para la cola de trabajos (tareas.py)
+    avanzar = progreso or (lambda fraccion, mensaje: None)
+    cronometro = metricas.Cronometro('pagos')
+    ruta_origen = os.path.join(cargador_datos.RUTA_DATA, 'pagos_diarios')
+    ruta_destino = cargador_datos.RUTA_PAGOS
+
+    # 1. Buscar todos los archivos CSV en la carpeta de pagos
+    archivos_csv = sorted(glob.glob(os.path.join(ruta_origen, "*.csv")))
 
-def consolidar_pagos():
-    ruta_origen = r'C:\Dashboard\data\pagos_diarios'
-    ruta_destino = r'C:\Dashboard\data\PagosConsolidado.csv'
-    
-    # 1. Buscar todos los archivos Excel en la carpeta de pagos
-    archivos_csv = glob.glob(os.path.join(ruta_origen, "*.csv"))
-    
     if not archivos_csv:
         return "No se encontraron archivos en la carpeta de pagos diarios."
 
-    print(f"Encontrados {len(archivos_csv)} archivos. Iniciando consolidación...")
+    firmas = {os.path.basename(a): list(cargador_datos.firma_archivo(a)) for a in archivos_csv}
+
+    # 2. ¿Se puede agregar solo lo nuevo? El consolidado debe ser el que dejó el manifiesto y
+    # ningún archivo ya ingerido puede haber cambiado
+    manifiesto = None if completo else leer_manifiesto()
+    ingeridos = {}
+    if manifiesto is not None:
+        firma_salida = cargador_datos.firma_archivo(ruta_destino)
+        previos = manifiesto['archivos']
+        if (firma_salida is not None and list(firma_salida) == manifiesto['firma_salida']
+                and all(firmas.get(nombre) == firma for nombre, firma in previos.items())):
+            ingeridos = previos
+
+    nuevos = [a for a in archivos_csv if os.path.basename(a) not in ingeridos]
+    if ingeridos and not nuevos:
+        return "Sin cambios: no hay archivos de pagos nuevos para consolidar."
+
+    # 3. Escribir por bloques en un temporal: copia del consolidado + lo nuevo, o todo desde cero
+    errores = []
+    leidos = 0
+    filas = 0
+    ruta_escritura = ruta_destino + '.tmp'
+    if ingeridos:
+        print(f"Agregando {len(nuevos)} archivo(s) nuevo(s) a PagosConsolidado.csv...")
+        shutil.copyfile(ruta_destino, ruta_escritura)
+        modo = 'a'
+    else:
+        print(f"Encontrados {len(archivos_csv)} archivos. Iniciando consolidación completa...")
+        modo = 'w'
+
+    # Los archivos se leen en paralelo y se escriben en el orden de la lista, como antes
+    encabezado = pd.DataFrame(columns=esquema.PAGOS_COLUMNAS).to_csv(index=False, sep=';')
+    with open(ruta_escritura, modo, encoding='latin1', newline='') as destino:
+        con_encabezado = modo == 'w'
+        for i, (archivo, resultado, error) in enumerate(paralelo.mapear(texto_archivo, nuevos)):
+            avanzar(0.8 * (i + 1) / len(nuevos), f"Leído {os.path.basename(archivo)}")
+            if error is not None:
+                # Queda fuera del manifiesto y se reintenta en la próxima consolidación
+                errores.append(os.path.basename(archivo))
+                print(f"Error leyendo {archivo}: {error}")
+                continue
+            texto, filas_archivo = resultado
+            if con_encabezado:
+                destino.write(encabezado)
+                con_encabezado = False
+            destino.write(texto)
+            filas += filas_archivo
+            leidos += 1
+            ingeridos[os.path.basename(archivo)] = firmas[os.path.basename(archivo)]
+
+    if leidos == 0:
+        # Ningún archivo se pudo leer: el consolidado y el manifiesto anteriores quedan como estaban
+        os.remove(ruta_escritura)
+        return f"Error: no se pudo leer ningún archivo de pagos ({', '.join(errores)}); el consolidado no cambió."
+
+    os.replace(ruta_escritura, ruta_destino)
+    guardar_manifiesto(ingeridos, ruta_destino)
+    cargador_datos.invalidar(ruta_destino)
+    cronometro.marca('escritura', filas=filas)
 
-    # 2. Leer y concatenar todos los archivos
-    lista_df = []
-    for archivo in archivos_csv:
-        try:
-            df = pd.read_csv(archivo, sep=';', encoding='latin1')
-            # Agregamos una columna opcional para saber de qué archivo vino el dato
-            df['ARCHIVO_ORIGEN'] = os.path.basename(archivo)
-            lista_df.append(df)
-        except Exception as e:
-            print(f"Error leyendo {archivo}: {e}")
+    # El recaudo forma parte de los KPIs del tablero: se regenera el snapshot
+    avanzar(0.85, "Generando el snapshot del tablero")
+    try:
+        procesador_dashboard.generar_snapshot()
+    except Exception as e:
+        print(f"No se pudo generar el snapshot del tablero: {e}")
+    cronometro.marca('snapshot')
 
-    # 3. Unir todo en un solo DataFrame
-    consolidado = pd.concat(lista_df, ignore_index=True)
+    # Particiones mensuales del histórico (historico.py)
+    avanzar(0.95, "Actualizando el histórico mensual")
+    try:
+        historico.sincronizar('pagos')
+    except Exception as e:
+        print(f"No se pudo actualizar el histórico de pagos: {e}")
+    cronometro.marca('historico')
 
-    # 4. Guardar el resultado final (Sobrescribe el anterior)
-    consolidado.to_csv(ruta_destino, index=False, sep=';', encoding='latin1')
-    
-    return f"Éxito: Se consolidaron {len(archivos_csv)} archivos en PagosConsolidado.csv"
+    tipo = "agregaron" if modo == 'a' else "consolidaron"
+    mensaje = f"Éxito: Se {tipo} {leidos} archivos ({filas} filas) en PagosConsolidado.csv"
+    if errores:
+        mensaje += f". No se pudieron leer: {', '.join(errores)}"
+    return mensaje
 
 
 if __name__ == "__main__":
-    resultado = consolidar_pagos()
-    print(resultado)
\ No newline at end of file
+    resultado = consolidar_pagos(completo='--completo' in sys.argv)
+    print(resultado)
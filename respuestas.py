@@ -0,0 +1,93 @@
+import os
+import glob
+import gzip
+import hashlib
+from datetime import datetime
+from functools import wraps
+
+from flask import request, make_response
+
+import cargador_datos
+
+try:
+    import brotli  # opcional: si no está instalado solo se ofrece gzip
+except ImportError:
+    brotli = None
+
+# --- ETAG POR VERSIÓN DE LOS DATOS Y COMPRESIÓN ---
+# Las páginas y APIs del tablero solo cambian cuando cambia el maestro, PagosConsolidado.csv o
+# gestion.zip. El ETag se arma con la firma (mtime/tamaño) de esos archivos, la ruta con sus
+# parámetros, la fecha del día (mora, inactividad y "corte ayer" dependen de hoy) y la versión del
+# código/plantillas. Si el navegador ya tiene esa versión (If-None-Match) se responde 304 sin
+# tocar pandas. Las respuestas de texto se comprimen con brotli o gzip según Accept-Encoding.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TIPOS_COMPRIMIBLES = ('text/html', 'application/json', 'text/csv', 'text/plain', 'application/javascript', 'text/css')
+TAMANO_MINIMO = 1024
+
+
+def _version_codigo():
+    # Igual en todos los workers: cambia con cada despliegue que toque código o plantillas
+    archivos = glob.glob(os.path.join(BASE_DIR, '*.py')) + glob.glob(os.path.join(BASE_DIR, 'templates', '*.html'))
+    return max((os.path.getmtime(a) for a in archivos), default=0)
+
+
+VERSION_CODIGO = _version_codigo()
+
+
+def etag_datos():
+    firmas = [cargador_datos.firma_archivo(ruta) for ruta in
+              (cargador_datos.RUTA_CARTERA, cargador_datos.RUTA_PAGOS, cargador_datos.RUTA_GESTION)]
+    parametros = sorted(request.args.items(multi=True))
+    clave = repr((firmas, request.path, parametros, datetime.now().date().isoformat(), VERSION_CODIGO))
+    return hashlib.sha1(clave.encode('utf-8')).hexdigest()[:24]
+
+
+def con_etag(vista):
+    # Decorador para rutas GET cuyo resultado depende solo de los archivos de datos y los parámetros
+    @wraps(vista)
+    def envoltura(*args, **kwargs):
+        etag = etag_datos()
+        # Débil: el mismo contenido puede viajar comprimido o no
+        if request.if_none_match.contains_weak(etag):
+            respuesta = make_response('', 304)
+        else:
+            respuesta = make_response(vista(*args, **kwargs))
+            if respuesta.status_code != 200:
+                return respuesta
+        respuesta.set_etag(etag, weak=True)
+        # El navegador guarda la página pero pregunta siempre si sigue vigente
+        respuesta.headers['Cache-Control'] = 'private, no-cache'
+        return respuesta
+    return envoltura
+
+
+def _elegir_codificacion():
+    aceptadas = request.accept_encodings
+    if brotli is not None and aceptadas['br']:
+        return 'br'
+    if aceptadas['gzip']:
+        return 'gzip'
+    return None
+
+
+def comprimir(app):
+    @app.after_request
+    def _comprimir(respuesta):
+        if (respuesta.status_code != 200 or respuesta.direct_passthrough or respuesta.is_streamed
+                or 'Content-Encoding' in respuesta.headers
+                or respuesta.mimetype not in TIPOS_COMPRIMIBLES):
+            return respuesta
+        respuesta.vary.add('Accept-Encoding')
+        codificacion = _elegir_codificacion()
+        datos = respuesta.get_data()
+        if codificacion is None or len(datos) < TAMANO_MINIMO:
+            return respuesta
+
+        if codificacion == 'br':
+            comprimido = brotli.compress(datos, quality=5)
+        else:
+            comprimido = gzip.compress(datos, compresslevel=6)
+        respuesta.set_data(comprimido)
+        respuesta.headers['Content-Encoding'] = codificacion
+        return respuesta
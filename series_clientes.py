@@ -0,0 +1,102 @@
+import calendar
+import threading
+import numpy as np
+import pandas as pd
+
+from cargador_datos import firma_archivo
+import cargador_datos
+import historico
+
+# --- SERIES DIARIAS POR CLIENTE (drill-down de detalle_analisis) ---
+# Matriz densa cliente x día del mes para el presupuesto (TOTAL CARTERA por vencimiento) y los
+# ingresos (VALOR PAGADO por fecha de pago), con un índice código -> fila. Se construye una vez
+# por versión de los archivos y mes; /api/cliente/<cod>/serie devuelve solo la fila pedida.
+# Solo se leen las particiones del mes pedido (historico.py).
+
+_MATRICES = {}
+_LOCK = threading.Lock()
+
+
+class MatrizClientes:
+    def __init__(self, codigos, presupuesto, ingresos):
+        self.codigos = codigos  # pd.Index de códigos (texto)
+        self.presupuesto = presupuesto  # float64 (clientes x días)
+        self.ingresos = ingresos
+
+    @property
+    def dias(self):
+        return self.presupuesto.shape[1]
+
+    def _filas(self, codigos):
+        posiciones = self.codigos.get_indexer([str(c) for c in codigos])
+        return posiciones[posiciones >= 0]
+
+    def serie(self, codigo):
+        filas = self._filas([codigo])
+        if len(filas) == 0:
+            return None
+        return self._respuesta(filas)
+
+    def suma(self, codigos):
+        # Suma de varios clientes (la tabla filtrada de la página)
+        return self._respuesta(self._filas(codigos))
+
+    def _respuesta(self, filas):
+        return {
+            'labels': [f"{d:02d}" for d in range(1, self.dias + 1)],
+            'presupuesto': self.presupuesto[filas].sum(axis=0).tolist(),
+            'ingresos': self.ingresos[filas].sum(axis=0).tolist(),
+            'clientes': int(len(filas)),
+        }
+
+
+def _acumular(codigos, dias, valores, indice, n_dias):
+    # Suma valores en la celda (cliente, día) con un solo bincount; días fuera del mes se ignoran
+    fila = indice.get_indexer(codigos)
+    validas = (fila >= 0) & ~np.isnan(dias) & (dias >= 1) & (dias <= n_dias)
+    posicion = fila[validas] * n_dias + dias[validas].astype(np.int64) - 1
+    matriz = np.bincount(posicion, weights=valores[validas], minlength=len(indice) * n_dias)
+    return matriz.reshape(len(indice), n_dias)
+
+
+def construir_matriz(anio, mes):
+    n_dias = calendar.monthrange(anio, mes)[1]
+
+    # Presupuesto: documentos que vencen en el mes
+    df_mes = historico.leer_periodo('proyectado', anio, mes, consumidor='detalle')
+    if df_mes is not None:
+        cod_proy = df_mes['COD. CLIENTE'].astype(str).to_numpy()
+        dia_proy = df_mes['VTO_FECHA_DT'].dt.day.to_numpy(dtype='float64', na_value=np.nan)
+        valor_proy = pd.to_numeric(df_mes['TOTAL CARTERA'], errors='coerce').fillna(0).to_numpy(dtype='float64')
+    else:
+        cod_proy, dia_proy, valor_proy = np.empty(0, dtype=object), np.empty(0), np.empty(0)
+
+    # Ingresos: por día de la fecha de pago (igual que la gráfica general)
+    df_pagos = historico.leer_periodo('pagos', anio, mes)
+    if df_pagos is not None and 'FECHA_PAGO_DT' in df_pagos.columns:
+        cod_pago = df_pagos['COD. CLIENTE'].astype(str).to_numpy()
+        dia_pago = df_pagos['FECHA_PAGO_DT'].dt.day.to_numpy(dtype='float64', na_value=np.nan)
+        valor_pago = df_pagos['VALOR PAGADO'].to_numpy(dtype='float64')
+    else:
+        cod_pago, dia_pago, valor_pago = np.empty(0, dtype=object), np.empty(0), np.empty(0)
+
+    codigos = pd.Index(np.union1d(cod_proy.astype(str), cod_pago.astype(str)))
+    return MatrizClientes(
+        codigos,
+        _acumular(cod_proy, dia_proy, valor_proy, codigos, n_dias),
+        _acumular(cod_pago, dia_pago, valor_pago, codigos, n_dias),
+    )
+
+
+def obtener_matriz(anio, mes):
+    clave = (firma_archivo(cargador_datos.RUTA_CARTERA), firma_archivo(cargador_datos.RUTA_PAGOS), anio, mes)
+    with _LOCK:
+        matriz = _MATRICES.get(clave)
+    if matriz is not None:
+        return matriz
+
+    matriz = construir_matriz(anio, mes)
+    with _LOCK:
+        _MATRICES.clear()  # solo interesa la versión vigente
+        _MATRICES[clave] = matriz
+    return matriz
@@ -0,0 +1,216 @@
+import os
+import sqlite3
+import threading
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import cargador_datos
+import eventos
+import metricas
+
+# --- COLA DE TRABAJOS EN SEGUNDO PLANO ---
+# procesar_todo y consolidar_pagos no corren dentro de la petición: se encolan en una tabla
+# SQLite (compartida por todos los workers de gunicorn) y un hilo por proceso los reclama y los
+# ejecuta en un proceso aparte, para que el worker siga atendiendo el tablero.
+# Encolar dos veces el mismo tipo mientras hay uno pendiente devuelve el mismo trabajo.
+RUTA_DB = os.path.join(cargador_datos.RUTA_DATA, 'trabajos.sqlite3')
+
+PENDIENTE = 'pendiente'
+EN_CURSO = 'en_curso'
+TERMINADO = 'terminado'
+ERROR = 'error'
+
+INTERVALO_SONDEO = 2.0
+# Un trabajo en curso que no reporta progreso en este tiempo se da por perdido (worker reiniciado)
+TIEMPO_ABANDONO = 30 * 60
+
+_despertar = threading.Event()
+_hilo = None
+_LOCK = threading.Lock()
+
+
+def _conectar(ruta_db=None):
+    conexion = sqlite3.connect(ruta_db or RUTA_DB, timeout=30, isolation_level=None)
+    conexion.row_factory = sqlite3.Row
+    conexion.execute("""
+        CREATE TABLE IF NOT EXISTS trabajos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tipo TEXT NOT NULL,
+            estado TEXT NOT NULL,
+            progreso REAL NOT NULL DEFAULT 0,
+            mensaje TEXT,
+            resultado TEXT,
+            creado REAL NOT NULL,
+            inicio REAL,
+            fin REAL,
+            actualizado REAL
+        )
+    """)
+    return conexion
+
+
+# --- Funciones que puede ejecutar la cola ---
+def _procesar_maestro(progreso):
+    from procesador_maestro import procesar_todo
+    return procesar_todo(progreso=progreso)
+
+
+def _consolidar_pagos(progreso):
+    from procesador_pagos import consolidar_pagos
+    return consolidar_pagos(progreso=progreso)
+
+
+TIPOS = {
+    'maestro': _procesar_maestro,
+    'pagos': _consolidar_pagos,
+}
+
+
+def encolar(tipo):
+    # Devuelve el id del trabajo; si ya hay uno pendiente del mismo tipo, ese mismo.
+    # (Si hay uno en curso sí se encola otro: pudo empezar antes de que llegara el archivo nuevo)
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo de trabajo desconocido: {tipo}")
+
+    conexion = _conectar()
+    try:
+        conexion.execute("BEGIN IMMEDIATE")
+        fila = conexion.execute(
+            "SELECT id FROM trabajos WHERE tipo = ? AND estado = ? ORDER BY id LIMIT 1",
+            (tipo, PENDIENTE)).fetchone()
+        if fila is not None:
+            id_trabajo = fila['id']
+        else:
+            cursor = conexion.execute(
+                "INSERT INTO trabajos (tipo, estado, mensaje, creado) VALUES (?, ?, ?, ?)",
+                (tipo, PENDIENTE, 'En cola', time.time()))
+            id_trabajo = cursor.lastrowid
+        conexion.execute("COMMIT")
+    finally:
+        conexion.close()
+
+    iniciar()
+    _despertar.set()
+    return id_trabajo
+
+
+def consultar(id_trabajo):
+    # Quien consulta también mantiene vivo el ejecutor (por si el worker que encoló se reinició)
+    iniciar()
+    conexion = _conectar()
+    try:
+        fila = conexion.execute("SELECT * FROM trabajos WHERE id = ?", (id_trabajo,)).fetchone()
+    finally:
+        conexion.close()
+    if fila is None:
+        return None
+
+    trabajo = dict(fila)
+    if trabajo['inicio'] is not None:
+        trabajo['duracion_s'] = round((trabajo['fin'] or time.time()) - trabajo['inicio'], 2)
+    else:
+        trabajo['duracion_s'] = None
+    return trabajo
+
+
+def _reclamar(conexion):
+    # Toma el trabajo pendiente más antiguo, salvo que ya haya uno del mismo tipo en curso
+    ahora = time.time()
+    conexion.execute("BEGIN IMMEDIATE")
+    try:
+        conexion.execute(
+            "UPDATE trabajos SET estado = ?, mensaje = ?, fin = ? WHERE estado = ? AND actualizado < ?",
+            (ERROR, 'Trabajo abandonado (el proceso se detuvo)', ahora, EN_CURSO, ahora - TIEMPO_ABANDONO))
+        fila = conexion.execute("""
+            SELECT id, tipo FROM trabajos t
+            WHERE estado = ? AND NOT EXISTS (
+                SELECT 1 FROM trabajos c WHERE c.tipo = t.tipo AND c.estado = ?)
+            ORDER BY id LIMIT 1
+        """, (PENDIENTE, EN_CURSO)).fetchone()
+        if fila is not None:
+            conexion.execute(
+                "UPDATE trabajos SET estado = ?, mensaje = ?, inicio = ?, actualizado = ? WHERE id = ?",
+                (EN_CURSO, 'Iniciando', ahora, ahora, fila['id']))
+        conexion.execute("COMMIT")
+    except Exception:
+        conexion.execute("ROLLBACK")
+        raise
+    return fila
+
+
+def _ejecutar(id_trabajo, tipo, ruta_db):
+    # Corre en el proceso hijo: reporta el avance directamente en la tabla
+    conexion = _conectar(ruta_db)
+
+    def progreso(fraccion, mensaje):
+        conexion.execute(
+            "UPDATE trabajos SET progreso = ?, mensaje = ?, actualizado = ? WHERE id = ?",
+            (round(float(fraccion), 3), mensaje, time.time(), id_trabajo))
+
+    try:
+        resultado = TIPOS[tipo](progreso)
+    finally:
+        conexion.close()
+
+    # Aviso a las páginas abiertas (SSE) con los KPIs nuevos. Se calculan aquí, con los archivos
+    # recién publicados, y no en el hilo de la cola del worker web
+    try:
+        eventos.publicar(tipo)
+    except Exception as e:
+        print(f"No se pudo publicar el evento de datos nuevos: {e}")
+    return resultado
+
+
+def _terminar(id_trabajo, estado, resultado):
+    conexion = _conectar()
+    try:
+        ahora = time.time()
+        conexion.execute(
+            "UPDATE trabajos SET estado = ?, progreso = COALESCE(?, progreso), mensaje = ?, resultado = ?, "
+            "fin = ?, actualizado = ? WHERE id = ?",
+            (estado, 1.0 if estado == TERMINADO else None, estado.capitalize(), resultado, ahora, ahora, id_trabajo))
+    finally:
+        conexion.close()
+
+
+def _bucle():
+    # spawn: el hijo no hereda hilos ni locks del worker de gunicorn
+    contexto = multiprocessing.get_context('spawn')
+    while True:
+        conexion = _conectar()
+        try:
+            fila = _reclamar(conexion)
+        except Exception as e:
+            print(f"No se pudo leer la cola de trabajos: {e}")
+            fila = None
+        finally:
+            conexion.close()
+
+        if fila is None:
+            _despertar.wait(INTERVALO_SONDEO)
+            _despertar.clear()
+            continue
+
+        # Las etapas corren en el proceso hijo: aquí solo se mide el trabajo completo
+        inicio = time.perf_counter()
+        try:
+            with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as pool:
+                resultado = pool.submit(_ejecutar, fila['id'], fila['tipo'], RUTA_DB).result()
+            _terminar(fila['id'], TERMINADO, str(resultado))
+            estado = TERMINADO
+        except Exception as e:
+            _terminar(fila['id'], ERROR, str(e))
+            estado = ERROR
+        metricas.observar('cartera_trabajo_segundos', time.perf_counter() - inicio, tipo=fila['tipo'], estado=estado)
+        # Los archivos se publicaron desde otro proceso: el cache de este se descarta
+        cargador_datos.invalidar()
+
+
+def iniciar():
+    # Un hilo ejecutor por proceso; se arranca la primera vez que se encola o se consulta un trabajo
+    global _hilo
+    with _LOCK:
+        if _hilo is None or not _hilo.is_alive():
+            _hilo = threading.Thread(target=_bucle, name='cola-trabajos', daemon=True)
+            _hilo.start()
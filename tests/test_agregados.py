@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from agregados import agregar_por_franja
+
+FRANJAS = ['0- Corriente', '1- 1 a 7', '2- 8 a 14', '5- Mayor a 30']
+CONJUNTOS = [('CIUDAD',), ('ADMIN',), ('CLIENTE', 'NIT'), ()]
+
+
+def _cartera(n, valor_dtype, semilla=0):
+    rng = np.random.default_rng(semilla)
+    ciudad = rng.choice(['BOGOTA', 'CALI', 'MEDELLIN', 'PASTO'], n).astype(object)
+    ciudad[rng.random(n) < 0.05] = None
+    # Franjas categóricas con una categoría sin filas y algunas filas sin franja
+    franja = pd.Categorical(rng.choice(FRANJAS[:3] + [None], n, p=[0.5, 0.3, 0.15, 0.05]),
+                            categories=FRANJAS, ordered=True)
+    valor = rng.integers(1, 10**6, n).astype(valor_dtype)
+    if valor_dtype == 'float64':
+        valor = valor + 0.25
+    return pd.DataFrame({
+        'CIUDAD': ciudad,
+        # PASTO solo tiene una franja: al pivotar le faltan las demás (quedan float con 0)
+        'ADMIN': pd.Categorical(rng.choice(['ANA', 'BETO'], n)),
+        'CLIENTE': rng.integers(1, 40, n).astype(str),
+        'NIT': rng.integers(1, 4, n).astype(str),
+        'FRANJA': franja,
+        'VALOR': valor,
+        'VENCIDO': np.where(rng.random(n) < 0.4, valor, 0).astype(valor_dtype),
+    })
+
+
+def _referencia(df, conjunto):
+    # Lo que hacía procesar_informacion: pivot_table + fillna(0) y groupby().agg de los totales.
+    # (Un grupo sin ninguna fila con franja saldría del merge; franjas.clasificar nunca deja vacía
+    # la franja, y las filas sin franja sí cuentan en los totales, como en los gráficos por ciudad)
+    tabla = df.pivot_table(index=list(conjunto), columns='FRANJA', values='VALOR', aggfunc='sum',
+                           observed=True).fillna(0)
+    totales = df.groupby(list(conjunto), observed=True).agg({'VALOR': 'sum', 'VENCIDO': 'sum'})
+    return tabla.merge(totales, left_index=True, right_index=True)
+
+
+@pytest.mark.parametrize('valor_dtype', ['int64', 'float64'])
+def test_igual_a_pivot_table(valor_dtype):
+    df = _cartera(3000, valor_dtype)
+    df.loc[df['CIUDAD'] == 'PASTO', 'FRANJA'] = FRANJAS[0]
+    rollups = agregar_por_franja(df, CONJUNTOS, 'FRANJA', 'VALOR', 'VENCIDO')
+
+    for conjunto in CONJUNTOS[:-1]:
+        esperado, obtenido = _referencia(df, conjunto), rollups[conjunto]
+        assert obtenido.columns.astype(str).tolist() == esperado.columns.astype(str).tolist()
+        pd.testing.assert_frame_equal(obtenido, esperado, check_names=False, check_index_type=False,
+                                      check_column_type=False, check_categorical=False)
+
+    # Total general: una fila con las franjas observadas y los totales (incluye filas sin franja)
+    general = rollups[()]
+    assert len(general) == 1
+    assert general['VALOR'].iloc[0] == df['VALOR'].sum()
+    assert general['VENCIDO'].iloc[0] == df['VENCIDO'].sum()
+    por_franja = df.groupby('FRANJA', observed=True)['VALOR'].sum()
+    assert general[por_franja.index.tolist()].iloc[0].tolist() == por_franja.tolist()
+
+
+def test_sin_filas():
+    rollups = agregar_por_franja(_cartera(0, 'int64'), CONJUNTOS, 'FRANJA', 'VALOR', 'VENCIDO')
+    assert all(tabla.empty for tabla in rollups.values())
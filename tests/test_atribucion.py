@@ -0,0 +1,43 @@
+import pandas as pd
+
+import atribucion
+
+
+def _indice(filas):
+    # filas: (cliente, analista, fecha, contacto) en el orden en que se registraron
+    df = pd.DataFrame(filas, columns=['CODIGO_CLIENTE', 'USUARIO_GESTION', 'FECHA_DT', 'CONTACTO'])
+    df['FECHA_DT'] = pd.to_datetime(df['FECHA_DT'])
+    df = df.astype({'USUARIO_GESTION': 'category', 'CONTACTO': 'category'})
+    return atribucion.IndiceAtribucion.construir(df)
+
+
+def _atribuir(indice, pagos, ventana=None):
+    clientes, fechas = zip(*pagos)
+    return list(indice.atribuir(pd.Series(clientes), pd.Series(pd.to_datetime(list(fechas))), ventana))
+
+
+def test_entre_gestiones_del_mismo_dia_gana_la_primera_registrada():
+    indice = _indice([
+        ('1', 'Beto', '2026-01-20', 'NO EFECTIVO'),
+        ('1', 'Ana', '2026-01-20', 'NO EFECTIVO'),
+        ('2', 'Ana', '2026-01-20', 'EFECTIVO'),
+        ('2', 'Beto', '2026-01-20', 'EFECTIVO'),
+    ])
+    assert _atribuir(indice, [('1', '2026-01-20'), ('2', '2026-01-20')]) == ['Beto', 'Ana']
+
+
+def test_la_efectiva_gana_aunque_se_registre_despues():
+    indice = _indice([
+        ('1', 'Ana', '2026-01-20', 'NO EFECTIVO'),
+        ('1', 'Beto', '2026-01-20', 'EFECTIVO'),
+    ])
+    assert _atribuir(indice, [('1', '2026-01-20')]) == ['Beto']
+
+
+def test_ventana():
+    indice = _indice([('1', 'Ana', '2026-01-18', 'EFECTIVO')])
+    pagos = [('1', '2026-01-18'), ('1', '2026-01-20'), ('2', '2026-01-18')]
+    assert _atribuir(indice, pagos, 0) == ['Ana', atribucion.SIN_GESTION, atribucion.SIN_GESTION]
+    assert _atribuir(indice, pagos, 2) == ['Ana', 'Ana', atribucion.SIN_GESTION]
+    # Negativa: como 0, no deja todos los pagos sin gestión
+    assert _atribuir(indice, pagos, -3) == _atribuir(indice, pagos, 0)
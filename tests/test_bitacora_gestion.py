@@ -0,0 +1,136 @@
+import os
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import bitacora_gestion
+import cargador_datos
+
+HOY = date(2026, 1, 28)
+ANALISTAS = ['Ana', 'Beto', 'Carla']
+CONTACTOS = ['EFECTIVO', 'NO EFECTIVO', 'OTRO']
+
+
+def _gestiones(n, semilla=0):
+    # Pocas fechas y clientes frecuentes: muchas gestiones del mismo cliente el mismo día, sin fecha o
+    # sin contacto; los clientes poco gestionados quedan en lotes sin ninguna gestión con contacto
+    rng = np.random.default_rng(semilla)
+    frecuentes = rng.random(n) < 0.7
+    df = pd.DataFrame({
+        'NIT': rng.integers(100, 110, n).astype(str),
+        'CODIGO_CLIENTE': np.where(frecuentes, rng.integers(1000, 1040, n), rng.integers(2000, 2600, n)).astype(str),
+        'USUARIO_GESTION': rng.choice(ANALISTAS, n).astype(object),
+        'FECHA_GESTION': [f"{d:02d}/01/2026" for d in rng.integers(20, 29, n)],
+        'ACCION': rng.choice(['LLAMADA', 'CORREO'], n),
+        'CONTACTO': rng.choice(CONTACTOS, n).astype(object),
+    })
+    df.loc[rng.random(n) < 0.05, 'FECHA_GESTION'] = ''
+    df.loc[rng.random(n) < 0.05, 'CONTACTO'] = None
+    df.loc[rng.random(n) < 0.03, 'USUARIO_GESTION'] = None
+    # La misma gestión registrada dos veces
+    return pd.concat([df, df.iloc[::17]], ignore_index=True)
+
+
+def _exportar(ruta, df):
+    anterior = cargador_datos.firma_archivo(ruta)
+    df.to_csv(ruta, sep=';', encoding='latin1', index=False,
+              compression={'method': 'zip', 'archive_name': 'gestion.csv'})
+    if anterior is not None:
+        # Otra versión aunque el reloj no avance entre escrituras
+        os.utime(ruta, ns=(anterior[0] + 10**9, anterior[0] + 10**9))
+
+
+def _referencia(df, analista='Todos'):
+    # Cálculo directo: orden estable por fecha (sin fecha al final) y la última gestión de cada cliente
+    if analista != 'Todos':
+        df = df[df['USUARIO_GESTION'] == analista]
+    ultimas = df.sort_values('FECHA_DT', kind='stable').groupby('CODIGO_CLIENTE').last()
+    return ultimas[['CONTACTO', 'FECHA_DT']].astype({'CONTACTO': object}).sort_index()
+
+
+def _ultima(indice, analista='Todos'):
+    return indice.ultima_gestion(analista).astype({'CONTACTO': object}).sort_index()
+
+
+def _mejor(indice):
+    columnas = ['USUARIO_GESTION', 'SOLO_FECHA', 'CODIGO_CLIENTE']
+    return indice.mejor_gestion_dia().sort_values(columnas).reset_index(drop=True)
+
+
+def _comprobar_referencia(indice, ruta):
+    df = cargador_datos.cargar_gestion(ruta)
+    assert indice.filas == len(df)
+    for analista in ['Todos'] + ANALISTAS:
+        pd.testing.assert_frame_equal(_ultima(indice, analista), _referencia(df, analista), check_names=False)
+    assert indice.gestiones.to_dict() == df['USUARIO_GESTION'].value_counts().to_dict()
+
+
+@pytest.fixture
+def rutas(tmp_path):
+    yield str(tmp_path / 'incremental' / 'gestion.zip'), str(tmp_path / 'completa' / 'gestion.zip')
+    bitacora_gestion._INDICES.clear()
+
+
+def test_incremental_igual_a_ingesta_completa(rutas):
+    ruta, ruta_completa = rutas
+    os.makedirs(os.path.dirname(ruta)), os.makedirs(os.path.dirname(ruta_completa))
+    df = _gestiones(3000)
+
+    # Tres versiones que solo crecen, contra una sola ingesta de la última
+    for filas in (800, 2100, len(df)):
+        _exportar(ruta, df.iloc[:filas])
+        incremental = bitacora_gestion.obtener_indice(ruta, HOY)
+    _exportar(ruta_completa, df)
+    completa = bitacora_gestion.obtener_indice(ruta_completa, HOY)
+
+    _comprobar_referencia(incremental, ruta)
+    _comprobar_referencia(completa, ruta_completa)
+    pd.testing.assert_frame_equal(_mejor(incremental), _mejor(completa))
+    assert incremental.ranking_dia(HOY) == completa.ranking_dia(HOY)
+    np.testing.assert_array_equal(incremental.claves, completa.claves)
+
+
+def test_reconstruccion_desde_lotes(rutas):
+    ruta, _ = rutas
+    os.makedirs(os.path.dirname(ruta))
+    df = _gestiones(2000, semilla=1)
+    _exportar(ruta, df.iloc[:900])
+    bitacora_gestion.obtener_indice(ruta, HOY)
+    _exportar(ruta, df)
+    indice = bitacora_gestion.obtener_indice(ruta, HOY)
+
+    # Sin indice.pkl el índice se rehace solo con los lotes guardados
+    os.remove(bitacora_gestion.rutas_bitacora(ruta)[1])
+    rehecho = bitacora_gestion._cargar_persistido(ruta)
+    _comprobar_referencia(rehecho, ruta)
+    pd.testing.assert_frame_equal(_mejor(rehecho), _mejor(indice))
+
+
+def test_exportacion_reordenada(rutas):
+    ruta, _ = rutas
+    os.makedirs(os.path.dirname(ruta))
+    df = _gestiones(1500, semilla=2)
+    _exportar(ruta, df.iloc[:1000])
+    bitacora_gestion.obtener_indice(ruta, HOY)
+
+    # Mismas filas en otro orden más las nuevas: se reconocen por sus claves, nada se ingiere dos veces
+    _exportar(ruta, pd.concat([df.iloc[:1000].sample(frac=1, random_state=0), df.iloc[1000:]]))
+    indice = bitacora_gestion.obtener_indice(ruta, HOY)
+    assert indice.filas == len(df)
+    assert int(indice.gestiones.sum()) == int(df['USUARIO_GESTION'].notna().sum())
+    assert len(os.listdir(bitacora_gestion.rutas_bitacora(ruta)[0])) == 2
+
+
+def test_exportacion_sin_la_historia_reinicia(rutas):
+    ruta, _ = rutas
+    os.makedirs(os.path.dirname(ruta))
+    _exportar(ruta, _gestiones(1200, semilla=3))
+    bitacora_gestion.obtener_indice(ruta, HOY)
+
+    # Otro mes: las filas ya ingeridas no están, la bitácora empieza de nuevo
+    _exportar(ruta, _gestiones(400, semilla=4))
+    indice = bitacora_gestion.obtener_indice(ruta, HOY)
+    _comprobar_referencia(indice, ruta)
+    assert len(os.listdir(bitacora_gestion.rutas_bitacora(ruta)[0])) == 1
@@ -0,0 +1,58 @@
+import pandas as pd
+import pytest
+
+import app as aplicacion
+import cubo
+
+
+@pytest.fixture
+def cartera():
+    return cubo.Cubo.construir(pd.DataFrame({
+        'ESTADO': ['PENDIENTE', 'PENDIENTE', 'PENDIENTE', 'PAGADO'],
+        'NIT': ['1', '1', '2', '3'],
+        'CIUDAD': ['BOGOTA', 'BOGOTA', 'CALI', 'CALI'],
+        'SEGMENTO': ['A', 'B', None, 'A'],
+        'TOTAL CARTERA': [100, 50, 30, 999],
+        'DIAS_MORA': [0, 5, 10, 10],
+    }))
+
+
+@pytest.fixture
+def cliente(cartera, monkeypatch):
+    monkeypatch.setattr(aplicacion, 'obtener_cubo', lambda: cartera)
+    return aplicacion.app.test_client()
+
+
+def test_consultar(cartera):
+    respuesta = cartera.consultar(['ciudad'], orden='total')
+    assert respuesta['filas'] == [
+        {'ciudad': 'BOGOTA', 'total': 150, 'vencido': 50, 'documentos': 2, 'clientes': 1},
+        {'ciudad': 'CALI', 'total': 30, 'vencido': 30, 'documentos': 1, 'clientes': 1},
+    ]
+    assert respuesta['totales'] == {'total': 180, 'vencido': 80, 'documentos': 3, 'clientes': 2}
+    assert cartera.valores('segmento') == ['A', 'B', cubo.VACIO]
+
+
+@pytest.mark.parametrize('limite', [0, -1])
+def test_limite_menor_a_uno(cartera, limite):
+    with pytest.raises(ValueError):
+        cartera.consultar(['ciudad'], limite=limite)
+
+
+def test_dimension_repetida(cartera):
+    with pytest.raises(ValueError, match='ciudad'):
+        cartera.consultar(['ciudad', 'segmento', 'ciudad'])
+
+
+@pytest.mark.parametrize('consulta', ['dims=ciudad&limite=-1', 'dims=ciudad&limite=0', 'dims=ciudad,ciudad',
+                                      'dims=barrio'])
+def test_api_rechaza_consultas_invalidas(cliente, consulta):
+    respuesta = cliente.get(f'/api/cubo?{consulta}')
+    assert respuesta.status_code == 400
+    assert 'error' in respuesta.get_json()
+
+
+def test_api_limite(cliente):
+    respuesta = cliente.get('/api/cubo?dims=ciudad&orden=total&limite=1').get_json()
+    assert respuesta['grupos'] == 2
+    assert [fila['ciudad'] for fila in respuesta['filas']] == ['BOGOTA']
@@ -0,0 +1,95 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import franjas
+from procesador_gestion import construir_detalle
+
+
+# Clasificaciones fila por fila originales (procesador_maestro y calcular_gestion), como referencia
+def _franja_cyres(dias):
+    if dias < -1: return "0- Corriente"
+    if dias == -1: return "1- Vence mañana"
+    if dias == 0: return "2- Vence hoy"
+    if dias == 1: return "3- Venció ayer"
+    if 2 <= dias <= 4: return "4- 2 a 4"
+    if 5 <= dias <= 7: return "5- 5 a 7"
+    if 8 <= dias <= 14: return "6- 8 a 14"
+    if 15 <= dias <= 21: return "7- 15 a 21"
+    if 22 <= dias <= 30: return "8- 22 a 30"
+    return "9- Mayor a 30"
+
+
+def _franja_coca(dias):
+    if dias <= 0: return "0- Corriente"
+    if 1 <= dias <= 7: return "1- 1 a 7"
+    if 8 <= dias <= 14: return "2- 8 a 14"
+    if 15 <= dias <= 21: return "3- 15 a 21"
+    if 22 <= dias <= 30: return "4- 22 a 30"
+    return "5- Mayor a 30"
+
+
+def _antiguedad(fecha, hoy):
+    if pd.isnull(fecha): return "1. Sin Gestión"
+    dias = (hoy - fecha).days
+    if dias <= 0: return "2. Gestión Hoy"
+    if dias == 1: return "3. Gestión Ayer"
+    if 2 <= dias <= 5: return "4. Sin gestión (2-5 días)"
+    if 6 <= dias <= 10: return "5. Sin gestión (6-10 días)"
+    if 11 <= dias <= 15: return "6. Sin gestión (11-15 días)"
+    return "7. Sin gestión (+15 días)"
+
+
+DIAS = pd.Series([np.nan] + list(range(-45, 400)), dtype='float64')
+
+
+@pytest.mark.parametrize('esquema, referencia', [('cyres', _franja_cyres), ('coca-cola', _franja_coca)])
+def test_clasificar_igual_a_fila_por_fila(esquema, referencia):
+    resultado = franjas.clasificar(DIAS, esquema)
+    assert resultado.astype(str).tolist() == DIAS.apply(referencia).tolist()
+    assert resultado.cat.ordered and resultado.index.equals(DIAS.index)
+
+
+def test_clasificar_enteros_con_vacios():
+    dias = pd.Series([-3, None, 31], dtype='Int64')
+    assert franjas.clasificar(dias, franjas.FRANJAS_COCA).astype(str).tolist() == \
+        ["0- Corriente", "5- Mayor a 30", "5- Mayor a 30"]
+
+
+def test_rangos_de_inactividad():
+    # Horas distintas de hoy y de las gestiones: cuentan los días completos, como timedelta.days
+    hoy = datetime(2026, 1, 28, 15, 30)
+    fechas = pd.Series(pd.to_datetime(['2026-01-28', '2026-01-27 18:00', '2026-01-22', '2026-01-12', None,
+                                       '2025-12-01', '2026-01-29'], format='ISO8601'))
+    dias = (pd.Timestamp(hoy) - fechas).dt.days
+    resultado = np.where(dias.isna(), franjas.SIN_GESTION,
+                         franjas.clasificar(dias, franjas.RANGOS_INACTIVIDAD).astype(str))
+    assert resultado.tolist() == [_antiguedad(f, hoy) for f in fechas]
+
+
+def test_construir_detalle_igual_a_iterrows():
+    df = pd.DataFrame({
+        'ID': ['1', '2', '3', '4'],
+        'NOMBRE': ['A', 'B', 'C', 'D'],
+        'FRANJA': ['0- Corriente', '9- Mayor a 30', '4- 2 a 4', '0- Corriente'],
+        'SALDO': [10, 20, 30, 40],
+        'CONTACTO': pd.Categorical([' efectivo ', None, '', 'NO EFECTIVO']),
+        'FECHA_DT': pd.to_datetime(['2026-01-20', None, '2026-01-02', '2026-01-27']),
+        'RANGO_GESTION': ['5. x', '1. Sin Gestión', '7. x', '2. x'],
+    })
+    referencia = []
+    for _, fila in df.iterrows():
+        contacto = fila.get('CONTACTO')
+        referencia.append({
+            'ID': fila['ID'], 'NOMBRE': fila['NOMBRE'], 'FRANJA': fila['FRANJA'],
+            'ESTADO': 'GESTIONADO' if pd.notnull(contacto) else 'SIN GESTIÓN',
+            'CONTACTO': str(contacto).strip().upper() if pd.notnull(contacto) and str(contacto).strip() != ""
+            else 'PTE / SIN CONTACTO',
+            'SALDO': fila['SALDO'], 'RANGO_INACTIVIDAD': fila['RANGO_GESTION'],
+            'FECHA_ULTIMA': fila['FECHA_DT'].strftime('%d/%m/%Y') if pd.notnull(fila['FECHA_DT']) else "—",
+            'CIUDAD': '',
+        })
+    detalle = construir_detalle(df, 'ID', 'NOMBRE', 'FRANJA', 'SALDO')
+    assert detalle.to_dict(orient='records') == referencia
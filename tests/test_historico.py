@@ -0,0 +1,71 @@
+import os
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import cargador_datos
+import generador_datos
+import historico
+import paralelo
+import procesador_dashboard
+import procesador_maestro
+import procesador_pagos
+
+
+@pytest.fixture
+def datos(tmp_path, monkeypatch):
+    # Maestro y consolidado de pagos de datos sintéticos que cruzan dos meses, en una carpeta propia
+    generador_datos.generar(str(tmp_path), escala=1, dias=10, hasta=date(2026, 2, 5), semilla=7)
+    monkeypatch.setattr(cargador_datos, 'RUTA_DATA', str(tmp_path))
+    monkeypatch.setattr(cargador_datos, 'RUTA_CARTERA', str(tmp_path / 'Proyectadoconsolidado.csv'))
+    monkeypatch.setattr(cargador_datos, 'RUTA_PAGOS', str(tmp_path / 'PagosConsolidado.csv'))
+    monkeypatch.setattr(cargador_datos, 'RUTA_GESTION', str(tmp_path / 'gestion.zip'))
+    monkeypatch.setattr(procesador_maestro, 'RUTA_ESTADO', str(tmp_path / 'estado_maestro.pkl'))
+    monkeypatch.setattr(procesador_pagos, 'RUTA_MANIFIESTO', str(tmp_path / 'PagosConsolidado.manifiesto.json'))
+    monkeypatch.setattr(historico, 'RUTA_HISTORICO', str(tmp_path / 'historico'))
+    monkeypatch.setattr(historico, 'RUTA_MANIFIESTO', str(tmp_path / 'historico' / 'manifiesto.json'))
+    monkeypatch.setattr(historico, '_SINCRONIZADAS', {})
+    monkeypatch.setattr(paralelo, 'PROCESOS', 1)
+    monkeypatch.setattr(procesador_dashboard, 'generar_snapshot', lambda: None)
+    procesador_maestro.procesar_todo()
+    procesador_pagos.consolidar_pagos()
+    return tmp_path
+
+
+def _del_mes(df, columna, anio, mes):
+    # Lo que hacía detalle_analisis: el archivo completo filtrado por mes y año
+    fechas = df[columna]
+    return df[(fechas.dt.year == anio) & (fechas.dt.month == mes)].reset_index(drop=True)
+
+
+def test_particion_igual_al_archivo_filtrado(datos):
+    assert historico.periodos('pagos') == [(2026, 2), (2026, 1)]
+    maestro = cargador_datos.cargar_cartera(cargador_datos.RUTA_CARTERA, consumidor='detalle')
+    pagos = cargador_datos.cargar_pagos(cargador_datos.RUTA_PAGOS)
+
+    for anio, mes in historico.periodos('proyectado'):
+        particion = historico.leer_periodo('proyectado', anio, mes, consumidor='detalle')
+        esperado = _del_mes(maestro, 'VTO_FECHA_DT', anio, mes)[particion.columns]
+        pd.testing.assert_frame_equal(particion, esperado, check_categorical=False)
+    for anio, mes in historico.periodos('pagos'):
+        pd.testing.assert_frame_equal(historico.leer_periodo('pagos', anio, mes),
+                                      _del_mes(pagos, 'FECHA_PAGO_DT', anio, mes), check_categorical=False)
+    assert historico.leer_periodo('pagos', 2025, 6) is None
+
+
+def test_conserva_los_meses_que_el_origen_ya_no_trae(datos):
+    enero = historico.leer_periodo('pagos', 2026, 1)
+    assert len(enero)
+
+    # Se limpian de la carpeta los pagos de enero: el consolidado nuevo solo trae febrero
+    carpeta = datos / 'pagos_diarios'
+    for nombre in os.listdir(carpeta):
+        if nombre[7:9] == '01':
+            os.remove(carpeta / nombre)
+    procesador_pagos.consolidar_pagos(completo=True)
+
+    assert historico.periodos('pagos') == [(2026, 2), (2026, 1)]
+    pd.testing.assert_frame_equal(historico.leer_periodo('pagos', 2026, 1), enero)
+    febrero = _del_mes(cargador_datos.cargar_pagos(cargador_datos.RUTA_PAGOS), 'FECHA_PAGO_DT', 2026, 2)
+    pd.testing.assert_frame_equal(historico.leer_periodo('pagos', 2026, 2), febrero, check_categorical=False)
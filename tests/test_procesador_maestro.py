@@ -0,0 +1,66 @@
+import os
+import shutil
+from datetime import date
+
+import pytest
+
+import cargador_datos
+import generador_datos
+import historico
+import paralelo
+import procesador_dashboard
+import procesador_maestro
+
+
+@pytest.fixture
+def datos(tmp_path, monkeypatch):
+    # Datos sintéticos chicos en una carpeta propia; sin snapshot ni histórico (no se prueban aquí)
+    generador_datos.generar(str(tmp_path), escala=1, dias=8, hasta=date(2026, 1, 28), semilla=5)
+    monkeypatch.setattr(cargador_datos, 'RUTA_DATA', str(tmp_path))
+    monkeypatch.setattr(cargador_datos, 'RUTA_CARTERA', str(tmp_path / 'Proyectadoconsolidado.csv'))
+    monkeypatch.setattr(procesador_maestro, 'RUTA_ESTADO', str(tmp_path / 'estado_maestro.pkl'))
+    monkeypatch.setattr(paralelo, 'PROCESOS', 1)
+    monkeypatch.setattr(procesador_dashboard, 'generar_snapshot', lambda: None)
+    monkeypatch.setattr(historico, 'sincronizar', lambda fuente: None)
+    return tmp_path
+
+
+def _archivos(datos):
+    return sorted(os.listdir(datos / 'proyectados'), key=lambda nombre: procesador_maestro.fecha_archivo(nombre, 0))
+
+
+def _maestro(datos):
+    with open(datos / 'Proyectadoconsolidado.csv', 'rb') as f:
+        return f.read()
+
+
+def test_incremental_igual_a_reconstruccion(datos):
+    archivos = _archivos(datos)
+    reserva = datos / 'reserva'
+    reserva.mkdir()
+    for nombre in archivos[5:]:
+        shutil.move(datos / 'proyectados' / nombre, reserva / nombre)
+    assert 'completa, 5 archivo(s)' in procesador_maestro.procesar_todo()
+
+    # Llegan los archivos de los días siguientes, de a uno y luego dos juntos
+    shutil.move(reserva / archivos[5], datos / 'proyectados' / archivos[5])
+    assert 'incremental, 1 archivo(s)' in procesador_maestro.procesar_todo()
+    for nombre in archivos[6:]:
+        shutil.move(reserva / nombre, datos / 'proyectados' / nombre)
+    assert 'incremental, 2 archivo(s)' in procesador_maestro.procesar_todo()
+    incremental = _maestro(datos)
+
+    assert 'completa, 8 archivo(s)' in procesador_maestro.procesar_todo(incremental=False)
+    assert _maestro(datos) == incremental
+
+
+def test_archivo_modificado_reconstruye(datos):
+    procesador_maestro.procesar_todo()
+    procesado = _maestro(datos)
+
+    # Un archivo ya ingerido cambia: el estado no sirve y se reconstruye con todos
+    ruta = datos / 'proyectados' / _archivos(datos)[2]
+    marca = os.stat(ruta).st_mtime_ns
+    os.utime(ruta, ns=(marca + 10**9, marca + 10**9))
+    assert 'completa, 8 archivo(s)' in procesador_maestro.procesar_todo()
+    assert _maestro(datos) == procesado